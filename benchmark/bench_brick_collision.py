@@ -0,0 +1,69 @@
+"""
+Benchmark the brick collision query of a linear scan and the grid indexed group.
+
+The bricks are laid out on the 25x10 grid used by the level maps, and the ball
+is placed at random positions over the brick area. The per-frame cost of the
+grid indexed group should stay flat as the number of bricks grows.
+
+Usage: python benchmark/bench_brick_collision.py [--frames 20000]
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import pygame
+
+from mlgame.game import physics
+from src.brick_group import GridBrickGroup
+from src.game_object import Ball, Brick
+
+BRICK_COUNTS = (10, 40, 80, 160, 320)
+
+
+def build_groups(num_bricks):
+    grid_group = GridBrickGroup()
+    for i in range(num_bricks):
+        pos = ((i % 8) * 25, (i // 8) * 10)
+        Brick(pos, grid_group)
+    return grid_group.sprites(), grid_group
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the brick collision query.")
+    parser.add_argument("--frames", type=int, default=20000,
+                        help="The number of queries for each brick count")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    ball = Ball((0, 0), pygame.Rect(0, 0, 200, 500), False)
+
+    print(f"{'bricks':>8} {'linear scan (us)':>20} {'grid (us)':>12} {'speedup':>9}")
+    for num_bricks in BRICK_COUNTS:
+        plain_group, grid_group = build_groups(num_bricks)
+        height = (num_bricks + 7) // 8 * 10
+        positions = [(rng.randrange(0, 196), rng.randrange(0, height + 5))
+                     for _ in range(args.frames)]
+
+        def query_plain():
+            for pos in positions:
+                ball.rect.topleft = pos
+                [brick for brick in plain_group if physics.collide_or_contact(ball, brick)]
+
+        def query_grid():
+            for pos in positions:
+                ball.rect.topleft = pos
+                grid_group.spritecollide(ball, False, physics.collide_or_contact)
+
+        plain_time = min(timeit.repeat(query_plain, number=1, repeat=3)) / args.frames
+        grid_time = min(timeit.repeat(query_grid, number=1, repeat=3)) / args.frames
+        print(f"{num_bricks:>8} {plain_time * 1e6:>20.2f} {grid_time * 1e6:>12.2f} "
+              f"{plain_time / grid_time:>8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,285 @@
+"""
+The reproducible benchmark suite of the game and the ML scripts.
+
+Every input is fixed by the seed: the games are seeded and played by a scripted
+policy (serve to the left, then follow the ball), and the dataset and the model
+of the ML benchmarks are generated from the seed. The metrics are:
+
+- update_fps/<level>/<difficulty>: frames/sec of `Arkanoid.update()`
+- scene_progress_us/<level>, player_data_us/<level>: the cost of
+  `get_scene_progress_data()` and `get_data_from_game_to_player()` at the
+  start of the level, with the brick count of the level in `bricks/<level>`
+- reset_us/<level>: the latency of `Arkanoid.reset()`
+- preprocess_rows_per_s: rows/sec of `ml_model_trainer.preprocess_data()`
+- ml_play_update_us/mean, ml_play_update_us/p99: the latency of `ml_play_model.MLPlay.update()`
+
+The results are saved as JSON. With `--compare`, the metrics are compared with
+a previous result, and the changes worse than the threshold are flagged as
+regressions, which makes the exit status 1. The ML benchmarks are skipped if
+scikit-learn is not installed.
+
+Usage: python benchmark/bench_suite.py [--levels 1-24] [--output results.json]
+                                       [--compare baseline.json --threshold 0.2]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+import numpy as np
+
+from ml.collect_runner import load_ml_play_class, parse_levels
+from src.game import Arkanoid
+
+ROOT_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DIFFICULTIES = ("EASY", "NORMAL")
+
+
+def scripted_command(game):
+    """
+    The scripted input: serve to the left, then move the platform center to the ball
+    """
+    if not game.ball_served:
+        return "SERVE_TO_LEFT"
+    platform_center = game._platform.rect.centerx
+    ball_center = game._ball.rect.centerx
+    if ball_center < platform_center - 5:
+        return "MOVE_LEFT"
+    if ball_center > platform_center + 5:
+        return "MOVE_RIGHT"
+    return "NONE"
+
+
+def bench_update(level, difficulty, frames, seed):
+    """
+    @return frames/sec of `update()`, with the best of 3 runs
+    """
+    def play():
+        game = Arkanoid(difficulty=difficulty, level=level, seed=seed, headless=True)
+        commands = {"1P": "NONE"}
+        elapsed = 0.0
+        for _ in range(frames):
+            commands["1P"] = scripted_command(game)
+            start = time.perf_counter()
+            result = game.update(commands)
+            elapsed += time.perf_counter() - start
+            if result == "RESET":
+                game.reset()
+        return elapsed
+
+    return frames / min(play() for _ in range(3))
+
+
+def bench_level_start(level, repeat, seed):
+    """
+    @return (brick count, scene progress data us, player data us, reset us)
+    """
+    game = Arkanoid(difficulty="NORMAL", level=level, seed=seed, headless=True)
+    num_bricks = len(game._group_brick)
+
+    def best_us(function):
+        return min(timeit.repeat(function, number=repeat, repeat=3)) / repeat * 1e6
+
+    return (num_bricks, best_us(game.get_scene_progress_data),
+            best_us(game.get_data_from_game_to_player), best_us(game.reset))
+
+
+def make_dataset(num_rows, seed):
+    """
+    Generate the dataset rows labeled by the rule of the collectors
+    """
+    from ml.dataset import DATASET_DTYPE, COMMAND_LABELS
+
+    rng = np.random.default_rng(seed)
+    rows = np.zeros(num_rows, dtype=DATASET_DTYPE)
+    rows["ball_x"] = rng.integers(0, 196, num_rows)
+    rows["ball_y"] = rng.integers(0, 396, num_rows)
+    rows["platform_x"] = rng.integers(0, 161, num_rows)
+    rows["dx"] = rng.choice([-10, -7, 7, 10], num_rows)
+    rows["dy"] = rng.choice([-7, 7], num_rows)
+    rows["predicted_x"] = rng.integers(0, 196, num_rows)
+    offset = rows["predicted_x"].astype(np.int64) - rows["platform_x"] - 20
+    rows["label"] = np.where(offset < 0, COMMAND_LABELS["MOVE_LEFT"],
+                             np.where(offset > 0, COMMAND_LABELS["MOVE_RIGHT"], COMMAND_LABELS["NONE"]))
+    rows["episode_id"] = np.arange(num_rows) // 1000
+    rows["frame"] = np.arange(num_rows) % 1000
+    return rows
+
+
+def bench_preprocess(num_rows, seed):
+    """
+    @return rows/sec of `preprocess_data()`, with the best of 5 runs
+    """
+    from ml.ml_model_trainer import preprocess_data
+
+    dataset = make_dataset(num_rows, seed)
+    with contextlib.redirect_stdout(io.StringIO()):
+        elapsed = min(timeit.repeat(lambda: preprocess_data(dataset), number=1, repeat=5))
+    return num_rows / elapsed
+
+
+def bench_ml_play(frames, seed):
+    """
+    Play a game with `ml_play_model.MLPlay` using a KNN trained on the generated dataset
+
+    @return (mean us, p99 us) of `MLPlay.update()`, with the best of 3 games
+    """
+    from sklearn.neighbors import KNeighborsClassifier
+    from ml.features import labeled_features
+    from ml.model_store import ModelStore
+
+    features, labels = labeled_features(make_dataset(20000, seed))
+    model = KNeighborsClassifier(n_neighbors=20).fit(features, labels)
+    ml_play_class = load_ml_play_class(os.path.join(ROOT_PATH, "ml", "ml_play_model.py"))
+
+    def play(store_folder):
+        latencies = []
+        game = Arkanoid(difficulty="NORMAL", level=1, seed=seed, headless=True)
+        ai = ml_play_class("1P", seed=seed, model_store=store_folder)
+        for _ in range(frames):
+            scene_info = game.get_data_from_game_to_player()["1P"]
+            start = time.perf_counter()
+            command = ai.update(scene_info)
+            latencies.append(time.perf_counter() - start)
+            if game.update({"1P": command}) == "RESET":
+                ai.update(game.get_data_from_game_to_player()["1P"])
+                ai.reset()
+                game.reset()
+        return np.array(latencies) * 1e6
+
+    with tempfile.TemporaryDirectory() as store_folder, contextlib.redirect_stdout(io.StringIO()):
+        ModelStore(store_folder).save(model)
+        runs = [play(store_folder) for _ in range(3)]
+    return (min(float(latencies.mean()) for latencies in runs),
+            min(float(np.percentile(latencies, 99)) for latencies in runs))
+
+
+def run(levels, frames, repeat, seed, skip_ml=False):
+    """
+    Run the benchmarks
+
+    @return The dict of {metric name: {"value", "unit", "higher_is_better"}}
+    """
+    metrics = {}
+
+    def record(name, value, unit, higher_is_better):
+        metrics[name] = {"value": value, "unit": unit, "higher_is_better": higher_is_better}
+
+    for level in levels:
+        for difficulty in DIFFICULTIES:
+            fps = bench_update(level, difficulty, frames, seed)
+            record(f"update_fps/{level}/{difficulty}", fps, "frames/s", True)
+        num_bricks, progress_us, player_us, reset_us = bench_level_start(level, repeat, seed)
+        record(f"bricks/{level}", num_bricks, "bricks", None)
+        record(f"scene_progress_us/{level}", progress_us, "us", False)
+        record(f"player_data_us/{level}", player_us, "us", False)
+        record(f"reset_us/{level}", reset_us, "us", False)
+        print(f"level {level:>2}: {num_bricks:>3} bricks, "
+              f"update {metrics[f'update_fps/{level}/EASY']['value']:.0f}/"
+              f"{metrics[f'update_fps/{level}/NORMAL']['value']:.0f} frames/s (EASY/NORMAL), "
+              f"progress {progress_us:.1f} us, player data {player_us:.1f} us, reset {reset_us:.1f} us")
+
+    if skip_ml:
+        return metrics
+    try:
+        import sklearn  # noqa: F401
+    except ImportError:
+        print("scikit-learn is not installed, skip the ML benchmarks")
+        return metrics
+
+    rows_per_s = bench_preprocess(1000000, seed)
+    record("preprocess_rows_per_s", rows_per_s, "rows/s", True)
+    print(f"preprocess_data: {rows_per_s:.0f} rows/s")
+    mean_us, p99_us = bench_ml_play(frames, seed)
+    record("ml_play_update_us/mean", mean_us, "us", False)
+    record("ml_play_update_us/p99", p99_us, "us", False)
+    print(f"MLPlay.update: mean {mean_us:.1f} us, p99 {p99_us:.1f} us")
+    return metrics
+
+
+def compare(metrics, baseline_metrics, threshold):
+    """
+    Compare the metrics with the baseline
+
+    @return The list of (name, baseline value, value, relative change) worse than the threshold.
+            A positive change is worse.
+    """
+    regressions = []
+    for name, metric in metrics.items():
+        baseline = baseline_metrics.get(name)
+        if baseline is None or metric["higher_is_better"] is None or not baseline["value"]:
+            continue
+        change = (metric["value"] - baseline["value"]) / baseline["value"]
+        if metric["higher_is_better"]:
+            change = -change
+        if change > threshold:
+            regressions.append((name, baseline["value"], metric["value"], change))
+    return regressions
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT_PATH, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the benchmark suite.")
+    parser.add_argument("--levels", type=str, default="1-24",
+                        help="Levels to benchmark, e.g. '1-5,8'.")
+    parser.add_argument("--frames", type=int, default=3000,
+                        help="The number of frames played for each level and difficulty")
+    parser.add_argument("--repeat", type=int, default=200,
+                        help="The number of calls timed for the per-call benchmarks")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip_ml", action="store_true",
+                        help="Skip the benchmarks of the ML scripts.")
+    parser.add_argument("--output", type=str, default=None,
+                        help="Save the results as a JSON file.")
+    parser.add_argument("--compare", type=str, default=None,
+                        help="The JSON file of the baseline results to compare with.")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="Flag the metrics worse than the baseline by more than this fraction.")
+    args = parser.parse_args()
+
+    metrics = run(parse_levels(args.levels), args.frames, args.repeat, args.seed, args.skip_ml)
+    results = {
+        "meta": {
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "args": vars(args),
+        },
+        "metrics": metrics,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(metrics, baseline["metrics"], args.threshold)
+        for name, baseline_value, value, change in regressions:
+            print(f"REGRESSION {name}: {baseline_value:.2f} -> {value:.2f} ({change:+.1%} worse)")
+        print(f"{len(regressions)} regressions over {args.threshold:.0%} "
+              f"compared with {args.compare} ({baseline['meta'].get('commit')})")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,257 @@
+"""
+Run headless Arkanoid games with an AI script in a process pool to collect data
+without the MLGame GUI.
+
+Each episode pairs a headless `Arkanoid` with the `MLPlay` class loaded from the
+AI script, in the same way MLGame feeds the scene info and calls `reset()`.
+The game and the `MLPlay` are constructed with the seed of the episode, so every
+episode is reproducible. The `MLPlay` is also given `data_folder=<output>`, so the collectors
+(`ml_play_collect.py`, `ml_play_collect_1024.py`) write their episode files into
+the shared output folder, which `ml_model_trainer.py --data_folder` reads directly.
+The result of every episode is appended to `<output>/episodes.jsonl`.
+
+With `--replays`, the replay of every episode (see `src/replay.py`) is also saved
+into `<output>/replays`. `--from_replays` converts the saved replays into dataset
+shards instead of playing, in the same way as `ml_play_collect.py` records them.
+
+Example:
+    python ml/collect_runner.py --ai ml/ml_play_collect.py --levels 1-24 \
+        --difficulties EASY NORMAL --episodes 10 --workers 8
+    python ml/collect_runner.py --from_replays arkanoid_data_collection/replays/*.arkr \
+        --output replay_dataset
+"""
+import argparse
+import contextlib
+import importlib.util
+import io
+import json
+import multiprocessing
+import os
+import random
+import sys
+import time
+
+ROOT_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_PATH not in sys.path:
+    sys.path.append(ROOT_PATH)
+
+from src.game import Arkanoid
+from src.replay import REPLAY_EXTENSION, load_replay, save_replay
+
+_worker_config = {}
+
+
+def load_ml_play_class(ai_path):
+    """
+    Load the `MLPlay` class from the AI script
+    """
+    module_name = os.path.splitext(os.path.basename(ai_path))[0]
+    spec = importlib.util.spec_from_file_location(module_name, ai_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.MLPlay
+
+
+def parse_levels(text):
+    """
+    Parse the level list like "1-5,8,10-12"
+    """
+    levels = []
+    for part in text.split(","):
+        if "-" in part:
+            first, last = part.split("-")
+            levels.extend(range(int(first), int(last) + 1))
+        else:
+            levels.append(int(part))
+    return levels
+
+
+def play_episode(game, ai, max_frames):
+    """
+    Play an episode until the game is over or `max_frames` frames are used.
+    The AI receives the final scene info and is reset as in MLGame.
+
+    @return The game result
+    """
+    ai_name = game.ai_clients()[0]["name"]
+    for _ in range(max_frames):
+        scene_info = game.get_data_from_game_to_player()[ai_name]
+        command = ai.update(scene_info, [])
+        if game.update({ai_name: command}) == "RESET":
+            break
+
+    ai.update(game.get_data_from_game_to_player()[ai_name], [])
+    ai.reset()
+    return game.get_game_result()
+
+
+def _init_worker(ai_path, output_folder, max_frames, verbose, replay_folder=None):
+    _worker_config.update({
+        "ml_play_class": load_ml_play_class(ai_path),
+        "output_folder": output_folder,
+        "max_frames": max_frames,
+        "verbose": verbose,
+        "replay_folder": replay_folder,
+    })
+
+
+def run_episode(ml_play_class, level, difficulty, seed, max_frames, verbose=False,
+                replay_folder=None, **ai_kwargs):
+    """
+    Play a headless episode with a new `MLPlay`
+
+    @param replay_folder Save the replay of the episode into this folder if it is given
+    @param ai_kwargs The other keyword arguments of `MLPlay`, e.g. `data_folder`
+    @return The dict of the episode result
+    """
+    # The collectors print every record they save, so keep the output quiet by default
+    stdout = sys.stdout if verbose else io.StringIO()
+    start_time = time.perf_counter()
+    with contextlib.redirect_stdout(stdout):
+        # Also seed the global generator for the AI scripts using it
+        random.seed(seed)
+        game = Arkanoid(difficulty=difficulty, level=level, seed=seed, headless=True,
+                        record_replay=replay_folder is not None)
+        ai = ml_play_class(ai_name=game.ai_clients()[0]["name"], seed=seed, **ai_kwargs)
+        result = play_episode(game, ai, max_frames)
+
+    attachment = result["attachment"][0]
+    episode_result = {
+        "level": level,
+        "difficulty": difficulty,
+        "seed": seed,
+        "state": str(result["state"]),
+        "frame_used": result["frame_used"],
+        "brick_remain": attachment["brick_remain"],
+        "count_of_catching_ball": attachment["count_of_catching_ball"],
+        "seconds": time.perf_counter() - start_time,
+    }
+    if replay_folder is not None:
+        replay_path = os.path.join(replay_folder, "{0}_{1}_{2}{3}".format(
+            level, difficulty, seed, REPLAY_EXTENSION))
+        save_replay(replay_path, game.get_replay())
+        episode_result["replay"] = replay_path
+    return episode_result
+
+
+def _run_task(task):
+    level, difficulty, seed = task
+    config = _worker_config
+    return run_episode(config["ml_play_class"], level, difficulty, seed, config["max_frames"],
+                       config["verbose"], config["replay_folder"], data_folder=config["output_folder"])
+
+
+def _convert_replay(task):
+    from ml.dataset import replay_to_dataset, write_shard
+
+    replay_path, output_folder = task
+    replay = load_replay(replay_path)
+    if replay.result.state != "FINISH":
+        return 0
+    rows = replay_to_dataset(replay)
+    write_shard(output_folder, rows)
+    return len(rows)
+
+
+def convert_replays(replay_paths, output_folder, workers=None):
+    """
+    Convert the replays into dataset shards in a process pool. Only the passed games
+    are converted, as the collectors only save the passed episodes.
+
+    @return The number of the converted rows
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    workers = workers or os.cpu_count()
+    start_time = time.perf_counter()
+    with multiprocessing.Pool(workers) as pool:
+        row_counts = list(pool.imap_unordered(
+            _convert_replay, [(path, output_folder) for path in replay_paths]))
+
+    elapsed = time.perf_counter() - start_time
+    print(f"{sum(count > 0 for count in row_counts)} of {len(row_counts)} replays converted "
+          f"into {sum(row_counts)} rows in {elapsed:.1f}s")
+    return sum(row_counts)
+
+
+def make_tasks(levels, difficulties, episodes, base_seed):
+    """
+    @return The list of (level, difficulty, seed). Each episode has a distinct seed.
+    """
+    tasks = []
+    for level in levels:
+        for difficulty in difficulties:
+            for episode in range(episodes):
+                tasks.append((level, difficulty, base_seed + len(tasks)))
+    return tasks
+
+
+def run(ai_path, levels, difficulties, episodes, output_folder,
+        workers=None, base_seed=0, max_frames=30000, verbose=False, save_replays=False):
+    """
+    Run the episodes in a process pool and stream their results to `episodes.jsonl`
+
+    @param save_replays Save the replays of the episodes into `<output_folder>/replays`
+    @return The list of episode results
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    output_folder = os.path.abspath(output_folder)
+    replay_folder = os.path.join(output_folder, "replays") if save_replays else None
+    if replay_folder is not None:
+        os.makedirs(replay_folder, exist_ok=True)
+    tasks = make_tasks(levels, difficulties, episodes, base_seed)
+    workers = workers or os.cpu_count()
+    chunksize = max(1, len(tasks) // (workers * 8))
+
+    results = []
+    start_time = time.perf_counter()
+    with open(os.path.join(output_folder, "episodes.jsonl"), "a") as manifest, \
+            multiprocessing.Pool(workers, initializer=_init_worker,
+                                 initargs=(ai_path, output_folder, max_frames, verbose, replay_folder)) as pool:
+        for result in pool.imap_unordered(_run_task, tasks, chunksize=chunksize):
+            manifest.write(json.dumps(result) + "\n")
+            manifest.flush()
+            results.append(result)
+
+    elapsed = time.perf_counter() - start_time
+    total_frames = sum(result["frame_used"] for result in results)
+    passed = sum(result["state"] == "FINISH" for result in results)
+    print(f"{len(results)} episodes ({passed} passed), {total_frames} frames in {elapsed:.1f}s "
+          f"with {workers} workers: {total_frames / elapsed:.0f} frames/s")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Collect Arkanoid data with headless games in parallel.")
+    parser.add_argument("--ai", type=str, default=os.path.join(ROOT_PATH, "ml", "ml_play_collect.py"),
+                        help="Path to the AI script containing the MLPlay class.")
+    parser.add_argument("--levels", type=str, default="1-24",
+                        help="Levels to play, e.g. '1-5,8'.")
+    parser.add_argument("--difficulties", nargs="+", default=["EASY", "NORMAL"],
+                        choices=["EASY", "NORMAL"], help="Difficulties to play.")
+    parser.add_argument("--episodes", type=int, default=1,
+                        help="Episodes for each level and difficulty.")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="The seed of the first episode. Each episode uses the next seed.")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Number of worker processes. Use all cores by default.")
+    parser.add_argument("--max_frames", type=int, default=30000,
+                        help="Stop an episode after this many frames.")
+    parser.add_argument("--output", type=str, default="arkanoid_data_collection",
+                        help="The shared folder of the collected data.")
+    parser.add_argument("--verbose", action="store_true",
+                        help="Show the output of the AI scripts.")
+    parser.add_argument("--replays", action="store_true",
+                        help="Save the replay of every episode into <output>/replays.")
+    parser.add_argument("--from_replays", nargs="+", default=None,
+                        help="Convert these replay files into dataset shards in <output> instead of playing.")
+    args = parser.parse_args()
+
+    if args.from_replays:
+        convert_replays(args.from_replays, args.output, args.workers)
+        return
+    run(os.path.abspath(args.ai), parse_levels(args.levels), args.difficulties, args.episodes,
+        args.output, args.workers, args.seed, args.max_frames, args.verbose, args.replays)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,142 @@
+"""
+The streaming loader of the collected data for the trainer.
+
+The data folders are split into tasks: the chunks of the memory-mapped
+`dataset.npy` (see `ml/dataset.py`) and the old pickle files. The tasks are
+loaded and turned into features in a process pool, and the results are
+regrouped into batches of a fixed size. Only a few tasks are in flight at a
+time, so the memory usage is bounded no matter how large the dataset is.
+
+Example:
+    for features, labels in iter_batches(["arkanoid_data_collection"], batch_size=65536):
+        model.partial_fit(features, labels, classes=CLASSES)
+"""
+import glob
+import hashlib
+import os
+import pickle
+import random
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from ml.dataset import COMMAND_LABELS, DATASET_DTYPE, NO_LABEL, compact_dataset, records_to_dataset
+from ml.features import labeled_features
+
+# All the labels, which `partial_fit()` needs in the first call
+CLASSES = np.array(sorted(COMMAND_LABELS.values()))
+
+DEFAULT_CHUNK_SIZE = 1 << 18
+
+
+def list_tasks(folders, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Split the data folders into tasks. The shards in the folders are merged first.
+
+    @return The list of (path, first row, last row). The rows are None for a pickle file.
+    """
+    tasks = []
+    for folder in folders:
+        if not os.path.isdir(folder):
+            continue
+
+        path = compact_dataset(folder)
+        if path is not None:
+            num_rows = len(np.load(path, mmap_mode="r"))
+            tasks.extend((path, start, min(start + chunk_size, num_rows))
+                         for start in range(0, num_rows, chunk_size))
+        tasks.extend((path, None, None)
+                     for path in sorted(glob.glob(os.path.join(folder, "*.pickle"))))
+    return tasks
+
+
+def _path_episode_id(path) -> int:
+    """
+    Get the episode id of a pickle file, which is the same every time it is loaded
+    """
+    return int.from_bytes(hashlib.sha256(os.path.abspath(path).encode()).digest()[:8], "little") >> 1
+
+
+def load_task(task):
+    """
+    Load a task and compute its features
+
+    @return (features, labels, episode ids)
+    """
+    path, start, stop = task
+    if start is not None:
+        dataset = np.load(path, mmap_mode="r")[start:stop]
+    else:
+        try:
+            with open(path, "rb") as f:
+                dataset = records_to_dataset(pickle.load(f), _path_episode_id(path))
+        except Exception as e:
+            print(f"Error loading data from {path}: {e}")
+            dataset = np.zeros(0, dtype=DATASET_DTYPE)
+    features, labels = labeled_features(dataset)
+    episode_ids = np.asarray(dataset["episode_id"])[np.asarray(dataset["label"]) != NO_LABEL]
+    return features, labels, episode_ids
+
+
+def _map_in_order(function, tasks, workers):
+    """
+    Map the tasks in a process pool and yield the results in the order of the tasks.
+    At most `2 * workers` tasks are submitted but not yet consumed.
+    """
+    if workers <= 1:
+        yield from map(function, tasks)
+        return
+
+    with ProcessPoolExecutor(workers) as executor:
+        pending = deque()
+        for task in tasks:
+            pending.append(executor.submit(function, task))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def iter_batches(folders, batch_size=65536, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, seed=None,
+                 episodes=False):
+    """
+    Stream the features and the labels of the data folders in batches
+
+    @param folders The data folders
+    @param batch_size The number of frames in a batch. The last batch may be smaller.
+    @param workers The number of worker processes. Use all cores by default.
+    @param chunk_size The number of rows of `dataset.npy` loaded in a task
+    @param seed If it is given, the tasks and the frames in each batch are shuffled by this seed
+    @param episodes Also yield the episode id of each frame, e.g. to hold out whole episodes
+    @return The generator of (features, labels), or (features, labels, episode ids) with `episodes`
+    """
+    tasks = list_tasks(folders, chunk_size)
+    rng = None
+    if seed is not None:
+        rng = np.random.default_rng(seed)
+        random.Random(seed).shuffle(tasks)
+
+    def make_batch(arrays):
+        if rng is not None:
+            order = rng.permutation(len(arrays[1]))
+            arrays = [array[order] for array in arrays]
+        return tuple(arrays) if episodes else tuple(arrays[:2])
+
+    buffered, num_buffered = [[], [], []], 0
+    for result in _map_in_order(load_task, tasks, workers or os.cpu_count()):
+        for arrays, array in zip(buffered, result):
+            arrays.append(array)
+        num_buffered += len(result[1])
+        if num_buffered < batch_size:
+            continue
+
+        merged = [np.concatenate(arrays) for arrays in buffered]
+        num_batched = num_buffered - num_buffered % batch_size
+        for start in range(0, num_batched, batch_size):
+            yield make_batch([array[start:start + batch_size] for array in merged])
+        buffered = [[array[num_batched:]] for array in merged]
+        num_buffered -= num_batched
+
+    if num_buffered > 0:
+        yield make_batch([np.concatenate(arrays) for arrays in buffered])
@@ -0,0 +1,337 @@
+"""
+The columnar dataset of the collected gameplay.
+
+A dataset folder stores the frames as a NumPy structured array of `DATASET_DTYPE`,
+one row per frame. The collectors write each recorded episode as an `.npy` shard
+(`shard_*.npy`), which is written to a temporary file and renamed, so several
+processes can write into the same folder. `open_dataset()` appends the rows of
+the shards to `dataset.npy` in place, and memory-maps it, so the columns are read
+without copying and without loading the whole dataset into memory. Only the new
+rows are written, and the shards are merged under the lock of the operating
+system on a lock file, so concurrent readers merge each shard once.
+
+Example:
+    dataset = open_dataset("arkanoid_data_collection")
+    dataset["ball_x"], dataset["label"]
+"""
+import glob
+import io
+import os
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+DATASET_DTYPE = np.dtype([
+    ("ball_x", "<i2"),
+    ("ball_y", "<i2"),
+    ("platform_x", "<i2"),
+    ("dx", "<i2"),
+    ("dy", "<i2"),
+    ("predicted_x", "<i2"),
+    ("label", "i1"),
+    ("episode_id", "<i8"),
+    ("frame", "<i4"),
+])
+
+DATASET_FILENAME = "dataset.npy"
+SHARD_PATTERN = "shard_*.npy"
+
+# The labels of the platform commands. The other commands are labeled `NO_LABEL`.
+COMMAND_LABELS = {"MOVE_LEFT": 0, "MOVE_RIGHT": 1, "NONE": 2}
+NO_LABEL = -1
+
+# The rows copied at a time when merging the shards
+_COPY_CHUNK_SIZE = 1 << 20
+# The lock file of merging the shards. It is kept in the folder, and the lock on it is
+# released by the operating system when the process exits, so a crash leaves no stale lock.
+_LOCK_FILENAME = ".dataset.lock"
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+
+def command_to_label(command) -> int:
+    return COMMAND_LABELS.get(command, NO_LABEL)
+
+
+def commands_to_labels(commands) -> np.ndarray:
+    """
+    Map the command strings to the labels at once
+    """
+    commands, inverse = np.unique(np.asarray(commands, dtype=str), return_inverse=True)
+    table = np.array([command_to_label(command) for command in commands], dtype=DATASET_DTYPE["label"])
+    return table[inverse.reshape(-1)]
+
+
+def episode_deltas(values, episode_ids) -> np.ndarray:
+    """
+    Get the difference of the values from the previous frame of the same episode.
+    The difference is 0 in the first frame of each episode.
+    """
+    values = np.asarray(values)
+    episode_ids = np.asarray(episode_ids)
+    deltas = np.diff(values, prepend=values[:1])
+    deltas[1:][episode_ids[1:] != episode_ids[:-1]] = 0
+    return deltas
+
+
+def new_episode_id() -> int:
+    """
+    Generate a random id for an episode, which is unique across processes
+    """
+    return int.from_bytes(os.urandom(8), "little") >> 1
+
+
+class EpisodeRecorder:
+    """
+    Record the frames of an episode, which are written by `write_shard()`
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """
+        Drop the recorded frames and start a new episode
+        """
+        self.episode_id = new_episode_id()
+        self._rows = []
+
+    def __len__(self):
+        return len(self._rows)
+
+    def append(self, frame, ball, platform, dx, dy, predicted_x, command):
+        self._rows.append((ball[0], ball[1], platform[0], dx, dy, predicted_x,
+                           command_to_label(command), self.episode_id, frame))
+
+    def to_array(self) -> np.ndarray:
+        return np.array(self._rows, dtype=DATASET_DTYPE)
+
+
+def records_to_dataset(records, episode_id=None) -> np.ndarray:
+    """
+    Convert the records of an episode in the old pickle format,
+    `{"scene_info": ..., "command": ..., "predicted_x": ...}`, to the dataset rows.
+    The missing predicted x is replaced by the platform x as before.
+    """
+    records = [record for record in records if record["scene_info"] and record["command"]]
+    rows = np.zeros(len(records), dtype=DATASET_DTYPE)
+    if not records:
+        return rows
+
+    rows["ball_x"], rows["ball_y"] = np.array([record["scene_info"]["ball"] for record in records]).T
+    rows["platform_x"] = [record["scene_info"]["platform"][0] for record in records]
+    predicted_x = np.array([record.get("predicted_x") for record in records], dtype=object)
+    missing = np.equal(predicted_x, None)
+    predicted_x[missing] = rows["platform_x"][missing]
+    rows["predicted_x"] = predicted_x.astype(np.int64)
+    rows["label"] = commands_to_labels([record["command"] for record in records])
+    rows["episode_id"] = new_episode_id() if episode_id is None else episode_id
+    rows["frame"] = np.arange(len(records))
+    rows["dx"] = episode_deltas(rows["ball_x"], rows["episode_id"])
+    rows["dy"] = episode_deltas(rows["ball_y"], rows["episode_id"])
+    return rows
+
+
+def replay_to_dataset(replay, episode_id=None, oracle=None) -> np.ndarray:
+    """
+    Re-simulate a replay (see `src/replay.py`) and convert its frames to the dataset rows
+    in the same way as `ml_play_collect.py`: the frames after the ball is served,
+    labeled by the replayed commands, with the landing x predicted by the oracle.
+    Unlike the collectors, the frames are converted whether the game is passed or not.
+
+    @param oracle The `TrajectoryOracle` predicting the landing x. A new one is used if not given.
+    """
+    from ml.trajectory_oracle import TrajectoryOracle
+    from src.replay import replay_game
+
+    oracle = TrajectoryOracle(physics_version=replay.physics_version) if oracle is None else oracle
+    recorder = EpisodeRecorder()
+    if episode_id is not None:
+        recorder.episode_id = episode_id
+    previous_ball_position = None
+
+    def on_frame(game, command):
+        nonlocal previous_ball_position
+        scene_info = game.get_data_from_game_to_player()["1P"]
+        if scene_info["ball_served"]:
+            ball_dx = ball_dy = 0
+            if previous_ball_position:
+                ball_dx = scene_info["ball"][0] - previous_ball_position[0]
+                ball_dy = scene_info["ball"][1] - previous_ball_position[1]
+            landing = oracle.predict(scene_info, previous_ball_position)
+            recorder.append(scene_info["frame"], scene_info["ball"], scene_info["platform"],
+                            ball_dx, ball_dy, 100 if landing is None else landing.x, command)
+        previous_ball_position = scene_info["ball"]
+
+    replay_game(replay, on_frame)
+    return recorder.to_array()
+
+
+def write_shard(folder, rows: np.ndarray) -> str:
+    """
+    Write the rows as a new shard in the dataset folder
+
+    @return The path of the shard
+    """
+    os.makedirs(folder, exist_ok=True)
+    name = "shard_{0}_{1}".format(time.time_ns(), os.getpid())
+    temp_path = os.path.join(folder, "." + name + ".tmp")
+    path = os.path.join(folder, name + ".npy")
+    with open(temp_path, "wb") as f:
+        np.save(f, np.asarray(rows, dtype=DATASET_DTYPE))
+    os.replace(temp_path, path)
+    return path
+
+
+@contextmanager
+def _dataset_lock(folder):
+    """
+    Hold the lock of the dataset folder, waiting while another process holds it
+    """
+    fd = os.open(os.path.join(folder, _LOCK_FILENAME), os.O_CREAT | os.O_RDWR)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        else:
+            while True:
+                try:
+                    # It waits for about 10 seconds before raising
+                    msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    pass
+        yield
+    finally:
+        # Closing the file releases the lock
+        os.close(fd)
+
+
+def _array_header(num_rows) -> bytes:
+    """
+    Get the `.npy` header of the dataset rows. NumPy pads the header for
+    the growth of the shape, so its size doesn't depend on `num_rows`.
+    """
+    buffer = io.BytesIO()
+    np.lib.format.write_array_header_1_0(buffer, {
+        "descr": np.lib.format.dtype_to_descr(DATASET_DTYPE),
+        "fortran_order": False,
+        "shape": (num_rows,),
+    })
+    return buffer.getvalue()
+
+
+def _read_num_rows(f):
+    """
+    Read the number of the rows of a dataset file
+
+    @return The number of rows, or None if the header can't be rewritten for more rows in place
+    """
+    version = np.lib.format.read_magic(f)
+    if version == (1, 0):
+        shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+    else:
+        shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+    if (dtype != DATASET_DTYPE or fortran_order or len(shape) != 1
+            or f.tell() != len(_array_header(shape[0]))):
+        return None
+    return shape[0]
+
+
+def _write_rows(f, sources):
+    """
+    Write the rows of the sources at the position of the file, chunk by chunk
+    """
+    for source in sources:
+        for start in range(0, len(source), _COPY_CHUNK_SIZE):
+            f.write(np.ascontiguousarray(source[start:start + _COPY_CHUNK_SIZE], dtype=DATASET_DTYPE).tobytes())
+
+
+def _append_rows(path, sources) -> bool:
+    """
+    Append the rows to the dataset file in place. The rows are written before the
+    header counts them, so the readers never see a row which is not written yet.
+
+    @return Whether the rows are appended. The file is not changed if its header can't grow.
+    """
+    with open(path, "r+b") as f:
+        num_rows = _read_num_rows(f)
+        if num_rows is None:
+            return False
+        header = _array_header(num_rows)
+        # Drop the rows which a crashed merge wrote without counting them
+        f.seek(len(header) + num_rows * DATASET_DTYPE.itemsize)
+        _write_rows(f, sources)
+        f.truncate()
+        f.flush()
+        os.fsync(f.fileno())
+
+        f.seek(0)
+        f.write(_array_header(num_rows + sum(len(source) for source in sources)))
+        f.flush()
+    return True
+
+
+def _write_dataset(path, sources):
+    """
+    Write the rows as a new dataset file, which is written to a temporary file and renamed
+    """
+    temp_path = "{0}.{1}_{2}.tmp".format(path, time.time_ns(), os.getpid())
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(_array_header(sum(len(source) for source in sources)))
+            _write_rows(f, sources)
+        os.replace(temp_path, path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+
+def compact_dataset(folder):
+    """
+    Append the rows of the shards in the dataset folder to `dataset.npy`, and remove the shards.
+    Only the rows of the shards are written, chunk by chunk, so the time and the memory
+    usage don't grow with the dataset. The shards are merged under the lock of the folder,
+    so the concurrent calls don't merge a shard twice.
+
+    @return The path of `dataset.npy`, or None if the folder has no data
+    """
+    path = os.path.join(folder, DATASET_FILENAME)
+    if not glob.glob(os.path.join(folder, SHARD_PATTERN)):
+        return path if os.path.exists(path) else None
+
+    with _dataset_lock(folder):
+        # List the shards again, since another process may have merged them
+        shard_paths = sorted(glob.glob(os.path.join(folder, SHARD_PATTERN)))
+        if not shard_paths:
+            return path if os.path.exists(path) else None
+
+        sources = [np.load(shard_path, mmap_mode="r") for shard_path in shard_paths]
+        if not os.path.exists(path):
+            _write_dataset(path, sources)
+        elif not _append_rows(path, sources):
+            # The file written by another version of NumPy is rewritten once with a growable header
+            _write_dataset(path, [np.load(path, mmap_mode="r")] + sources)
+        # Release the memory maps before removing the files
+        del sources
+
+        for shard_path in shard_paths:
+            os.remove(shard_path)
+    return path
+
+
+def open_dataset(folder) -> np.ndarray:
+    """
+    Merge the shards and memory-map the dataset read-only
+
+    @return The structured array of `DATASET_DTYPE`, or None if the folder has no data
+    """
+    path = compact_dataset(folder)
+    if path is None:
+        return None
+    return np.load(path, mmap_mode="r")
@@ -0,0 +1,177 @@
+"""
+Evaluate an AI script by playing headless games, in a process pool.
+
+The accuracy of the model on the collected frames does not tell if the platform
+catches the ball, so the `MLPlay` class of the AI script plays every level and
+difficulty over several seeds, in the same way as `collect_runner.py`. The game
+results are aggregated by level and difficulty into a table:
+
+- pass: the fraction of the episodes ending in `FINISH`
+- clear: the fraction of the episodes without bricks left
+- frame_used, brick_remain, catches: the means of the game result fields
+
+The tasks are the same for the same arguments, so the results of different
+models are comparable episode by episode. A collector writes its data into a
+temporary folder, which is removed after the evaluation.
+
+Example:
+    python ml/evaluate.py --ai ml/ml_play_model.py --levels 1-24 \
+        --difficulties EASY NORMAL --episodes 10 --output evaluation.json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+ROOT_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_PATH not in sys.path:
+    sys.path.append(ROOT_PATH)
+
+from ml.collect_runner import load_ml_play_class, make_tasks, parse_levels, run_episode
+
+_worker_config = {}
+
+# (name, width, format) of the columns of the table. The difficulty is aligned left.
+_TABLE_COLUMNS = [
+    ("level", 5, "{0:>5}"), ("difficulty", 10, "{0:<10}"), ("episodes", 8, "{0:>8}"),
+    ("pass", 6, "{0:>6.1%}"), ("clear", 6, "{0:>6.1%}"), ("frame_used", 10, "{0:>10.1f}"),
+    ("brick_remain", 12, "{0:>12.2f}"), ("catches", 8, "{0:>8.1f}"),
+]
+
+
+def _init_worker(ai_path, max_frames, ai_kwargs):
+    _worker_config.update({
+        "ml_play_class": load_ml_play_class(ai_path),
+        "max_frames": max_frames,
+        "ai_kwargs": ai_kwargs,
+    })
+
+
+def _run_task(task):
+    level, difficulty, seed = task
+    config = _worker_config
+    start_cpu_time = time.process_time()
+    result = run_episode(config["ml_play_class"], level, difficulty, seed, config["max_frames"],
+                         **config["ai_kwargs"])
+    result["cpu_seconds"] = time.process_time() - start_cpu_time
+    return result
+
+
+def summarize(results):
+    """
+    Aggregate the episode results by level and difficulty
+
+    @return The list of the table rows, sorted by level and difficulty, and the row of all episodes
+    """
+    groups = defaultdict(list)
+    for result in results:
+        groups[(result["level"], result["difficulty"])].append(result)
+
+    def make_row(level, difficulty, episodes):
+        count = len(episodes)
+        return {
+            "level": level,
+            "difficulty": difficulty,
+            "episodes": count,
+            "pass": sum(episode["state"] == "FINISH" for episode in episodes) / count,
+            "clear": sum(episode["brick_remain"] == 0 for episode in episodes) / count,
+            "frame_used": sum(episode["frame_used"] for episode in episodes) / count,
+            "brick_remain": sum(episode["brick_remain"] for episode in episodes) / count,
+            "catches": sum(episode["count_of_catching_ball"] for episode in episodes) / count,
+        }
+
+    rows = [make_row(level, difficulty, groups[(level, difficulty)]) for level, difficulty in sorted(groups)]
+    if results:
+        rows.append(make_row("all", "", results))
+    return rows
+
+
+def format_table(rows):
+    """
+    Format the summary rows as a text table
+    """
+    lines = [" ".join(name.ljust(width) if name == "difficulty" else name.rjust(width)
+                      for name, width, _ in _TABLE_COLUMNS)]
+    for row in rows:
+        lines.append(" ".join(format_.format(row[name]) for name, _, format_ in _TABLE_COLUMNS))
+    return "\n".join(lines)
+
+
+def evaluate(ai_path, levels, difficulties, episodes, workers=None, base_seed=0, max_frames=30000,
+             **ai_kwargs):
+    """
+    Play the episodes in a process pool
+
+    @param ai_kwargs The other keyword arguments of `MLPlay`, e.g. `model_store`
+    @return The dict of the summary rows, the throughput and the episode results
+    """
+    tasks = make_tasks(levels, difficulties, episodes, base_seed)
+    workers = workers or os.cpu_count()
+    chunksize = max(1, len(tasks) // (workers * 8))
+
+    start_time = time.perf_counter()
+    with tempfile.TemporaryDirectory(prefix="arkanoid_evaluation_") as data_folder:
+        ai_kwargs.setdefault("data_folder", data_folder)
+        with multiprocessing.Pool(workers, initializer=_init_worker,
+                                  initargs=(ai_path, max_frames, ai_kwargs)) as pool:
+            results = list(pool.imap_unordered(_run_task, tasks, chunksize=chunksize))
+    elapsed = time.perf_counter() - start_time
+
+    results.sort(key=lambda result: (result["level"], result["difficulty"], result["seed"]))
+    total_frames = sum(result["frame_used"] for result in results)
+    cpu_seconds = sum(result["cpu_seconds"] for result in results)
+    throughput = {
+        "episodes": len(results),
+        "frames": total_frames,
+        "seconds": elapsed,
+        "workers": workers,
+        "frames_per_second": total_frames / elapsed if elapsed else 0.0,
+        # The frames played by a core in a second of its CPU time
+        "frames_per_cpu_second": total_frames / cpu_seconds if cpu_seconds else 0.0,
+    }
+    return {"summary": summarize(results), "throughput": throughput, "episodes": results}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate an Arkanoid AI script with headless games in parallel.")
+    parser.add_argument("--ai", type=str, default=os.path.join(ROOT_PATH, "ml", "ml_play_model.py"),
+                        help="Path to the AI script containing the MLPlay class.")
+    parser.add_argument("--levels", type=str, default="1-24",
+                        help="Levels to play, e.g. '1-5,8'.")
+    parser.add_argument("--difficulties", nargs="+", default=["EASY", "NORMAL"],
+                        choices=["EASY", "NORMAL"], help="Difficulties to play.")
+    parser.add_argument("--episodes", type=int, default=5,
+                        help="Episodes (seeds) for each level and difficulty.")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="The seed of the first episode. Each episode uses the next seed.")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Number of worker processes. Use all cores by default.")
+    parser.add_argument("--max_frames", type=int, default=30000,
+                        help="Stop an episode after this many frames.")
+    parser.add_argument("--model_store", type=str, default=None,
+                        help="The model store folder passed to the AI script.")
+    parser.add_argument("--output", type=str, default=None,
+                        help="Save the summary, the throughput and the episode results as a JSON file.")
+    args = parser.parse_args()
+
+    ai_kwargs = {"model_store": args.model_store} if args.model_store else {}
+    evaluation = evaluate(os.path.abspath(args.ai), parse_levels(args.levels), args.difficulties,
+                          args.episodes, args.workers, args.seed, args.max_frames, **ai_kwargs)
+
+    print(format_table(evaluation["summary"]))
+    throughput = evaluation["throughput"]
+    print(f"{throughput['episodes']} episodes, {throughput['frames']} frames in {throughput['seconds']:.1f}s "
+          f"with {throughput['workers']} workers: {throughput['frames_per_second']:.0f} frames/s "
+          f"({throughput['frames_per_cpu_second']:.0f} frames per CPU second)")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(evaluation, f, indent=2)
+        print(f"Evaluation saved to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
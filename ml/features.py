@@ -0,0 +1,96 @@
+"""
+The schema of the model features, shared by the trainer and the AI scripts.
+
+A feature is computed from the columns of the dataset (see `ml/dataset.py`).
+The function of a feature should only use arithmetic operations, so the same
+function works on the NumPy columns of a whole dataset for training and on the
+values of a single frame for inference.
+
+Example:
+    register_feature("distance", lambda columns: columns["predicted_x"] - columns["platform_x"])
+"""
+import operator
+from collections import namedtuple
+
+import numpy as np
+
+from ml.dataset import NO_LABEL
+
+
+class Feature(namedtuple("Feature", ["name", "function"])):
+    """
+    @field name The name of the feature
+    @field function Compute the feature from the columns
+    """
+    __slots__ = ()
+
+
+FEATURES = []
+
+
+def register_feature(name, function=None):
+    """
+    Append a feature to the schema
+
+    @param name The name of the feature
+    @param function The function computing the feature from the columns.
+           The column `name` is used if it is not given.
+    """
+    if name in feature_names():
+        raise ValueError("The feature '{0}' is already registered".format(name))
+    FEATURES.append(Feature(name, function or operator.itemgetter(name)))
+
+
+def feature_names():
+    return [feature.name for feature in FEATURES]
+
+
+def feature_matrix(columns) -> np.ndarray:
+    """
+    Compute the features of all frames
+
+    @param columns The structured array of the dataset, or a dict of column arrays
+    @return The array of shape (number of frames, number of features)
+    """
+    values = [np.asarray(feature.function(columns)) for feature in FEATURES]
+    # Fill the features as contiguous rows, which is faster than stacking the strided columns
+    matrix = np.empty((len(values), len(values[0])), dtype=np.result_type(*values))
+    for i, value in enumerate(values):
+        matrix[i] = value
+    return matrix.T
+
+
+def feature_values(columns) -> tuple:
+    """
+    Compute the features of a single frame
+
+    @param columns A dict of the column values of the frame
+    @return The tuple of the feature values
+    """
+    return tuple(feature.function(columns) for feature in FEATURES)
+
+
+def feature_vector(columns) -> np.ndarray:
+    """
+    Compute the features of a single frame
+
+    @param columns A dict of the column values of the frame
+    @return The array of shape (1, number of features) for `model.predict()`
+    """
+    return np.array([feature_values(columns)])
+
+
+def labeled_features(dataset):
+    """
+    Compute the features and the labels of the labeled frames in the dataset.
+    The frames without labels (e.g. serving the ball) are skipped.
+
+    @return (features, labels)
+    """
+    labels = np.asarray(dataset["label"])
+    labeled = labels != NO_LABEL
+    return feature_matrix(dataset)[labeled], labels[labeled].astype(np.int64)
+
+
+for _name in ("ball_x", "ball_y", "platform_x", "dx", "dy", "predicted_x"):
+    register_feature(_name)
@@ -0,0 +1,422 @@
+"""
+The low-latency predictor compiled from a trained model for the AI scripts.
+
+Calling `model.predict()` of scikit-learn on a single frame goes through the
+input validation and, for KNN, a full neighbor search, which costs hundreds of
+microseconds or more per frame. The features are small integers and the
+frames of the games repeat a lot, so `compile_model()` builds a lookup table
+from the feature values to the label:
+
+- The table is filled at load time by predicting the training samples of the
+  model (or the given samples) in a single batch, with the model itself.
+  A precomputed table (e.g. from the model store) can be given instead.
+- The table is a `PackedTable` of NumPy arrays, which packs the feature values of
+  a frame into a sorted int64 key. The arrays of the model store are memory-mapped,
+  so the game processes share one copy of the table.
+- A missed frame is predicted once and then stored in a small cache. The nearest
+  neighbors of KNN with uniform weights are searched in a KD-tree of SciPy
+  without the overhead of scikit-learn, and the MLP and the trees are evaluated
+  in NumPy by `MLPModel` and `TreeModel`; the other models use `model.predict()`.
+
+Example:
+    predictor = compile_model(model)
+    label = predictor.predict(feature_values(columns))
+    print(predictor.latency_report())
+"""
+import time
+from collections import deque
+
+import numpy as np
+
+try:
+    from scipy.spatial import cKDTree
+except ImportError:
+    cKDTree = None
+
+# The number of the latest calls kept for the latency report
+LATENCY_WINDOW = 100000
+
+# The largest packed key of `PackedTable`
+_MAX_PACKED_KEY = np.iinfo(np.int64).max
+
+
+class PackedTable:
+    """
+    The read-only lookup table from the integer feature values to the label.
+
+    The values of each feature are offset to start from 0, and the values of a frame
+    are packed into an int64 key in the mixed radix of the value ranges. The keys are
+    sorted, so a frame is looked up by a binary search in the arrays, which are not copied.
+    """
+
+    def __init__(self, keys, labels, offsets, sizes):
+        """
+        @param keys The sorted packed keys
+        @param labels The labels of the keys
+        @param offsets The smallest value of each feature
+        @param sizes The number of the values of each feature from the offset
+        """
+        # The plain array views of the memory maps, which are much faster to index
+        self.keys = None if keys is None else np.asarray(keys)
+        self.labels = None if labels is None else np.asarray(labels)
+        self.offsets = tuple(int(offset) for offset in offsets)
+        self.sizes = tuple(int(size) for size in sizes)
+        self._columns = tuple(zip(self.offsets, self.sizes))
+
+    @classmethod
+    def from_features(cls, features, labels):
+        """
+        Build the table of the samples
+
+        @return The table, or None if the features are not integers or the keys don't fit in int64
+        """
+        features = np.asarray(features)
+        if features.ndim != 2 or not len(features) or not np.array_equal(features, np.floor(features)):
+            return None
+        offsets = features.min(axis=0).astype(np.int64)
+        sizes = features.max(axis=0).astype(np.int64) - offsets + 1
+        if np.prod([int(size) for size in sizes], dtype=object) > _MAX_PACKED_KEY:
+            return None
+
+        table = cls(None, None, offsets, sizes)
+        keys = table.pack(features)
+        order = np.argsort(keys, kind="stable")
+        table.keys = keys[order]
+        table.labels = np.asarray(labels)[order]
+        return table
+
+    def pack(self, features) -> np.ndarray:
+        """
+        Pack the rows of the features in the value ranges of the table
+        """
+        keys = np.zeros(len(features), dtype=np.int64)
+        for column, (offset, size) in enumerate(self._columns):
+            keys = keys * size + (np.asarray(features)[:, column].astype(np.int64) - offset)
+        return keys
+
+    def __len__(self):
+        return len(self.keys)
+
+    def get(self, features):
+        """
+        Look up the label of the feature values of a frame
+
+        @return The label, or None if the frame is not in the table
+        """
+        key = 0
+        for value, (offset, size) in zip(features, self._columns):
+            value -= offset
+            if not 0 <= value < size or value != int(value):
+                return None
+            key = key * size + int(value)
+        keys = self.keys
+        i = int(keys.searchsorted(key))
+        if i < len(keys) and keys.item(i) == key:
+            return self.labels.item(i)
+        return None
+
+
+class KNNModel:
+    """
+    KNN with uniform weights and the euclidean distance, predicted by a KD-tree of SciPy.
+    The samples are not copied, so a memory-mapped array is shared by the processes.
+    """
+
+    def __init__(self, samples, labels, classes, n_neighbors):
+        """
+        @param samples The float64 array of the training samples
+        @param labels The class indices of the samples
+        @param classes The labels of the class indices
+        @param n_neighbors The number of the neighbors voting for the label
+        """
+        self.samples = samples
+        self.labels = labels
+        self.classes = classes
+        self.n_neighbors = n_neighbors
+        self._tree = cKDTree(samples, copy_data=False)
+
+    @classmethod
+    def from_sklearn(cls, model):
+        return cls(np.ascontiguousarray(model._fit_X, dtype=np.float64), np.asarray(model._y),
+                   np.asarray(model.classes_), model.n_neighbors)
+
+    @staticmethod
+    def supports(model) -> bool:
+        """
+        Check if the scikit-learn model is KNN with uniform weights and the euclidean distance
+        """
+        return (cKDTree is not None and hasattr(model, "_fit_X") and hasattr(model, "n_neighbors") and
+                getattr(model, "weights", None) == "uniform" and
+                getattr(model, "effective_metric_", None) == "euclidean")
+
+    def predict(self, features) -> np.ndarray:
+        features = np.asarray(features, dtype=np.float64)
+        _, indices = self._tree.query(features, k=self.n_neighbors)
+        indices = indices.reshape(len(features), -1)
+        votes = np.zeros((len(features), len(self.classes)), dtype=np.int64)
+        np.add.at(votes, (np.arange(len(features))[:, np.newaxis], self.labels[indices]), 1)
+        # The smallest class wins a tie, as the mode in scikit-learn
+        return self.classes[votes.argmax(axis=1)]
+
+    def predict_one(self, features):
+        _, indices = self._tree.query(features, k=self.n_neighbors)
+        votes = np.bincount(self.labels[np.atleast_1d(indices)], minlength=len(self.classes))
+        return self.classes[votes.argmax()].item()
+
+
+_ACTIVATIONS = {
+    "identity": lambda x: x,
+    "relu": lambda x: np.maximum(x, 0),
+    "tanh": np.tanh,
+    "logistic": lambda x: 1 / (1 + np.exp(-x)),
+}
+
+
+class MLPModel:
+    """
+    The forward pass of a trained `MLPClassifier` in NumPy
+    """
+
+    def __init__(self, weights, biases, activation, classes):
+        """
+        @param weights The weight matrices of the layers
+        @param biases The bias vectors of the layers
+        @param activation The name of the activation of the hidden layers
+        @param classes The labels of the outputs
+        """
+        self.weights = weights
+        self.biases = biases
+        self.activation = activation
+        self.classes = classes
+        self._activation = _ACTIVATIONS[activation]
+
+    @classmethod
+    def from_sklearn(cls, model):
+        return cls(model.coefs_, model.intercepts_, model.activation, np.asarray(model.classes_))
+
+    @staticmethod
+    def supports(model) -> bool:
+        return (hasattr(model, "coefs_") and hasattr(model, "classes_") and
+                getattr(model, "activation", None) in _ACTIVATIONS)
+
+    def predict(self, features) -> np.ndarray:
+        values = np.asarray(features, dtype=np.float64)
+        for weight, bias in zip(self.weights[:-1], self.biases[:-1]):
+            values = self._activation(values @ weight + bias)
+        values = values @ self.weights[-1] + self.biases[-1]
+        # The output is monotonic to the last layer, so the output activation is skipped
+        if values.shape[1] == 1:
+            return self.classes[(values[:, 0] > 0).astype(np.int64)]
+        return self.classes[values.argmax(axis=1)]
+
+    def predict_one(self, features):
+        return self.predict([features])[0].item()
+
+
+class TreeModel:
+    """
+    The decision tree or the forest averaging the probabilities of its trees
+    (e.g. `RandomForestClassifier`), evaluated in NumPy.
+    The nodes of all trees are concatenated in the arrays.
+    """
+
+    def __init__(self, roots, children_left, children_right, feature, threshold, value, classes):
+        """
+        @param roots The root node of each tree
+        @param children_left The left child of each node, or -1 for a leaf
+        @param children_right The right child of each node
+        @param feature The feature compared at each node
+        @param threshold The node goes left if the feature is not greater than the threshold
+        @param value The probabilities of the classes at each node
+        @param classes The labels of the classes
+        """
+        self.roots = roots
+        self.children_left = children_left
+        self.children_right = children_right
+        self.feature = feature
+        self.threshold = threshold
+        self.value = value
+        self.classes = classes
+
+    @classmethod
+    def from_sklearn(cls, model):
+        trees = [model.tree_] if hasattr(model, "tree_") else [tree.tree_ for tree in model.estimators_]
+        roots, children_left, children_right, values = [], [], [], []
+        offset = 0
+        for tree in trees:
+            roots.append(offset)
+            is_leaf = tree.children_left == -1
+            children_left.append(np.where(is_leaf, -1, tree.children_left + offset))
+            children_right.append(np.where(is_leaf, -1, tree.children_right + offset))
+            value = tree.value[:, 0, :]
+            values.append(value / value.sum(axis=1, keepdims=True))
+            offset += tree.node_count
+        return cls(np.array(roots), np.concatenate(children_left), np.concatenate(children_right),
+                   np.concatenate([tree.feature for tree in trees]),
+                   np.concatenate([tree.threshold for tree in trees]),
+                   np.concatenate(values), np.asarray(model.classes_))
+
+    @staticmethod
+    def supports(model) -> bool:
+        if getattr(model, "n_outputs_", None) != 1 or not hasattr(model, "classes_"):
+            return False
+        if hasattr(model, "tree_"):
+            return True
+        # Only the forests averaging the probabilities of the trees on all features,
+        # not the boosting or the bagging of the feature subsets
+        estimators = getattr(model, "estimators_", None)
+        return (isinstance(estimators, list) and bool(estimators) and
+                not hasattr(model, "estimators_features_") and
+                all(hasattr(tree, "tree_") for tree in estimators))
+
+    def predict(self, features) -> np.ndarray:
+        # The trees of scikit-learn compare the features in float32
+        features = np.asarray(features, dtype=np.float32)
+        rows = np.arange(len(features))[:, np.newaxis]
+        nodes = np.broadcast_to(self.roots, (len(features), len(self.roots))).copy()
+        while True:
+            left = self.children_left[nodes]
+            internal = left != -1
+            if not internal.any():
+                break
+            go_left = features[rows, self.feature[nodes]] <= self.threshold[nodes]
+            nodes = np.where(internal, np.where(go_left, left, self.children_right[nodes]), nodes)
+        probabilities = self.value[nodes].mean(axis=1)
+        return self.classes[probabilities.argmax(axis=1)]
+
+    def predict_one(self, features):
+        return self.predict([features])[0].item()
+
+
+class CompiledModel:
+    """
+    The frame-time predictor of a trained model
+    """
+
+    def __init__(self, model, features=None, table=None, max_cache_size=1 << 16):
+        """
+        @param model The trained model of scikit-learn, `KNNModel` or `MLPModel`
+        @param features The samples to fill the lookup table.
+               The training samples of the model are used if it is not given.
+        @param table The precomputed `PackedTable`, or the lookup table (features, labels).
+               `features` is ignored if it is given.
+        @param max_cache_size Clear the cache of the missed frames when there are more entries than this
+        """
+        self.model = model
+        self.max_cache_size = max_cache_size
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.num_calls = 0
+        self.num_hits = 0
+
+        if hasattr(model, "predict_one"):
+            self._fast_model = model
+        elif KNNModel.supports(model):
+            self._fast_model = KNNModel.from_sklearn(model)
+        elif MLPModel.supports(model):
+            self._fast_model = MLPModel.from_sklearn(model)
+        elif TreeModel.supports(model):
+            self._fast_model = TreeModel.from_sklearn(model)
+        else:
+            self._fast_model = None
+
+        self._table = None
+        self._cache = {}
+        if table is not None:
+            self._table = table if isinstance(table, PackedTable) else PackedTable.from_features(*table)
+            return
+        if features is None:
+            features = getattr(model, "_fit_X", None)
+        if features is not None and len(features):
+            self.fill(features)
+
+    def clear(self):
+        """
+        Drop the lookup table and the cache of the missed frames
+        """
+        self._table = None
+        self._cache.clear()
+
+    def fill(self, features):
+        """
+        Predict the samples with the model in a batch and build the lookup table of them.
+        If the features are not integers, the predictions are cached up to `max_cache_size` instead.
+        """
+        features, labels = build_table(self.model, features)
+        self._table = PackedTable.from_features(features, labels)
+        if self._table is None:
+            self._cache.update(zip(map(tuple, features[:self.max_cache_size].tolist()),
+                                   labels[:self.max_cache_size].tolist()))
+
+    def predict(self, features):
+        """
+        Predict the label of a frame
+
+        @param features The feature values of the frame, in the order of `ml/features.py`
+        @return The label
+        """
+        start = time.perf_counter_ns()
+        key = tuple(features)
+        label = self._cache.get(key)
+        if label is None and self._table is not None:
+            label = self._table.get(key)
+        if label is None:
+            label = self._predict_missed(key)
+            if len(self._cache) >= self.max_cache_size:
+                self._cache.clear()
+            self._cache[key] = label
+        else:
+            self.num_hits += 1
+        self.num_calls += 1
+        self.latencies.append(time.perf_counter_ns() - start)
+        return label
+
+    def _predict_missed(self, key):
+        if self._fast_model is None:
+            return self.model.predict(np.array([key]))[0].item()
+        return self._fast_model.predict_one(key)
+
+    def agreement(self, features, model=None) -> float:
+        """
+        Get the fraction of the samples predicted the same as the original model.
+        The lookup table is not used, so the predictions of the missed frames are checked.
+
+        @param model The original model. `self.model` is used if it is not given.
+        """
+        features = np.asarray(features)
+        if not len(features):
+            return 1.0
+        expected = (model or self.model).predict(features)
+        predicted = np.array([self._predict_missed(tuple(key)) for key in features.tolist()])
+        return float(np.mean(predicted == expected))
+
+    def latency_report(self) -> dict:
+        """
+        Get the statistics of the latency of the latest calls in microseconds
+        """
+        report = {"calls": self.num_calls, "hits": self.num_hits}
+        if self.latencies:
+            latencies = np.fromiter(self.latencies, dtype=np.int64) / 1000
+            report.update({
+                "mean_us": float(latencies.mean()),
+                "p50_us": float(np.percentile(latencies, 50)),
+                "p99_us": float(np.percentile(latencies, 99)),
+                "max_us": float(latencies.max()),
+            })
+        return report
+
+
+def build_table(model, features, max_table_size=1 << 20):
+    """
+    Predict the unique samples with the model in a batch
+
+    @return The lookup table (features, labels)
+    """
+    features = np.unique(np.asarray(features), axis=0)[:max_table_size]
+    return features, np.asarray(model.predict(features))
+
+
+def compile_model(model, features=None, table=None) -> CompiledModel:
+    """
+    Compile the trained model to the frame-time predictor. See `CompiledModel`.
+    """
+    return CompiledModel(model, features, table)
@@ -2,123 +2,135 @@
 Script to train a machine learning model for Arkanoid game.
 """
 
-import pickle
 import numpy as np
-from sklearn.model_selection import train_test_split
-from sklearn.neighbors import KNeighborsClassifier
-from sklearn.metrics import accuracy_score
+from sklearn.neural_network import MLPClassifier
+import hashlib
 import os
-import glob
+import sys
 import argparse
 
-# from sklearn.ensemble import RandomForestClassifier  # 隨機森林
+ROOT_PATH = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if ROOT_PATH not in sys.path:
+    sys.path.append(ROOT_PATH)
 
-def preprocess_data(data):
+from ml.data_loader import CLASSES, iter_batches
+from ml.features import labeled_features
+from ml.model_selection import DEFAULT_CANDIDATES, DEFAULT_LATENCY_BUDGET_US, load_candidates, select_model
+from ml.model_store import DEFAULT_MODEL_STORE, ModelStore, data_hash, hash_batch
+
+def preprocess_data(dataset):
+    """
+    從資料集取出特徵 (見 ml/features.py) 與標籤，略過沒有標籤的影格 (例如發球)
+    """
     print("進入 preprocess_data 函式")
-    features = []
-    labels = []
-    previous_ball_position = None
-
-    for item in data:
-        scene_info = item["scene_info"]
-        command = item["command"]
-        predicted_x = item.get("predicted_x", None)  # 獲取 predicted_x，如果不存在則為 None
-
-        if scene_info and command:
-            ball_x = scene_info["ball"][0]
-            ball_y = scene_info["ball"][1]
-            platform_x = scene_info["platform"][0]
-
-            ball_dx = 0
-            ball_dy = 0
-            if previous_ball_position:
-                ball_dx = ball_x - previous_ball_position[0]
-                ball_dy = ball_y - previous_ball_position[1]
-
-            # 特徵包含 6 個值：ball_x, ball_y, platform_x, ball_dx, ball_dy, predicted_x
-            feature = [ball_x, ball_y, platform_x, ball_dx, ball_dy]
-
-            # 如果 predicted_x 存在，加入特徵
-            if predicted_x is not None:
-                feature.append(predicted_x)
-            else:
-                feature.append(platform_x)  # 如果 predicted_x 為 None，使用平台當前位置
-
-            if command == "MOVE_LEFT":
-                label = 0
-            elif command == "MOVE_RIGHT":
-                label = 1
-            elif command == "NONE":
-                label = 2
-            else:
-                continue
-
-            features.append(feature)
-            labels.append(label)
-
-        previous_ball_position = scene_info["ball"]
+    features, labels = labeled_features(dataset)
 
     print("preprocess_data 函式執行完成，返回特徵和標籤")
-    return np.array(features), np.array(labels)
-
-def train_model(features, labels):
+    return features, labels
+
+def train_model(features, labels, candidates=DEFAULT_CANDIDATES, workers=None,
+                latency_budget_us=DEFAULT_LATENCY_BUDGET_US, cv=5, episode_ids=None):
+    """
+    交叉驗證候選的模型與超參數 (見 ml/model_selection.py)，選出延遲在預算內準確率最高的模型。
+    依 episode_ids 切分訓練與測試資料，同一個 episode 的影格不會同時出現在兩邊。
+    """
     print("進入 train_model 函式")
     print(f"Features shape: {features.shape}, Labels shape: {labels.shape}")
     print(f"len of features: {len(features)}, len of labels: {len(labels)}")
-    train_features, test_features, train_labels, test_labels = train_test_split(
-        features, labels, test_size=0.2, random_state=42
-    )
-    print(f"Train set: {len(train_features)}, Test set: {len(test_features)}")
-
-
-    model = KNeighborsClassifier(n_neighbors=20)  # 使用 KNN 演算法
-    model.fit(train_features, train_labels)
 
-    test_accuracy = accuracy_score(test_labels, model.predict(test_features))
-    print(f"Test Accuracy: {test_accuracy:.4f}")
+    model, report = select_model(features, labels, candidates, cv, workers, latency_budget_us,
+                                 groups=episode_ids)
+    print(f"Test Accuracy: {report['test_accuracy']:.4f}")
 
-    print("train_model 函式執行完成，返回模型")
+    print("train_model 函式執行完成，返回模型、測試準確率和報告")
     print(model)
-    return model
+    return model, report["test_accuracy"], report
 
-def save_model(model, filename="arkanoid_model.pickle"):
+def save_model(model, store_folder=DEFAULT_MODEL_STORE, **metadata):
+    """
+    將模型存成模型庫的新版本 (見 ml/model_store.py)，metadata 包含資料的 hash 與準確率
+    """
     print("進入 save_model 函式")
     try:
-        with open(filename, "wb") as f:
-            pickle.dump(model, f)
-        print(f"模型儲存成功: {filename}")
+        version = ModelStore(store_folder).save(model, **metadata)
+        print(f"模型儲存成功: {store_folder} 版本 {version}")
     except Exception as e:
         print(f"模型儲存失敗: {e}")
 
     print("save_model 函式執行完成")
 
-def load_data_from_pickle(folder_path):
-    print("進入 load_data_from_pickle 函式")
-    all_data = []
-    file_pattern = os.path.join(folder_path, "*.pickle")
-    filenames = glob.glob(file_pattern)
-
-    if not filenames:
-        print(f"Error: No pickle files found in folder '{folder_path}'.")
-        print("load_data_from_pickle 函式執行完成 (No files found)，返回 None")
-        return None
-
-    print(f"Found {len(filenames)} pickle files in folder '{folder_path}'.")
-
-    for filename in filenames:
-        try:
-            with open(filename, "rb") as f:
-                data = pickle.load(f)
-            print(f"Data loaded from {filename}")
-            all_data.extend(data)
-        except FileNotFoundError:
-            pass
-        except Exception as e:
-            print(f"Error loading data from {filename}: {e}")
-
-    print(f"Total data loaded: {len(all_data)} items")
-    print("load_data_from_pickle 函式執行完成，返回資料")
-    return all_data
+def load_features(data_folders, batch_size=65536, workers=None):
+    """
+    平行載入所有資料夾的特徵、標籤與每個影格的 episode id (見 ml/data_loader.py)
+    """
+    print("進入 load_features 函式")
+    all_features = []
+    all_labels = []
+    all_episode_ids = []
+    for features, labels, episode_ids in iter_batches(data_folders, batch_size, workers, episodes=True):
+        all_features.append(features)
+        all_labels.append(labels)
+        all_episode_ids.append(episode_ids)
+
+    if not all_features:
+        print("load_features 函式執行完成 (No data found)，返回 None")
+        return None, None, None
+
+    print("load_features 函式執行完成，返回特徵、標籤和 episode id")
+    return np.concatenate(all_features), np.concatenate(all_labels), np.concatenate(all_episode_ids)
+
+# 每 HOLDOUT_FOLDS 個 episode 中有一個不參與訓練，用來計算測試準確率
+HOLDOUT_FOLDS = 5
+
+def holdout_mask(episode_ids, folds=HOLDOUT_FOLDS):
+    """
+    依 episode id 選出測試用的影格，同一個 episode 的影格都在訓練或測試的同一邊
+    """
+    return np.asarray(episode_ids) % folds == folds - 1
+
+def train_model_incremental(data_folders, batch_size=65536, workers=None, epochs=3, seed=42):
+    """
+    以 partial_fit 逐批訓練，不需要把所有資料載入記憶體。
+    依 episode 分出測試資料 (見 holdout_mask)，相鄰影格幾乎相同，所以不能在同一個 episode 中切分。
+    """
+    print("進入 train_model_incremental 函式")
+    model = MLPClassifier(hidden_layer_sizes=(64, 64), random_state=seed)
+
+    num_trained = 0
+    num_held_out = 0
+    hasher = hashlib.sha256()
+    for epoch in range(epochs):
+        # 每一輪以不同的 seed 重新打亂批次，測試用的 episode 由 holdout_mask 決定，不受打亂影響
+        for features, labels, episode_ids in iter_batches(data_folders, batch_size, workers,
+                                                          seed=seed + epoch, episodes=True):
+            held_out = holdout_mask(episode_ids)
+            if epoch == 0:
+                hash_batch(hasher, features, labels)
+                num_held_out += np.count_nonzero(held_out)
+            if not held_out.all():
+                model.partial_fit(features[~held_out], labels[~held_out], classes=CLASSES)
+                num_trained += np.count_nonzero(~held_out)
+        print(f"Epoch {epoch + 1}/{epochs}: {num_trained} samples trained")
+
+    if num_trained == 0:
+        print("Error: No training data. train_model_incremental 函式提前結束")
+        return None, None, None
+    if num_held_out == 0:
+        raise ValueError("No episode is held out for testing. "
+                         "About 1 in {0} episodes is held out, so collect more episodes.".format(HOLDOUT_FOLDS))
+
+    num_correct = 0
+    for features, labels, episode_ids in iter_batches(data_folders, batch_size, workers,
+                                                      seed=seed, episodes=True):
+        held_out = holdout_mask(episode_ids)
+        if held_out.any():
+            num_correct += np.count_nonzero(model.predict(features[held_out]) == labels[held_out])
+    test_accuracy = num_correct / num_held_out
+    print(f"Test Accuracy: {test_accuracy:.4f} ({num_held_out} samples held out)")
+
+    print("train_model_incremental 函式執行完成，返回模型、測試準確率和資料的 hash")
+    print(model)
+    return model, test_accuracy, hasher.hexdigest()
 
 def main():
     print("進入 main 函式")
@@ -126,6 +138,20 @@ def main():
     parser = argparse.ArgumentParser(description="Train Arkanoid ML model.")
     parser.add_argument("--data_folder", type=str, default=None,
                         help="Path to the folder containing game data pickle files.")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Number of processes loading the data. Use all cores by default.")
+    parser.add_argument("--batch_size", type=int, default=65536,
+                        help="Number of samples in a batch when loading the data.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Train batch by batch with partial_fit for the data larger than the memory.")
+    parser.add_argument("--candidates", type=str, default=None,
+                        help="Path to the JSON file of the candidate estimators and grids (see ml/model_selection.py).")
+    parser.add_argument("--cv", type=int, default=5,
+                        help="Number of the folds of the cross-validation.")
+    parser.add_argument("--latency_budget_us", type=float, default=DEFAULT_LATENCY_BUDGET_US,
+                        help="Budget of the p99 latency of predicting a frame in the game, in microseconds.")
+    parser.add_argument("--model_store", type=str, default=DEFAULT_MODEL_STORE,
+                        help="Path to the model store folder, where the model is saved as a new version.")
     args = parser.parse_args()
 
     data_folder_input = args.data_folder
@@ -140,33 +166,34 @@ def main():
         data_folders = ["manual_arkanoid_data_collection", "arkanoid_data_collection"]
         print(f"Using default data folders: {data_folders}")
 
-    all_game_data = []
-
-    if data_folders:
-        for folder_path in data_folders:
-            game_data = load_data_from_pickle(folder_path)
-            if game_data:
-                all_game_data.extend(game_data)
-    else:
+    if not data_folders:
         print("Error: No data folder specified or default data folders not set.")
         print("main 函式提前結束")
         return
 
-    if not all_game_data:
-        print("Error: No game data loaded from any folder. main 函式提前結束")
+    if args.incremental:
+        model, test_accuracy, training_data_hash = train_model_incremental(
+            data_folders, args.batch_size, args.workers)
+        if model:
+            save_model(model, args.model_store, data_hash=training_data_hash, accuracy=test_accuracy,
+                       data_folders=data_folders)
+        print("main 函式執行完成")
         return
 
-    print(f"Total game data loaded from all folders: {len(all_game_data)} items")
-    features, labels = preprocess_data(all_game_data)
-    if features.size == 0:
+    features, labels, episode_ids = load_features(data_folders, args.batch_size, args.workers)
+    if features is None or features.size == 0:
         print("features 為空，main 函式提前結束")
         print("Error: No features extracted from data. Please check your data and preprocessing function.")
         return
+    print(f"Total samples loaded from all folders: {len(labels)}")
 
-    model = train_model(features, labels)
+    candidates = load_candidates(args.candidates) if args.candidates else DEFAULT_CANDIDATES
+    model, test_accuracy, report = train_model(features, labels, candidates, args.workers,
+                                               args.latency_budget_us, args.cv, episode_ids)
 
     if model:
-        save_model(model)
+        save_model(model, args.model_store, data_hash=data_hash(features, labels), accuracy=test_accuracy,
+                   table_features=features, report=report, data_folders=data_folders)
 
 
     print("main 函式執行完成")
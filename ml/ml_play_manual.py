@@ -2,9 +2,9 @@
 The template of the main script of the manual machine learning process
 """
 import pygame
-import pickle
-import datetime
-import os
+
+from src.observation import decode_scene_info
+from ml.dataset import EpisodeRecorder, write_shard
 
 class MLPlay:
     def __init__(self, ai_name, *args, **kwargs):
@@ -12,22 +12,21 @@ class MLPlay:
         Constructor
         """
         self.ball_served = False
-        self.data_buffer = []  # 初始化資料 buffer
+        self.recorder = EpisodeRecorder()  # 用來暫存這一局蒐集到的資料
+        self.previous_ball_position = None  # 記錄上一幀球的位置
 
     def update(self, scene_info, keyboard=None, *args, **kwargs):
         """
         Generate the command according to the received `scene_info`.
         """
+        scene_info = decode_scene_info(scene_info)  # 支援 PACKED 格式的 scene_info
         if keyboard is None:
             keyboard = []
         if (scene_info["status"] == "GAME_OVER" or
                 scene_info["status"] == "GAME_PASS"):
             if scene_info["status"] == "GAME_PASS":  # 只記錄成功通關的資料
-                folder_name = "manual_arkanoid_data_collection"
-                if not os.path.exists(folder_name):
-                    os.makedirs(folder_name)
-                filename = os.path.join(folder_name, f"manual_arkanoid_data_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.pickle")
-                self.save_data_to_pickle(filename)
+                path = write_shard("manual_arkanoid_data_collection", self.recorder.to_array())
+                print(f"Manual data saved to {path}")
             return "RESET"
 
         if pygame.K_q in keyboard:
@@ -44,17 +43,17 @@ class MLPlay:
             command = "NONE"
 
         # 只在發球後才開始記錄資料
-        if scene_info["ball_served"]:  # 移除無法序列化的資料
-            scene_info.pop("bricks")
-            scene_info.pop("hard_bricks")
-            scene_info.pop("frame")
-            scene_info.pop("ball_served")
-            self.data_buffer.append({
-                "scene_info": scene_info,
-                "command": command,
-                "predicted_x": -1  # 手動模式下沒有預測落點，設為 -1
-            })
+        if scene_info["ball_served"]:
+            ball_dx = 0
+            ball_dy = 0
+            if self.previous_ball_position:
+                ball_dx = scene_info["ball"][0] - self.previous_ball_position[0]
+                ball_dy = scene_info["ball"][1] - self.previous_ball_position[1]
+            # 手動模式下沒有預測落點，設為 -1
+            self.recorder.append(scene_info["frame"], scene_info["ball"], scene_info["platform"],
+                                 ball_dx, ball_dy, -1, command)
 
+        self.previous_ball_position = scene_info["ball"]
         return command
 
     def reset(self):
@@ -62,22 +61,5 @@ class MLPlay:
         Reset the status
         """
         self.ball_served = False
-        self.data_buffer = []  # 清空資料 buffer
-
-    def save_data_to_pickle(self, filename):
-        """
-        將資料儲存到 pickle 檔案
-        """
-        removed_status_databuffer = []
-        for data in self.data_buffer:
-            data_copy = data.copy()
-            data_copy["scene_info"].pop("status") 
-            removed_status_databuffer.append(data_copy)
-        self.data_buffer = removed_status_databuffer
-        print(self.data_buffer)
-        try:
-            with open(filename, "wb") as f:
-                pickle.dump(self.data_buffer, f)
-            print(f"Manual data saved to {filename}")
-        except Exception as e:
-            print(f"Error saving manual data: {e}")
\ No newline at end of file
+        self.recorder.reset()  # 清空這一局的資料
+        self.previous_ball_position = None  # 重置上一幀球的位置
@@ -1,46 +1,8 @@
-import pickle
-import numpy as np
 import random
-from ml.ml_play_collect import predict_landing_point
-
-# def predict_landing_point(scene_info, previous_ball_position):
-#     """
-#     預測球的落點 x 座標，考慮反彈與鏡像座標 (使用數學公式)
-#     """
-#     ball_x, ball_y = scene_info["ball"]
-#     platform_y = 400  # 平台 y 座標
-#     screen_width = 200  # 遊戲畫面寬度
-
-#     if not previous_ball_position:
-#         return None  # 無法預測
-
-#     prev_x, prev_y = previous_ball_position
-#     ball_dx = ball_x - prev_x  # x 方向變化
-#     ball_dy = ball_y - prev_y  # y 方向變化
-
-#     if ball_dy <= 0:
-#         return None  # 球向上移動時不預測落點
-
-#     if ball_dx == 0:
-#         return ball_x  # 垂直下落，落點不變
-
-#     # 計算斜率
-#     slope = ball_dy / ball_dx
-
-#     # 計算與平台交點的 x 座標
-#     distance_y = platform_y - ball_y
-#     predicted_x = ball_x + (distance_y / slope)
-
-#     # 計算反彈 (使用數學方式取代 while 迴圈)
-#     bounce_count = int(predicted_x // screen_width)  # 計算反彈次數
-#     if bounce_count % 2 == 1:
-#         predicted_x = screen_width - abs(predicted_x % screen_width)
-#     else:
-#         predicted_x = abs(predicted_x % screen_width)
-
-#     # 確保座標合法
-#     return max(0, min(int(predicted_x), screen_width))
-
+from ml.features import feature_values
+from ml.model_store import DEFAULT_MODEL_STORE, LiveModel, ModelStore
+from ml.trajectory_oracle import TrajectoryOracle
+from src.observation import decode_scene_info
 
 class MLPlay:
     def __init__(self, ai_name, *args, **kwargs):
@@ -49,9 +11,12 @@ class MLPlay:
         """
         print(ai_name)
         self.previous_ball_position = None  # 記錄上一幀球的位置
-        self.model = self.load_model()  # 嘗試載入模型
-        if self.model:
-            print("機器學習模型載入成功！")
+        self.rng = random.Random(kwargs.get("seed"))  # 指定 seed 時可重現每一局
+        # 以遊戲的物理模擬預測落點，物理版本需與遊戲的 physics_version 相同
+        self.oracle = TrajectoryOracle(physics_version=kwargs.get("physics_version", 1))
+        self.model = self.load_model(kwargs.get("model_store", DEFAULT_MODEL_STORE))  # 嘗試載入模型
+        if self.model.predictor:
+            print(f"機器學習模型載入成功！ (版本 {self.model.version})")
         else:
             print("模型載入失敗，將使用預設策略 (預測落點演算法)。")
 
@@ -59,6 +24,7 @@ class MLPlay:
         """
         Generate the command according to the received `scene_info`.
         """
+        scene_info = decode_scene_info(scene_info)  # 支援 PACKED 格式的 scene_info
         command = "NONE"
         predicted_x = 100
 
@@ -68,8 +34,8 @@ class MLPlay:
 
         if not scene_info["ball_served"]:
             # command = "SERVE_TO_LEFT"  # 自動發球
-            command = "SERVE_TO_LEFT" if random.randint(0, 1) == 0 else "SERVE_TO_RIGHT" # 隨機發球
-            command = "MOVE_LEFT" if random.randint(0, 1) == 0 else "MOVE_RIGHT"  # 隨機移動
+            command = "SERVE_TO_LEFT" if self.rng.randint(0, 1) == 0 else "SERVE_TO_RIGHT" # 隨機發球
+            command = "MOVE_LEFT" if self.rng.randint(0, 1) == 0 else "MOVE_RIGHT"  # 隨機移動
             # if random.randint(0, 1) == 0:
             #     command = "MOVE_LEFT"
             # else:
@@ -86,7 +52,8 @@ class MLPlay:
                 ball_dy = ball_y - self.previous_ball_position[1]
 
             # 計算 predicted_x
-            predicted_x = predict_landing_point(scene_info, self.previous_ball_position)
+            landing = self.oracle.predict(scene_info, self.previous_ball_position)
+            predicted_x = landing.x if landing is not None else None
             if predicted_x is None:  # 如果無法預測落點
                 # predicted_x = platform_x  # 將 predicted_x 設為平台當前位置
                 predicted_x = 100   # 將 predicted_x 設為畫面中央
@@ -98,15 +65,17 @@ class MLPlay:
                 """
 
             
-            if self.model:  # 如果模型載入成功，使用模型預測
-                feature = np.array([ball_x, ball_y, platform_x, ball_dx, ball_dy, predicted_x]).reshape(1, -1)
+            if self.model.predictor:  # 如果模型載入成功，使用模型預測
+                # 特徵的定義與訓練時相同 (見 ml/features.py)
+                feature = feature_values({"ball_x": ball_x, "ball_y": ball_y, "platform_x": platform_x,
+                                          "dx": ball_dx, "dy": ball_dy, "predicted_x": predicted_x})
 
                 """"確認特徵向量"""
                 # print("Feature vector:", feature)  # 加入這行，印出特徵向量
                 
                 
                 # print("Debug: 模型預測開始前") # <--- 加入這行
-                predicted_label = self.model.predict(feature)[0]
+                predicted_label = self.model.predictor.predict(feature)
                 # print("Debug: 模型預測結束後, predicted_label =", predicted_label) # <--- 加入這行
 
                 # 預測的 label 對應的指令
@@ -136,19 +105,16 @@ class MLPlay:
         """
         self.ball_served = False
         self.previous_ball_position = None  # 重置上一幀球的位置
+        if self.model.predictor:
+            print("Inference latency:", self.model.predictor.latency_report())
+        if self.model.refresh():  # 每局之間檢查模型庫，有新版本就換用新模型
+            print(f"載入新的模型版本 {self.model.version}")
 
-    def load_model(self, filename="arkanoid_model.pickle"):
+    def load_model(self, store_folder):
         """
-        載入訓練好的機器學習模型
+        載入模型庫中最新版本的模型 (見 ml/model_store.py)，權重以 memory map 載入
         """
-        try:
-            with open(filename, "rb") as f:
-                model = pickle.load(f)
-            return model
-        except FileNotFoundError:
-            print(f"模型檔案 '{filename}' 未找到，將使用預設策略 (預測落點演算法)。")
-            return None
-        except Exception as e:
-            print(f"模型載入失敗: {e}")
-            print(f"將使用預設策略 (預測落點演算法)。") 
-            return None
\ No newline at end of file
+        model = LiveModel(ModelStore(store_folder))
+        if model.predictor is None:
+            print(f"模型庫 '{store_folder}' 中沒有可用的模型，將使用預設策略 (預測落點演算法)。")
+        return model
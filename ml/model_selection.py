@@ -0,0 +1,188 @@
+"""
+Select the model for the AI script from the candidate estimators.
+
+The candidates are a list of configs, given in Python or as a JSON file:
+
+    [
+        {"name": "knn", "estimator": "sklearn.neighbors.KNeighborsClassifier",
+         "params": {}, "grid": {"n_neighbors": [5, 10, 20, 40]}},
+        ...
+    ]
+
+The frames are split by episode, so the nearly identical frames of an episode are
+never on both sides of a split. Every point of the grids is cross-validated on
+the training split, in parallel across the cores. The points are then tried from the best cross-validation
+accuracy: each is fitted and its latency of predicting a single frame is
+measured with the predictor compiled for the game (see `ml/inference.py`),
+without the lookup table. The first point within the latency budget is selected
+and scored on the test split. The game runs at 30+ FPS per client, and the AI
+script also predicts the landing point in each frame, so the model only gets a
+part of the frame time.
+
+Example:
+    model, report = select_model(features, labels, load_candidates("candidates.json"), groups=episode_ids)
+"""
+import importlib
+import json
+import time
+
+import numpy as np
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import GridSearchCV, GroupShuffleSplit, StratifiedGroupKFold
+
+from ml.inference import compile_model
+
+DEFAULT_CANDIDATES = [
+    {"name": "knn", "estimator": "sklearn.neighbors.KNeighborsClassifier",
+     "params": {}, "grid": {"n_neighbors": [5, 10, 20, 40]}},
+    {"name": "decision_tree", "estimator": "sklearn.tree.DecisionTreeClassifier",
+     "params": {"random_state": 42}, "grid": {"max_depth": [10, 20, None]}},
+    {"name": "random_forest", "estimator": "sklearn.ensemble.RandomForestClassifier",
+     "params": {"random_state": 42}, "grid": {"n_estimators": [50, 100], "max_depth": [20, None]}},
+]
+
+# The p99 latency of predicting a single frame, in microseconds
+DEFAULT_LATENCY_BUDGET_US = 1000
+# The number of the test frames predicted one by one to measure the latency
+LATENCY_SAMPLES = 500
+
+
+def load_candidates(path):
+    """
+    Load the candidate configs from a JSON file
+    """
+    with open(path) as f:
+        return json.load(f)
+
+
+def make_estimator(candidate):
+    """
+    Create the estimator of the candidate config
+    """
+    module_name, _, class_name = candidate["estimator"].rpartition(".")
+    estimator_class = getattr(importlib.import_module(module_name), class_name)
+    return estimator_class(**candidate.get("params", {}))
+
+
+def measure_latency(model, features) -> dict:
+    """
+    Measure the latency of predicting the frames one by one with the compiled predictor.
+    The lookup table is not used, so every frame is a missed frame.
+
+    @return The mean and the p99 latency in microseconds
+    """
+    predictor = compile_model(model, features=features[:0])
+    latencies = []
+    for key in np.asarray(features).tolist():
+        start = time.perf_counter_ns()
+        predictor.predict(key)
+        latencies.append(time.perf_counter_ns() - start)
+        predictor.clear()
+    latencies = np.array(latencies) / 1000
+    return {"mean_us": float(latencies.mean()), "p99_us": float(np.percentile(latencies, 99))}
+
+
+def _frame_groups(labels, groups):
+    """
+    Get the groups of the frames, in which each frame is its own group if not given
+    """
+    return np.arange(len(labels)) if groups is None else np.asarray(groups)
+
+
+def cross_validate(features, labels, candidates, cv=5, workers=None, seed=42, groups=None):
+    """
+    Cross-validate every point of the grids of the candidates
+
+    @param workers The number of the parallel jobs. Use all cores by default.
+    @param groups The episode id of each frame. The frames of an episode are in the same fold.
+    @return The list of the results, from the best mean accuracy
+    """
+    groups = _frame_groups(labels, groups)
+    folds = StratifiedGroupKFold(n_splits=cv, shuffle=True, random_state=seed)
+    fold_size = len(labels) / cv
+    results = []
+    for candidate in candidates:
+        search = GridSearchCV(make_estimator(candidate), candidate.get("grid", {}), cv=folds,
+                              n_jobs=workers or -1, refit=False)
+        search.fit(features, labels, groups=groups)
+        cv_results = search.cv_results_
+        for i, params in enumerate(cv_results["params"]):
+            results.append({
+                "name": candidate["name"],
+                "params": params,
+                "cv_accuracy": float(cv_results["mean_test_score"][i]),
+                "cv_accuracy_std": float(cv_results["std_test_score"][i]),
+                "fit_time_s": float(cv_results["mean_fit_time"][i]),
+                # The time of predicting a fold in a batch, divided by the frames of the fold
+                "batch_latency_us": float(cv_results["mean_score_time"][i] / fold_size * 1e6),
+            })
+        print(f"Cross-validated {candidate['name']}: {len(cv_results['params'])} points")
+    results.sort(key=lambda result: result["cv_accuracy"], reverse=True)
+    return results
+
+
+def select_model(features, labels, candidates=DEFAULT_CANDIDATES, cv=5, workers=None,
+                 latency_budget_us=DEFAULT_LATENCY_BUDGET_US, test_size=0.2, seed=42, groups=None):
+    """
+    Select the most accurate model within the latency budget
+
+    @param candidates The candidate configs
+    @param cv The number of the folds of the cross-validation
+    @param workers The number of the parallel jobs. Use all cores by default.
+    @param latency_budget_us The budget of the p99 latency of predicting a single frame
+    @param test_size The fraction of the episodes held out for the test accuracy
+    @param groups The episode id of each frame, by which the frames are split.
+           Each frame is split on its own if it is not given.
+    @return (model, report). The model is the fastest one measured if none is within the budget.
+    """
+    groups = _frame_groups(labels, groups)
+    splitter = GroupShuffleSplit(n_splits=1, test_size=test_size, random_state=seed)
+    train_index, test_index = next(splitter.split(features, labels, groups))
+    train_features, test_features = features[train_index], features[test_index]
+    train_labels, test_labels = labels[train_index], labels[test_index]
+    results = cross_validate(train_features, train_labels, candidates, cv, workers, seed,
+                             groups=groups[train_index])
+    candidates_by_name = {candidate["name"]: candidate for candidate in candidates}
+
+    latency_features = test_features[:LATENCY_SAMPLES]
+    selected = None
+    fastest = None
+    for result in results:
+        model = make_estimator(candidates_by_name[result["name"]]).set_params(**result["params"])
+        start = time.perf_counter()
+        model.fit(train_features, train_labels)
+        result["refit_time_s"] = time.perf_counter() - start
+        latency = measure_latency(model, latency_features)
+        result["frame_latency_us"] = latency
+        print(f"{result['name']} {result['params']}: CV accuracy {result['cv_accuracy']:.4f}, "
+              f"p99 latency {latency['p99_us']:.1f} us")
+
+        if latency["p99_us"] <= latency_budget_us:
+            selected = (result, model)
+            break
+        if fastest is None or latency["p99_us"] < fastest[0]["frame_latency_us"]["p99_us"]:
+            fastest = (result, model)
+
+    within_budget = selected is not None
+    result, model = selected or fastest
+    test_accuracy = accuracy_score(test_labels, model.predict(test_features))
+    # Check the predictor of the game against the model
+    agreement = compile_model(model, features=test_features[:0]).agreement(test_features[:2000])
+    report = {
+        "selected": {"name": result["name"], "params": result["params"]},
+        "within_budget": within_budget,
+        "test_accuracy": float(test_accuracy),
+        "compiled_agreement": agreement,
+        "latency_budget_us": latency_budget_us,
+        "cv": cv,
+        "num_train": len(train_labels),
+        "num_test": len(test_labels),
+        "num_train_episodes": len(np.unique(groups[train_index])),
+        "num_test_episodes": len(np.unique(groups[test_index])),
+        "results": results,
+    }
+    print(f"Selected {result['name']} {result['params']}: test accuracy {test_accuracy:.4f}, "
+          f"compiled model agreement {agreement:.4f}")
+    if not within_budget:
+        print(f"Warning: no model is within the latency budget of {latency_budget_us} us")
+    return model, report
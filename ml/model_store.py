@@ -0,0 +1,295 @@
+"""
+The versioned store of the trained models.
+
+Each version is a folder `v0001`, `v0002`, ... in the store, which holds
+`metadata.json` and the arrays of the model as `.npy` files:
+
+- KNN (uniform weights, euclidean): the training samples, their class indices and the classes
+- MLP: the weights and the biases of the layers
+- Decision tree and random forest: the nodes of the trees
+- Other models: `model.pickle`, which is only loaded with `allow_pickle=True`
+
+The arrays are memory-mapped when loaded, so the game processes share one copy
+of the training samples in the page cache instead of unpickling their own copy.
+The lookup table of `ml/inference.py` is precomputed when saving, and its sorted
+keys are memory-mapped as the model. A version is
+written to a temporary folder and renamed, so a reader never sees a partial version.
+
+`metadata.json` records the feature schema (see `ml/features.py`), the hash of
+the training data, the test accuracy and the parameters of the model. A version
+with a different feature schema is refused when loading. The report of the model
+selection (see `ml/model_selection.py`) is saved as `training_report.json`.
+
+Example:
+    store = ModelStore("arkanoid_models")
+    version = store.save(model, data_hash=data_hash(features, labels), accuracy=0.87)
+    live_model = LiveModel(store)  # Reload when a new version is saved
+    live_model.refresh()
+    label = live_model.predictor.predict(feature_values(columns))
+"""
+import hashlib
+import json
+import os
+import pickle
+import re
+import shutil
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from ml.features import feature_names
+from ml.inference import KNNModel, MLPModel, PackedTable, TreeModel, build_table, compile_model
+
+DEFAULT_MODEL_STORE = "arkanoid_models"
+METADATA_FILENAME = "metadata.json"
+REPORT_FILENAME = "training_report.json"
+
+_VERSION_PATTERN = re.compile(r"^v(\d+)$")
+# The arrays of `TreeModel`, in the order of its constructor
+_TREE_ARRAYS = ("roots", "children_left", "children_right", "feature", "threshold", "value", "classes")
+
+
+class StoredModel(namedtuple("StoredModel", ["version", "metadata", "model", "table"])):
+    """
+    @field version The version number
+    @field metadata The dict of `metadata.json`
+    @field model The model (`KNNModel`, `MLPModel`, `TreeModel` or the unpickled model)
+    @field table The precomputed `PackedTable` with the memory-mapped arrays, or None
+    """
+    __slots__ = ()
+
+
+def hash_batch(hasher, features, labels):
+    """
+    Update the hash object of `hashlib` with a batch of the training data
+    """
+    hasher.update(np.ascontiguousarray(features, dtype=np.int64).tobytes())
+    hasher.update(np.ascontiguousarray(labels, dtype=np.int64).tobytes())
+
+
+def data_hash(features, labels) -> str:
+    """
+    Get the SHA-256 hash of the training data
+    """
+    hasher = hashlib.sha256()
+    hash_batch(hasher, features, labels)
+    return hasher.hexdigest()
+
+
+class ModelStore:
+    """
+    The folder of the model versions
+    """
+
+    def __init__(self, folder=DEFAULT_MODEL_STORE):
+        self.folder = folder
+
+    def versions(self):
+        """
+        Get the version numbers in ascending order
+        """
+        if not os.path.isdir(self.folder):
+            return []
+        matches = (_VERSION_PATTERN.match(name) for name in os.listdir(self.folder))
+        return sorted(int(match.group(1)) for match in matches if match)
+
+    def latest_version(self):
+        """
+        @return The latest version number, or None if the store is empty
+        """
+        versions = self.versions()
+        return versions[-1] if versions else None
+
+    def version_path(self, version):
+        return os.path.join(self.folder, "v{0:04d}".format(version))
+
+    def save(self, model, data_hash=None, accuracy=None, table_features=None, report=None, **metadata) -> int:
+        """
+        Save the model as a new version
+
+        @param model The trained model of scikit-learn
+        @param data_hash The hash of the training data (see `data_hash()`)
+        @param accuracy The test accuracy of the model
+        @param table_features The samples to precompute the lookup table.
+               The training samples are used for KNN if it is not given.
+        @param report The training report saved as `training_report.json` in the version
+        @param metadata The other values recorded in `metadata.json`
+        @return The version number
+        """
+        os.makedirs(self.folder, exist_ok=True)
+        temp_path = os.path.join(self.folder, ".tmp_{0}_{1}".format(time.time_ns(), os.getpid()))
+        os.makedirs(temp_path)
+        try:
+            metadata.update({
+                "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "estimator": type(model).__name__,
+                "params": model.get_params() if hasattr(model, "get_params") else {},
+                "features": feature_names(),
+                "data_hash": data_hash,
+                "accuracy": accuracy,
+            })
+            metadata.update(_save_arrays(temp_path, model))
+
+            if table_features is None:
+                table_features = getattr(model, "_fit_X", None)
+            if table_features is not None:
+                table = PackedTable.from_features(*build_table(model, table_features))
+                # The table is only precomputed for the integer features
+                if table is not None:
+                    np.save(os.path.join(temp_path, "table_keys.npy"), table.keys)
+                    np.save(os.path.join(temp_path, "table_labels.npy"), table.labels)
+                    metadata["table"] = {"offsets": table.offsets, "sizes": table.sizes}
+
+            if report is not None:
+                with open(os.path.join(temp_path, REPORT_FILENAME), "w") as f:
+                    json.dump(report, f, indent=2, default=str)
+
+            # Take the next version number. Renaming fails if another process has taken it.
+            version = (self.latest_version() or 0) + 1
+            while True:
+                metadata["version"] = version
+                with open(os.path.join(temp_path, METADATA_FILENAME), "w") as f:
+                    json.dump(metadata, f, indent=2, default=str)
+                try:
+                    os.rename(temp_path, self.version_path(version))
+                    return version
+                except OSError:
+                    if not os.path.exists(self.version_path(version)):
+                        raise
+                    version += 1
+        except BaseException:
+            shutil.rmtree(temp_path, ignore_errors=True)
+            raise
+
+    def load(self, version=None, allow_pickle=False) -> StoredModel:
+        """
+        Load a version of the model. The arrays are memory-mapped.
+
+        @param version The version number. The latest version is loaded if it is not given.
+        @param allow_pickle Whether to load the model saved as a pickle file
+        """
+        if version is None:
+            version = self.latest_version()
+            if version is None:
+                raise FileNotFoundError("No model in the store '{0}'".format(self.folder))
+        path = self.version_path(version)
+        with open(os.path.join(path, METADATA_FILENAME)) as f:
+            metadata = json.load(f)
+
+        if metadata["features"] != feature_names():
+            raise ValueError("The features {0} of the model version {1} are different from {2}"
+                             .format(metadata["features"], version, feature_names()))
+
+        def load_array(name):
+            return np.load(os.path.join(path, name + ".npy"), mmap_mode="r")
+
+        model_format = metadata["format"]
+        if model_format == "knn":
+            model = KNNModel(load_array("samples"), load_array("labels"),
+                             load_array("classes"), metadata["n_neighbors"])
+        elif model_format == "mlp":
+            num_layers = metadata["num_layers"]
+            model = MLPModel([load_array("weight_{0}".format(i)) for i in range(num_layers)],
+                             [load_array("bias_{0}".format(i)) for i in range(num_layers)],
+                             metadata["activation"], load_array("classes"))
+        elif model_format == "trees":
+            model = TreeModel(*(load_array(name) for name in _TREE_ARRAYS))
+        elif model_format == "pickle":
+            if not allow_pickle:
+                raise ValueError("The model version {0} is a pickle file, "
+                                 "which is only loaded with allow_pickle=True".format(version))
+            with open(os.path.join(path, "model.pickle"), "rb") as f:
+                model = pickle.load(f)
+        else:
+            raise ValueError("Unknown model format '{0}'".format(model_format))
+
+        table = None
+        if "table" in metadata:
+            table = PackedTable(load_array("table_keys"), load_array("table_labels"),
+                                metadata["table"]["offsets"], metadata["table"]["sizes"])
+        return StoredModel(version, metadata, model, table)
+
+
+def _save_arrays(path, model) -> dict:
+    """
+    Save the arrays of the model into the folder
+
+    @return The metadata of the model format
+    """
+    def save_array(name, array):
+        np.save(os.path.join(path, name + ".npy"), np.ascontiguousarray(array))
+
+    if KNNModel.supports(model):
+        knn = KNNModel.from_sklearn(model)
+        save_array("samples", knn.samples)
+        save_array("labels", knn.labels)
+        save_array("classes", knn.classes)
+        return {"format": "knn", "n_neighbors": knn.n_neighbors}
+
+    if MLPModel.supports(model):
+        mlp = MLPModel.from_sklearn(model)
+        for i, (weight, bias) in enumerate(zip(mlp.weights, mlp.biases)):
+            save_array("weight_{0}".format(i), weight)
+            save_array("bias_{0}".format(i), bias)
+        save_array("classes", mlp.classes)
+        return {"format": "mlp", "num_layers": len(mlp.weights), "activation": mlp.activation}
+
+    if TreeModel.supports(model):
+        trees = TreeModel.from_sklearn(model)
+        for name in _TREE_ARRAYS:
+            save_array(name, getattr(trees, name))
+        return {"format": "trees", "num_trees": len(trees.roots)}
+
+    with open(os.path.join(path, "model.pickle"), "wb") as f:
+        pickle.dump(model, f)
+    return {"format": "pickle"}
+
+
+class LiveModel:
+    """
+    The compiled predictor of the latest version in the store,
+    which is reloaded when a new version is saved
+    """
+
+    def __init__(self, store, check_interval=1.0, allow_pickle=False):
+        """
+        @param store The `ModelStore`
+        @param check_interval The minimum seconds between checking the store for a new version
+        @param allow_pickle Whether to load the model saved as a pickle file
+        """
+        self.store = store
+        self.check_interval = check_interval
+        self.allow_pickle = allow_pickle
+        self.version = None
+        self.metadata = None
+        self.predictor = None
+        self._last_check = None
+        self._failed_version = None
+        self.refresh()
+
+    def refresh(self) -> bool:
+        """
+        Load the latest version if it is newer than the loaded one.
+        The loaded version is kept if the new version fails to load.
+
+        @return Whether a new version is loaded
+        """
+        now = time.monotonic()
+        if self._last_check is not None and now - self._last_check < self.check_interval:
+            return False
+        self._last_check = now
+
+        version = self.store.latest_version()
+        if version is None or version == self.version or version == self._failed_version:
+            return False
+        try:
+            stored = self.store.load(version, self.allow_pickle)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Failed to load the model version {version}: {e}")
+            self._failed_version = version
+            return False
+
+        self.version, self.metadata = stored.version, stored.metadata
+        self.predictor = compile_model(stored.model, table=stored.table)
+        return True
@@ -0,0 +1,200 @@
+"""
+The trajectory oracle predicting where and when the ball reaches the platform,
+shared by the AI scripts in this folder.
+
+The oracle replays the ball with the physics of the game (`src.game_object.Ball`
+bouncing off the bricks and the walls), so the prediction takes the bricks and
+the size of the ball into account. The physics version of the game is given to the
+oracle: the version 1 moves the ball and checks the overlapping objects, and the
+version 2 sweeps the ball with `Ball.sweep()` (see `src/collision.py`). The frames
+in which the ball only flies are skipped by `src.event.frames_until_event()` or
+`src.collision.frames_until_impact()`.
+
+Every state on a simulated trajectory is memoized by (ball position, ball speed,
+bricks), so the queries in the following frames along the same trajectory only
+look up the result. The memoized trajectory also gives the exact ball speed,
+which can't be read from the positions of two frames after a bounce.
+"""
+import heapq
+from collections import namedtuple
+
+from pygame import Rect
+
+from mlgame.game import physics
+from src.brick_group import GridBrickGroup
+from src.collision import frames_until_impact
+from src.event import frames_until_event
+from src.game_object import Ball, Brick, HardBrick, Platform
+
+PLATFORM_Y = 400
+PLAY_AREA_RECT = Rect(0, 0, 200, 500)
+BALL_SPEED_Y = 7
+
+
+class Landing(namedtuple("Landing", ["x", "frames"])):
+    """
+    The predicted landing of the ball
+
+    @field x The x of the ball (its left) in the frame when its bottom reaches the platform
+    @field frames The number of frames from now to that frame
+    """
+    __slots__ = ()
+
+
+def estimate_ball_speed(ball_position, previous_ball_position):
+    """
+    Estimate the ball speed from the positions of two frames.
+    The position is corrected when the ball bounces, so the estimation may be
+    wrong in the frame right after a bounce.
+
+    @return (speed x, speed y), or None if the direction is unknown
+    """
+    ball_x, ball_y = ball_position
+    dx = ball_x - previous_ball_position[0]
+    dy = ball_y - previous_ball_position[1]
+
+    # The ball contacting a wall has bounced off it
+    if ball_x <= PLAY_AREA_RECT.left:
+        dx = abs(dx) or 7
+    elif ball_x >= PLAY_AREA_RECT.right - 5:
+        dx = -abs(dx) or -7
+    if ball_y <= PLAY_AREA_RECT.top:
+        dy = BALL_SPEED_Y
+    # The ball on the top of the platform has been caught
+    elif ball_y == PLATFORM_Y - 5:
+        dy = -BALL_SPEED_Y
+    if dx == 0 or dy == 0:
+        return None
+
+    speed_x = 10 if abs(dx) >= 10 else 7
+    return (speed_x if dx > 0 else -speed_x,
+            BALL_SPEED_Y if dy > 0 else -BALL_SPEED_Y)
+
+
+class TrajectoryOracle:
+    def __init__(self, max_frames=3000, max_cache_size=500000, physics_version=1):
+        """
+        @param max_frames Give up the prediction if the ball doesn't land in this many frames
+        @param max_cache_size Clear the memoized states when there are more states than this
+        @param physics_version The physics version of the game, 1 or 2
+        """
+        if physics_version not in (1, 2):
+            raise ValueError("physics_version should be 1 or 2, but got '{0}'".format(physics_version))
+        self.max_frames = max_frames
+        self.physics_version = physics_version
+        # The platform swept by the version 2, which is out of the play area, so
+        # the ball flies to the platform y without hitting it
+        self._platform = Platform((PLAY_AREA_RECT.right + 1000, PLATFORM_Y), PLAY_AREA_RECT)
+        self.max_cache_size = max_cache_size
+        # (ball position, ball speed, bricks key) -> Landing or None
+        self._landings = {}
+        # (previous ball position, ball position, bricks key) -> ball speed
+        self._speeds = {}
+        self._last_bricks = None
+        self._last_bricks_key = None
+
+    def clear(self):
+        """
+        Clear the memoized trajectories
+        """
+        self._landings = {}
+        self._speeds = {}
+
+    def predict(self, scene_info, previous_ball_position) -> Landing:
+        """
+        Predict the landing of the ball
+
+        @param scene_info The scene info of the current frame
+        @param previous_ball_position The ball position of the previous frame
+        @return The `Landing`, or None if the ball is not served or it can't be predicted
+        """
+        if not scene_info["ball_served"] or previous_ball_position is None:
+            return None
+
+        ball = tuple(scene_info["ball"])
+        previous_ball = tuple(previous_ball_position)
+        bricks_key = self._get_bricks_key(scene_info["bricks"], scene_info["hard_bricks"])
+
+        speed = self._speeds.get((previous_ball, ball, bricks_key))
+        if speed is None:
+            speed = estimate_ball_speed(ball, previous_ball)
+            if speed is None:
+                return None
+
+        landing_key = (ball, speed, bricks_key)
+        if landing_key not in self._landings:
+            if len(self._landings) > self.max_cache_size:
+                self.clear()
+            self._simulate(ball, speed, scene_info["bricks"], scene_info["hard_bricks"])
+        return self._landings[landing_key]
+
+    def _get_bricks_key(self, bricks, hard_bricks):
+        # The game sends the same tuples until the bricks change
+        if self._last_bricks is not None and \
+                bricks is self._last_bricks[0] and hard_bricks is self._last_bricks[1]:
+            return self._last_bricks_key
+
+        bricks_key = (frozenset(map(tuple, bricks)), frozenset(map(tuple, hard_bricks)))
+        self._last_bricks = (bricks, hard_bricks)
+        self._last_bricks_key = bricks_key
+        return bricks_key
+
+    def _simulate(self, ball_position, speed, bricks, hard_bricks):
+        """
+        Simulate the ball until it lands and memoize the states on the trajectory
+        """
+        # The order of the bricks decides the bouncing when the ball hits two bricks.
+        # The bricks in the game are in the order of the level map, which is mostly
+        # sorted by (y, x), so merge the bricks and the hard bricks in that order.
+        group_brick = GridBrickGroup()
+        for pos, BrickType in heapq.merge(((tuple(pos), Brick) for pos in bricks),
+                                          ((tuple(pos), HardBrick) for pos in hard_bricks),
+                                          key=lambda brick: (brick[0][1], brick[0][0])):
+            BrickType(pos, group_brick)
+        bricks_key = self._get_bricks_key(bricks, hard_bricks)
+        brick_rects = [brick.rect for brick in group_brick]
+
+        ball = Ball(ball_position, PLAY_AREA_RECT, False)
+        ball._speed = list(speed)
+
+        # The (previous position, position, speed, bricks key) of each frame before landing
+        states = [(None, ball_position, speed, bricks_key)]
+        landing_x = None
+        swept = self.physics_version == 2
+        while len(states) <= self.max_frames:
+            free_frames = (frames_until_impact if swept else frames_until_event)(
+                ball.rect, ball._speed, brick_rects, PLATFORM_Y, PLAY_AREA_RECT) - 1
+            (x, y), (speed_x, speed_y) = ball.pos, ball._speed
+            for i in range(1, free_frames + 1):
+                states.append((states[-1][1], (x + i * speed_x, y + i * speed_y),
+                               tuple(ball._speed), bricks_key))
+            if free_frames > 0:
+                ball.move_frames(free_frames)
+
+            # The event frame
+            if swept:
+                hit_bricks, _ = ball.sweep(self._platform, group_brick)
+            else:
+                ball.move()
+                hit_bricks, _ = ball.check_hit_brick(group_brick)
+            if hit_bricks:
+                brick_rects = [brick.rect for brick in group_brick]
+                bricks_key = (
+                    frozenset(brick.pos for brick in group_brick if not isinstance(brick, HardBrick)),
+                    frozenset(brick.pos for brick in group_brick if isinstance(brick, HardBrick)))
+            # The swept ball has bounced off the walls. The landing ball is also kept
+            # in the play area, as the game does after checking the platform.
+            if not swept and physics.rect_break_or_contact_box(ball.rect, PLAY_AREA_RECT):
+                physics.bounce_in_box_ip(ball.rect, ball._speed, PLAY_AREA_RECT)
+            if ball.rect.bottom >= PLATFORM_Y:
+                landing_x = ball.rect.x
+                break
+            states.append((states[-1][1], ball.pos, tuple(ball._speed), bricks_key))
+
+        num_frames = len(states)
+        for i, (previous_ball, ball_position, speed, bricks_key) in enumerate(states):
+            self._landings[ball_position, speed, bricks_key] = (
+                Landing(landing_x, num_frames - i) if landing_x is not None else None)
+            if previous_ball is not None:
+                self._speeds[previous_ball, ball_position, bricks_key] = speed
+
@@ -0,0 +1,412 @@
+"""
+The vectorized engine stepping many Arkanoid games in lockstep with NumPy.
+
+Every game keeps the same rules as `Arkanoid`: the ball, platform and brick
+state of N games is stored in arrays and `BatchArkanoid.step` reproduces
+`Platform.move`, `Ball.move`, `Ball.check_hit_brick`, `Ball.check_bouncing`
+and `Ball._slice_ball` frame for frame.
+"""
+import numpy as np
+
+from .game_object import PlatformAction
+from .level import get_level
+
+# The action codes accepted by `BatchArkanoid.step`
+ACTIONS = (
+    PlatformAction.SERVE_TO_LEFT,
+    PlatformAction.SERVE_TO_RIGHT,
+    PlatformAction.MOVE_LEFT,
+    PlatformAction.MOVE_RIGHT,
+    PlatformAction.NONE,
+)
+SERVE_TO_LEFT, SERVE_TO_RIGHT, MOVE_LEFT, MOVE_RIGHT, NONE = range(len(ACTIONS))
+
+# The status codes of each game
+GAME_ALIVE, GAME_PASS, GAME_OVER = range(3)
+STATUS_NAMES = ("GAME_ALIVE", "GAME_PASS", "GAME_OVER")
+
+SCENE_WIDTH, SCENE_HEIGHT = 200, 500
+BALL_SIZE = 5
+BALL_INIT_POS = (93, 395)
+PLATFORM_WIDTH, PLATFORM_HEIGHT = 40, 5
+PLATFORM_INIT_POS = (75, 400)
+PLATFORM_SHIFT_SPEED = 5
+BRICK_WIDTH, BRICK_HEIGHT = 25, 10
+
+
+def encode_actions(commands):
+    """
+    Convert a sequence of command strings to the action codes of `BatchArkanoid`.
+    Unknown commands are treated as "NONE".
+    """
+    codes = {action.value: i for i, action in enumerate(ACTIONS)}
+    return np.array([codes.get(command, NONE) for command in commands], dtype=np.int8)
+
+
+def _level_layout(level):
+    """
+    @return A tuple (xs, ys, hps) of the bricks of the level in the map order
+    """
+    level_data = get_level(level)
+    xs = [x for x, _ in level_data.positions]
+    ys = [y for _, y in level_data.positions]
+    hps = [2 if type == 1 else 1 for type in level_data.types]
+    return xs, ys, hps
+
+
+def _bounce_off(ball_x, ball_y, speed_x, speed_y,
+                hit_left, hit_top, hit_right, hit_bottom, hit_speed_x):
+    """
+    The vectorized `physics.bounce_off` of a 5x5 ball against a still or
+    horizontally moving rect.
+
+    @return The new (ball_x, ball_y, speed_x, speed_y)
+    """
+    speed_diff_x = speed_x - hit_speed_x
+    speed_diff_y = speed_y
+
+    diff_bT_hB = hit_bottom - ball_y + speed_diff_y
+    diff_bB_hT = hit_top - (ball_y + BALL_SIZE) + speed_diff_y
+    diff_bL_hR = hit_right - ball_x + speed_diff_x
+    diff_bR_hL = hit_left - (ball_x + BALL_SIZE) + speed_diff_x
+
+    at_bottom = (diff_bT_hB < 0) & (diff_bB_hT < 0)
+    at_top = (diff_bT_hB > 0) & (diff_bB_hT > 0)
+    surface_diff_y = np.where(at_bottom, diff_bT_hB,
+                              np.where(at_top, diff_bB_hT,
+                                       np.where(speed_diff_y > 0, -1, 1)))
+    extract_pos_y = np.where(at_bottom, hit_bottom, hit_top - BALL_SIZE)
+
+    at_right = (diff_bL_hR < 0) & (diff_bR_hL < 0)
+    at_left = (diff_bL_hR > 0) & (diff_bR_hL > 0)
+    surface_diff_x = np.where(at_right, diff_bL_hR,
+                              np.where(at_left, diff_bR_hL,
+                                       np.where(speed_diff_x > 0, -1, 1)))
+    extract_pos_x = np.where(at_right, hit_right, hit_left - BALL_SIZE)
+
+    time_hit_y = surface_diff_y / speed_diff_y
+    time_hit_x = surface_diff_x / speed_diff_x
+
+    flip_y = (time_hit_y >= 0) & (time_hit_y >= time_hit_x)
+    flip_x = (time_hit_x >= 0) & (time_hit_y <= time_hit_x)
+
+    return (np.where(flip_x, extract_pos_x, ball_x),
+            np.where(flip_y, extract_pos_y, ball_y),
+            np.where(flip_x, -speed_x, speed_x),
+            np.where(flip_y, -speed_y, speed_y))
+
+
+def _segment_intersect(a0x, a0y, a1x, a1y, b0x, b0y, b1x, b1y):
+    """
+    The vectorized `physics.line_intersect` without the shared end point test
+    """
+    v0x, v0y = a1x - a0x, a1y - a0y
+    v1x, v1y = b1x - b0x, b1y - b0y
+    det = v0x * v1y - v0y * v1x
+    dux, duy = a0x - b0x, a0y - b0y
+    s_det = v1x * duy - v1y * dux
+    t_det = v0x * duy - v0y * dux
+
+    return (((det > 0) & (0 <= s_det) & (s_det <= det) & (0 <= t_det) & (t_det <= det)) |
+            ((det < 0) & (det <= s_det) & (s_det <= 0) & (det <= t_det) & (t_det <= 0)))
+
+
+def _rect_collideline(left, top, right, bottom, p0x, p0y, p1x, p1y):
+    """
+    The vectorized `physics.rect_collideline`
+    """
+    def in_rect(px, py):
+        return (left <= px) & (px <= right) & (top <= py) & (py <= bottom)
+
+    # The shared end point case of `line_intersect` is covered by `in_rect`,
+    # because the end points of the edges are the corners of the rect.
+    return (in_rect(p0x, p0y) | in_rect(p1x, p1y) |
+            _segment_intersect(left, top, right, top, p0x, p0y, p1x, p1y) |
+            _segment_intersect(left, bottom, right, bottom, p0x, p0y, p1x, p1y) |
+            _segment_intersect(left, top, left, bottom, p0x, p0y, p1x, p1y) |
+            _segment_intersect(right, top, right, bottom, p0x, p0y, p1x, p1y))
+
+
+class BatchArkanoid:
+    """
+    Step N Arkanoid games in lockstep.
+
+    The state of the games is public and stored in NumPy arrays:
+    - `ball`: (N, 2) the position of the ball
+    - `ball_speed`: (N, 2) the speed of the ball
+    - `platform_x`: (N,) the x position of the platform
+    - `brick_x`, `brick_y`: (N, max_bricks) the position of the bricks
+    - `brick_hp`: (N, max_bricks) 0 for destroyed or padding slots,
+      1 for normal bricks and 2 for hard bricks
+    - `status`: (N,) one of `GAME_ALIVE`, `GAME_PASS` and `GAME_OVER`
+
+    The games which are not alive are not stepped until they are reset.
+    """
+
+    def __init__(self, num_envs: int, difficulty="NORMAL", level=1, seed=None):
+        """
+        @param num_envs The number of games
+        @param difficulty "EASY" or "NORMAL", or a sequence of them for each game
+        @param level The level id, or a sequence of level ids for each game
+        @param seed The seed of the generator choosing the forced serving direction
+        """
+        self.num_envs = num_envs
+        self.difficulty = np.broadcast_to(np.asarray(difficulty), (num_envs,)).copy()
+        self.level = np.broadcast_to(np.asarray(level), (num_envs,)).copy()
+        self.enable_slide_ball = self.difficulty != "EASY"
+        self._rng = np.random.default_rng(seed)
+
+        layouts = {level: _level_layout(level) for level in set(self.level.tolist())}
+        max_bricks = max(len(xs) for xs, _, _ in layouts.values())
+        self._init_brick_x = np.zeros((num_envs, max_bricks), dtype=np.int64)
+        self._init_brick_y = np.zeros((num_envs, max_bricks), dtype=np.int64)
+        self._init_brick_hp = np.zeros((num_envs, max_bricks), dtype=np.int8)
+        for i, level in enumerate(self.level.tolist()):
+            xs, ys, hps = layouts[level]
+            self._init_brick_x[i, :len(xs)] = xs
+            self._init_brick_y[i, :len(ys)] = ys
+            self._init_brick_hp[i, :len(hps)] = hps
+
+        self.ball = np.zeros((num_envs, 2), dtype=np.int64)
+        self.ball_speed = np.zeros((num_envs, 2), dtype=np.int64)
+        self.platform_x = np.zeros(num_envs, dtype=np.int64)
+        self.platform_speed = np.zeros(num_envs, dtype=np.int64)
+        self.brick_x = self._init_brick_x.copy()
+        self.brick_y = self._init_brick_y.copy()
+        self.brick_hp = self._init_brick_hp.copy()
+        # The order of bricks in the sprite group, which decides the bouncing
+        # when the ball hits several bricks at once.
+        self._brick_order = np.zeros((num_envs, max_bricks), dtype=np.int64)
+        self._next_order = np.zeros(num_envs, dtype=np.int64)
+        self.ball_served = np.zeros(num_envs, dtype=bool)
+        self.frame_count = np.zeros(num_envs, dtype=np.int64)
+        self.hit_platform_times = np.zeros(num_envs, dtype=np.int64)
+        self.hit_brick_false = np.zeros(num_envs, dtype=np.int64)
+        self.status = np.zeros(num_envs, dtype=np.int8)
+
+        self.reset()
+
+    @property
+    def max_bricks(self):
+        return self.brick_hp.shape[1]
+
+    def reset(self, env_ids=None):
+        """
+        Reset the specified games, or all games if `env_ids` is None
+        """
+        if env_ids is None:
+            env_ids = np.arange(self.num_envs)
+        env_ids = np.asarray(env_ids)
+
+        self.ball[env_ids] = BALL_INIT_POS
+        self.ball_speed[env_ids] = 0
+        self.platform_x[env_ids] = PLATFORM_INIT_POS[0]
+        self.platform_speed[env_ids] = 0
+        self.brick_x[env_ids] = self._init_brick_x[env_ids]
+        self.brick_y[env_ids] = self._init_brick_y[env_ids]
+        self.brick_hp[env_ids] = self._init_brick_hp[env_ids]
+        self._brick_order[env_ids] = np.arange(self.max_bricks)
+        self._next_order[env_ids] = self.max_bricks
+        self.ball_served[env_ids] = False
+        self.frame_count[env_ids] = 0
+        self.hit_platform_times[env_ids] = 0
+        self.hit_brick_false[env_ids] = 0
+        self.status[env_ids] = GAME_ALIVE
+
+    def step(self, actions):
+        """
+        Advance all alive games by one frame
+
+        @param actions (N,) action codes, see `ACTIONS` and `encode_actions()`
+        @return The status of the games after this frame
+        """
+        actions = np.asarray(actions)
+        alive = self.status == GAME_ALIVE
+        self.frame_count[alive] += 1
+
+        self._move_platform(np.flatnonzero(alive), actions[alive])
+
+        waiting = np.flatnonzero(alive & ~self.ball_served)
+        moving = np.flatnonzero(alive & self.ball_served)
+        if waiting.size:
+            self._wait_for_serving_ball(waiting, actions[waiting])
+        if moving.size:
+            self._ball_moving(moving)
+
+        self._update_status(np.flatnonzero(alive))
+        return self.status
+
+    def _move_platform(self, ids, actions):
+        x = self.platform_x[ids]
+        speed = np.where((actions == MOVE_LEFT) & (x > 0), -PLATFORM_SHIFT_SPEED,
+                         np.where((actions == MOVE_RIGHT) & (x + PLATFORM_WIDTH < SCENE_WIDTH),
+                                  PLATFORM_SHIFT_SPEED, 0))
+        self.platform_speed[ids] = speed
+        self.platform_x[ids] = x + speed
+
+    def _wait_for_serving_ball(self, ids, actions):
+        # Force to serve the ball after 150 frames
+        serving = (actions == SERVE_TO_LEFT) | (actions == SERVE_TO_RIGHT)
+        forced = (self.frame_count[ids] >= 150) & ~serving
+        if forced.any():
+            actions = actions.copy()
+            actions[forced] = self._rng.choice((SERVE_TO_LEFT, SERVE_TO_RIGHT),
+                                               size=int(forced.sum()))
+            serving |= forced
+
+        # Stick on the center of the platform
+        self.ball[ids, 0] = self.platform_x[ids] + PLATFORM_WIDTH // 2 - BALL_SIZE // 2
+
+        served = ids[serving]
+        self.ball_speed[served, 0] = np.where(actions[serving] == SERVE_TO_LEFT, -7, 7)
+        self.ball_speed[served, 1] = -7
+        self.ball_served[served] = True
+
+    def _ball_moving(self, ids):
+        last_x, last_y = self.ball[ids, 0], self.ball[ids, 1]
+        self.ball[ids] += self.ball_speed[ids]
+
+        self._check_hit_brick(ids)
+        self._check_bouncing(ids, last_x, last_y)
+
+    def _check_hit_brick(self, ids):
+        ball_x, ball_y = self.ball[ids, 0:1], self.ball[ids, 1:2]
+        brick_x, brick_y = self.brick_x[ids], self.brick_y[ids]
+        hit = ((self.brick_hp[ids] > 0) &
+               (ball_x <= brick_x + BRICK_WIDTH) & (ball_x + BALL_SIZE >= brick_x) &
+               (ball_y <= brick_y + BRICK_HEIGHT) & (ball_y + BALL_SIZE >= brick_y))
+        num_hit = hit.sum(axis=1)
+        has_hit = num_hit > 0
+        if not has_hit.any():
+            return
+
+        ids, hit, num_hit = ids[has_hit], hit[has_hit], num_hit[has_hit]
+        brick_x, brick_y = brick_x[has_hit], brick_y[has_hit]
+        self.hit_brick_false[ids] = 0
+
+        # Sort the hit bricks by the order of the sprite group
+        rows = np.arange(ids.size)[:, None]
+        sorted_slots = np.argsort(np.where(hit, self._brick_order[ids], np.iinfo(np.int64).max),
+                                  axis=1, kind="stable")
+        first = sorted_slots[:, 0]
+        second = sorted_slots[:, 1] if self.max_bricks > 1 else first
+        r = rows[:, 0]
+        x0, y0 = brick_x[r, first], brick_y[r, first]
+        x1, y1 = brick_x[r, second], brick_y[r, second]
+
+        # XXX: Bad multiple collision bouncing handling, the same as `Ball.check_hit_brick`
+        combine = (num_hit == 2) & ((y0 == y1) | (x0 == x1))
+        left = np.where(combine, np.minimum(x0, x1), x0)
+        top = np.where(combine, np.minimum(y0, y1), y0)
+        right = np.where(combine, np.maximum(x0, x1), x0) + BRICK_WIDTH
+        bottom = np.where(combine, np.maximum(y0, y1), y0) + BRICK_HEIGHT
+
+        new_x, new_y, new_speed_x, new_speed_y = _bounce_off(
+            self.ball[ids, 0], self.ball[ids, 1], self.ball_speed[ids, 0], self.ball_speed[ids, 1],
+            left, top, right, bottom, 0)
+        self.ball[ids, 0], self.ball[ids, 1] = new_x, new_y
+        self.ball_speed[ids, 0], self.ball_speed[ids, 1] = new_speed_x, new_speed_y
+
+        # The hard bricks are downgraded instead of destroyed when the ball is not speeded up,
+        # and the downgraded bricks are appended to the end of the group in the hit order.
+        hp = self.brick_hp[ids]
+        downgrade = hit & (hp == 2) & (np.abs(new_speed_x) == 7)[:, None]
+        hp[hit & ~downgrade] = 0
+        hp[downgrade] = 1
+        self.brick_hp[ids] = hp
+
+        if downgrade.any():
+            sorted_downgrade = downgrade[rows, sorted_slots]
+            rank = np.cumsum(sorted_downgrade, axis=1) - 1
+            order = self._brick_order[ids]
+            new_order = order[rows, sorted_slots]
+            new_order[sorted_downgrade] = (self._next_order[ids][:, None] + rank)[sorted_downgrade]
+            order[rows, sorted_slots] = new_order
+            self._brick_order[ids] = order
+            self._next_order[ids] += sorted_downgrade.sum(axis=1)
+
+    def _check_bouncing(self, ids, last_x, last_y):
+        ball_x, ball_y = self.ball[ids, 0], self.ball[ids, 1]
+        speed_x, speed_y = self.ball_speed[ids, 0], self.ball_speed[ids, 1]
+        platform_x = self.platform_x[ids]
+        platform_speed = self.platform_speed[ids]
+        p_left, p_top = platform_x, PLATFORM_INIT_POS[1]
+        p_right, p_bottom = platform_x + PLATFORM_WIDTH, PLATFORM_INIT_POS[1] + PLATFORM_HEIGHT
+
+        collide = ((ball_x <= p_right) & (ball_x + BALL_SIZE >= p_left) &
+                   (ball_y <= p_bottom) & (ball_y + BALL_SIZE >= p_top))
+        # The additional checking for the ball passing the corner of the platform
+        bottom, last_bottom = ball_y + BALL_SIZE, last_y + BALL_SIZE
+        passing = (bottom > p_top) & (
+            _rect_collideline(p_left, p_top, p_right, p_bottom, last_x, last_bottom, ball_x, bottom) |
+            _rect_collideline(p_left, p_top, p_right, p_bottom,
+                              last_x + BALL_SIZE, last_bottom, ball_x + BALL_SIZE, bottom))
+        hit_platform = collide | passing
+
+        if hit_platform.any():
+            hit_ids = ids[hit_platform]
+            self.hit_platform_times[hit_ids] += 1
+            self.hit_brick_false[hit_ids] += 1
+
+            old_speed_x = speed_x[hit_platform]
+            hit_speed = platform_speed[hit_platform]
+            new_x, new_y, new_speed_x, new_speed_y = _bounce_off(
+                ball_x[hit_platform], ball_y[hit_platform], old_speed_x, speed_y[hit_platform],
+                p_left[hit_platform], p_top, p_right[hit_platform], p_bottom, hit_speed)
+
+            # Slice the ball when the ball goes up after bouncing
+            slice_ball = self.enable_slide_ball[hit_ids] & (new_speed_y < 0)
+            sliced_speed_x = np.where(
+                hit_speed == 0, np.where(old_speed_x > 0, 7, -7),
+                np.where(old_speed_x * hit_speed > 0, np.where(old_speed_x > 0, 10, -10),
+                         np.where(old_speed_x > 0, -7, 7)))
+            new_speed_x = np.where(slice_ball, sliced_speed_x, new_speed_x)
+
+            ball_x[hit_platform], ball_y[hit_platform] = new_x, new_y
+            speed_x[hit_platform], speed_y[hit_platform] = new_speed_x, new_speed_y
+
+        # Bounce in the play area
+        hit_left = ball_x <= 0
+        hit_right = ~hit_left & (ball_x + BALL_SIZE >= SCENE_WIDTH)
+        hit_top = ball_y <= 0
+        hit_bottom = ~hit_top & (ball_y + BALL_SIZE >= SCENE_HEIGHT)
+        ball_x = np.where(hit_left, 0, np.where(hit_right, SCENE_WIDTH - BALL_SIZE, ball_x))
+        ball_y = np.where(hit_top, 0, np.where(hit_bottom, SCENE_HEIGHT - BALL_SIZE, ball_y))
+        speed_x = np.where(hit_left | hit_right, -speed_x, speed_x)
+        speed_y = np.where(hit_top | hit_bottom, -speed_y, speed_y)
+
+        self.ball[ids, 0], self.ball[ids, 1] = ball_x, ball_y
+        self.ball_speed[ids, 0], self.ball_speed[ids, 1] = speed_x, speed_y
+
+    def _update_status(self, ids):
+        status = np.full(ids.size, GAME_ALIVE, dtype=np.int8)
+        status[self.hit_brick_false[ids] > 50] = GAME_PASS
+        status[self.ball[ids, 1] >= PLATFORM_INIT_POS[1] + PLATFORM_HEIGHT] = GAME_OVER
+        status[(self.brick_hp[ids] == 0).all(axis=1)] = GAME_PASS
+        self.status[ids] = status
+
+    def brick_remain(self):
+        """
+        @return (N,) the number of remaining normal bricks plus
+                twice the number of remaining hard bricks
+        """
+        return self.brick_hp.sum(axis=1, dtype=np.int64)
+
+    def get_data_from_game(self, env_id: int):
+        """
+        Build the `scene_info` dict of a game, the same as `Arkanoid.get_data_from_game_to_player`
+        """
+        alive = np.flatnonzero(self.brick_hp[env_id])
+        order = alive[np.argsort(self._brick_order[env_id, alive], kind="stable")]
+        hp = self.brick_hp[env_id, order]
+        positions = list(zip(self.brick_x[env_id, order].tolist(),
+                             self.brick_y[env_id, order].tolist()))
+        return {
+            "frame": int(self.frame_count[env_id]),
+            "status": STATUS_NAMES[self.status[env_id]],
+            "ball": tuple(self.ball[env_id].tolist()),
+            "ball_served": bool(self.ball_served[env_id]),
+            "platform": (int(self.platform_x[env_id]), PLATFORM_INIT_POS[1]),
+            "bricks": tuple(pos for pos, brick_hp in zip(positions, hp) if brick_hp == 1),
+            "hard_bricks": tuple(pos for pos, brick_hp in zip(positions, hp) if brick_hp == 2),
+        }
@@ -0,0 +1,108 @@
+"""
+The group of bricks with a uniform grid index for collision checking
+"""
+from mlgame.game import physics
+
+
+class GridBrickGroup:
+    """
+    An ordered group of bricks which also hashes its bricks into a uniform grid.
+
+    It works like a pygame sprite group of the bricks (`add()`, `remove()`,
+    `empty()`, `len()` and iterating in the insertion order), but without the
+    group membership bookkeeping of the sprites.
+    The bricks never move, so each brick is registered in the cells its rect
+    covers when it is added to the group and unregistered when it is removed
+    (destroyed, or replaced after a `HardBrick` is downgraded).
+    A collision query only checks the bricks in the cells the sprite covers.
+    """
+
+    def __init__(self, *bricks, cell_width=25, cell_height=10):
+        self._cell_width = cell_width
+        self._cell_height = cell_height
+        self._cells = {}
+        # The insertion order of bricks, which is the iteration order of the group
+        self._order = {}
+        self._next_order = 0
+        # The largest bottom of the added bricks. It is not lowered when bricks are removed,
+        # so no brick is below it.
+        self.bottom = None
+        self.add(*bricks)
+
+    def __len__(self):
+        return len(self._order)
+
+    def __bool__(self):
+        return bool(self._order)
+
+    def __contains__(self, brick):
+        return brick in self._order
+
+    def __iter__(self):
+        # Iterate over a copy, so the bricks can be removed while iterating
+        return iter(list(self._order))
+
+    def sprites(self):
+        return list(self._order)
+
+    def _covered_cells(self, rect):
+        """
+        Get the cells covered by the `rect`, including its right and bottom edges
+        """
+        first_x, last_x = rect.left // self._cell_width, rect.right // self._cell_width
+        first_y, last_y = rect.top // self._cell_height, rect.bottom // self._cell_height
+        return [(cell_x, cell_y)
+                for cell_x in range(first_x, last_x + 1)
+                for cell_y in range(first_y, last_y + 1)]
+
+    def add(self, *bricks):
+        for brick in bricks:
+            if brick in self._order:
+                continue
+            self._order[brick] = self._next_order
+            self._next_order += 1
+            if self.bottom is None or brick.rect.bottom > self.bottom:
+                self.bottom = brick.rect.bottom
+            for cell in self._covered_cells(brick.rect):
+                self._cells.setdefault(cell, []).append(brick)
+
+    def remove(self, *bricks):
+        for brick in bricks:
+            if self._order.pop(brick, None) is None:
+                continue
+            for cell in self._covered_cells(brick.rect):
+                cell_bricks = self._cells[cell]
+                cell_bricks.remove(brick)
+                if not cell_bricks:
+                    del self._cells[cell]
+
+    def empty(self):
+        self._cells.clear()
+        self._order.clear()
+        self.bottom = None
+
+    def candidates(self, rect):
+        """
+        Get the bricks which may collide or contact the `rect` in the group order
+        """
+        cells = self._cells
+        candidates = set()
+        for cell_x in range(rect.left // self._cell_width, rect.right // self._cell_width + 1):
+            for cell_y in range(rect.top // self._cell_height, rect.bottom // self._cell_height + 1):
+                bricks = cells.get((cell_x, cell_y))
+                if bricks:
+                    candidates.update(bricks)
+        if len(candidates) < 2:
+            return list(candidates)
+        return sorted(candidates, key=self._order.__getitem__)
+
+    def spritecollide(self, sprite, dokill: bool, collided=physics.collide_or_contact):
+        """
+        The same as `pygame.sprite.spritecollide(sprite, self, dokill, collided)`
+        but only checks the bricks near the `sprite`
+        """
+        hit_bricks = [brick for brick in self.candidates(sprite.rect)
+                      if collided(sprite, brick)]
+        if dokill:
+            self.remove(*hit_bricks)
+        return hit_bricks
@@ -0,0 +1,68 @@
+"""
+The closed-form prediction of the next physics event of the moving ball.
+
+Between two events, the ball flies in a straight line at a constant speed, so
+its position after `n` frames is `pos + n * speed`. An event is a frame in which
+the physics may do more than moving the ball:
+- The ball collides with or contacts a brick (`collide_or_contact` is inclusive)
+- The bottom of the ball reaches the top of the platform, where the platform
+  checks and the game over check apply
+- The ball breaks or contacts the border of the play area
+"""
+
+
+def _ceil_div(a, b):
+    return -(-a // b)
+
+
+def frame_range(p0, v, low, high):
+    """
+    Get the range of the frames `n` satisfying `low <= p0 + n * v <= high`
+
+    @param p0 The position at frame 0
+    @param v The non-zero speed
+    @return (first frame, last frame). The range is empty if the first is larger than the last.
+    """
+    if v > 0:
+        return _ceil_div(low - p0, v), (high - p0) // v
+    return _ceil_div(p0 - high, -v), (p0 - low) // -v
+
+
+def frames_until_event(ball_rect, ball_speed, brick_rects, platform_top, area_rect):
+    """
+    Get the number of frames until the next event of the moving ball
+
+    @param ball_rect The current Rect of the ball
+    @param ball_speed The current (x, y) speed of the ball. Both should be non-zero.
+    @param brick_rects The Rects of the alive bricks
+    @param platform_top The y of the top of the platform
+    @param area_rect The Rect of the play area
+    @return The smallest `n >= 1` such that the `n`-th frame from now is an event frame
+    """
+    x, y = ball_rect.topleft
+    width, height = ball_rect.size
+    speed_x, speed_y = ball_speed
+
+    # The border of the play area
+    if speed_x > 0:
+        event = _ceil_div(area_rect.right - width - x, speed_x)
+    else:
+        event = _ceil_div(x - area_rect.left, -speed_x)
+    if speed_y > 0:
+        # The platform is above the bottom border
+        event = min(event, _ceil_div(platform_top - height - y, speed_y))
+    else:
+        event = min(event, _ceil_div(y - area_rect.top, -speed_y))
+    event = max(event, 1)
+
+    # The bricks
+    for rect in brick_rects:
+        first_x, last_x = frame_range(x, speed_x, rect.left - width, rect.right)
+        if first_x >= event or last_x < 1:
+            continue
+        first_y, last_y = frame_range(y, speed_y, rect.top - height, rect.bottom)
+        first = max(first_x, first_y, 1)
+        if first < event and first <= last_x and first <= last_y:
+            event = first
+
+    return event
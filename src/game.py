@@ -1,16 +1,101 @@
+import os
 import random
+from collections import namedtuple
 
 import pygame
 
 from mlgame.game.paia_game import GameStatus, GameResultState, PaiaGame
 from mlgame.view.decorator import check_game_progress, check_game_result
 from mlgame.view.view_model import create_text_view_data, Scene, create_scene_progress_data
+from .brick_group import GridBrickGroup
+from .collision import DEFAULT_PHYSICS_VERSION, PHYSICS_VERSIONS, frames_until_impact
+from .event import frames_until_event
 from .game_object import Ball, Platform, Brick, HardBrick, PlatformAction, SERVE_BALL_ACTIONS
+from .level import get_level
+from .observation import OBSERVATION_FORMATS, encode_scene_info, pack_bricks
+from .profiler import FrameProfiler
+from .replay import Replay, ReplayRecorder, ReplayResult, save_replay
+
+
+def _headless_from_env():
+    """
+    Read the headless switch from the `ARKANOID_HEADLESS` environment variable
+    """
+    return os.environ.get("ARKANOID_HEADLESS", "").lower() in ("1", "true", "yes", "on")
+
+
+class StepResult(namedtuple("StepResult", ["frames", "bricks_destroyed", "platform_hit", "status"])):
+    """
+    The aggregated result of `Arkanoid.step_many()` and `Arkanoid.fast_forward()`
+
+    @field frames The number of advanced frames
+    @field bricks_destroyed The number of destroyed bricks. Downgraded hard bricks are not counted.
+    @field platform_hit Whether the ball hit the platform
+    @field status The game status after the last advanced frame
+    """
+    __slots__ = ()
+
+
+class GameSnapshot(namedtuple("GameSnapshot", [
+        "level", "difficulty", "episode", "frame_count", "ball_served",
+        "ball", "platform", "brick_ids", "brick_hp", "rng_state"])):
+    """
+    The immutable and picklable state of `Arkanoid` created by `Arkanoid.snapshot()`
+
+    @field ball (x, y, speed x, speed y, last x, last y, hit platform times, hit brick false)
+    @field platform (x, y, speed x)
+    @field brick_ids The ids of the bricks in the level map, in the order of the brick group
+    @field brick_hp The HP of the bricks in `brick_ids`. 2 for the hard bricks.
+    @field rng_state The state of the random generator of the episode
+    """
+    __slots__ = ()
 
 
 class Arkanoid(PaiaGame):
-    def __init__(self, difficulty, level, user_num=1, *args, **kwargs):
+    def __init__(self, difficulty, level, user_num=1, seed=None, headless=None,
+                 incremental_progress=False, observation_format="DICT", profile=0, profile_output="",
+                 physics_version=DEFAULT_PHYSICS_VERSION, record_replay=False, replay_output="",
+                 *args, **kwargs):
+        """
+        @param seed The seed of the random generator of the game. None or a negative
+               value means unseeded. See `reset()` for the seed of each episode.
+        @param headless Whether the game runs without a pygame view. The game objects never
+               allocate pygame Surfaces, and `src.sprite_view.SpriteView`, which builds them
+               for drawing, refuses a headless game.
+               If it is None, the value is read from `ARKANOID_HEADLESS`.
+        @param incremental_progress Only send the brick changes in the scene progress data
+               after a keyframe. See `get_scene_progress_data()`.
+        @param observation_format "DICT" or "PACKED". See `get_data_from_game_to_player()`.
+        @param profile Record the timings of the latest `profile` frames in `self.profiler`.
+               0 disables the profiling, which adds no cost to the frames. See `src/profiler.py`.
+        @param profile_output Save the records as the Chrome trace format to this path
+               when the game result is requested
+        @param physics_version 1 for moving the ball and then checking the overlapping objects,
+               or 2 for the swept collision (see `src/collision.py`).
+               The version 1 is the default, which the recorded games are played with.
+        @param record_replay Record the commands of the frames for `get_replay()`. See `src/replay.py`.
+        @param replay_output Save the replay to this path when the game result is requested.
+               It also enables `record_replay`.
+        """
         super().__init__(user_num=user_num)
+        if observation_format not in OBSERVATION_FORMATS:
+            raise ValueError("observation_format should be one of {0}, but got '{1}'"
+                             .format(OBSERVATION_FORMATS, observation_format))
+        if physics_version not in PHYSICS_VERSIONS:
+            raise ValueError("physics_version should be one of {0}, but got '{1}'"
+                             .format(PHYSICS_VERSIONS, physics_version))
+
+        self.headless = _headless_from_env() if headless is None else bool(headless)
+        self.incremental_progress = incremental_progress
+        self.observation_format = observation_format
+        self.physics_version = physics_version
+        self.profiler = FrameProfiler(profile) if profile and profile > 0 else None
+        self.profile_output = profile_output
+        self._replay_recorder = ReplayRecorder() if record_replay or replay_output else None
+        self.replay_output = replay_output
+        self.seed = seed if seed is not None and seed >= 0 else None
+        self.episode = 0
+        self._rng = self._create_episode_rng()
         self.frame_count = 0
         self.level = level
         self.difficulty = difficulty
@@ -23,25 +108,130 @@ class Arkanoid(PaiaGame):
 
     def update(self, commands):
         ai_1p_cmd = commands[self.ai_clients()[0]["name"]]
-        command = (PlatformAction(ai_1p_cmd)
-                   if ai_1p_cmd in PlatformAction.__members__ else PlatformAction.NONE)
+        self._update_frame(self._parse_command(ai_1p_cmd))
+
+        if not self.is_running:
+            return "RESET"
+
+    def step_many(self, command, k: int) -> StepResult:
+        """
+        Advance up to `k` frames with the same command, which is the same as
+        calling `update()` with the command for each frame.
+        It stops early after a frame in which the game ends or the ball hits bricks.
 
+        @param command The command string of the 1P, e.g. "MOVE_LEFT"
+        @param k The maximum number of frames to advance
+        @return The aggregated `StepResult` of the advanced frames
+        """
+        platform_action = self._parse_command(command)
+        hit_platform_times = self._ball.hit_platform_times
+
+        frames = 0
+        bricks_destroyed = 0
+        status = self.get_game_status()
+        while frames < k and status == GameStatus.GAME_ALIVE:
+            self._update_frame(platform_action)
+            frames += 1
+            bricks_destroyed += self._frame_destroyed_bricks
+            status = self.get_game_status()
+            if self._frame_hit_bricks:
+                break
+
+        return StepResult(
+            frames=frames,
+            bricks_destroyed=bricks_destroyed,
+            platform_hit=self._ball.hit_platform_times != hit_platform_times,
+            status=status)
+
+    def fast_forward(self, command, k: int) -> StepResult:
+        """
+        The same as `step_many()`, but the frames in which the served ball only flies
+        are skipped at once. The frame of the next event (brick, wall, or reaching
+        the platform) is computed in closed form, and only the event frames are
+        simulated frame by frame. It is made for the offline evaluation and search,
+        which don't need the scene info of each frame.
+
+        @param command The command string of the 1P, e.g. "MOVE_LEFT"
+        @param k The maximum number of frames to advance
+        @return The aggregated `StepResult` of the advanced frames
+        """
+        platform_action = self._parse_command(command)
+        hit_platform_times = self._ball.hit_platform_times
+
+        frames = 0
+        bricks_destroyed = 0
+        status = self.get_game_status()
+        while frames < k and status == GameStatus.GAME_ALIVE:
+            if self.ball_served:
+                free_frames = min(self._frames_until_event() - 1, k - frames)
+                if free_frames > 0:
+                    self._skip_frames(platform_action, free_frames)
+                    frames += free_frames
+                    status = self.get_game_status()
+                    continue
+
+            self._update_frame(platform_action)
+            frames += 1
+            bricks_destroyed += self._frame_destroyed_bricks
+            status = self.get_game_status()
+            if self._frame_hit_bricks:
+                break
+
+        return StepResult(
+            frames=frames,
+            bricks_destroyed=bricks_destroyed,
+            platform_hit=self._ball.hit_platform_times != hit_platform_times,
+            status=status)
+
+    def _frames_until_event(self) -> int:
+        if self.physics_version == 2:
+            return frames_until_impact(
+                self._ball.rect, self._ball._speed, [brick.rect for brick in self._group_brick],
+                self._platform.rect.top, self._ball._play_area_rect)
+        return frames_until_event(
+            self._ball.rect, self._ball._speed, [brick.rect for brick in self._group_brick],
+            self._platform.rect.top, self._ball._play_area_rect)
+
+    def _skip_frames(self, command: PlatformAction, frames: int):
+        """
+        Advance the frames without events, which is the same as
+        calling `_update_frame()` for each frame.
+        """
+        self.frame_count += frames
+        self._frame_hit_bricks = 0
+        self._frame_destroyed_bricks = 0
+        self._status_dirty = True
+        if self._replay_recorder is not None:
+            self._replay_recorder.record(command, frames)
+        self._platform.move_frames(command, frames)
+        self._ball.move_frames(frames)
+
+    @staticmethod
+    def _parse_command(command) -> PlatformAction:
+        return (PlatformAction(command)
+                if command in PlatformAction.__members__ else PlatformAction.NONE)
+
+    def _update_frame(self, command: PlatformAction):
         self.frame_count += 1
+        self._frame_hit_bricks = 0
+        self._frame_destroyed_bricks = 0
+        self._status_dirty = True
+        if self._replay_recorder is not None:
+            self._replay_recorder.record(command)
         self._platform.move(command)
 
         if not self.ball_served:
             # Force to serve the ball after 150 frames
             if (self.frame_count >= 150 and
                     command not in SERVE_BALL_ACTIONS):
-                command = random.choice(SERVE_BALL_ACTIONS)
+                command = self._rng.choice(SERVE_BALL_ACTIONS)
+                if self._replay_recorder is not None:
+                    self._replay_recorder.serve = command
 
             self._wait_for_serving_ball(command)
         else:
             self._ball_moving()
 
-        if not self.is_running:
-            return "RESET"
-
     def _wait_for_serving_ball(self, platform_action: PlatformAction):
         self._ball.stick_on_platform(self._platform.rect.centerx)
 
@@ -50,9 +240,13 @@ class Arkanoid(PaiaGame):
             self.ball_served = True
 
     def _ball_moving(self):
-        self._ball.move()
+        if self.physics_version == 2:
+            hit_bricks, new_bricks = self._ball.sweep(self._platform, self._group_brick)
+        else:
+            self._ball.move()
+            hit_bricks, new_bricks = self._ball.check_hit_brick(self._group_brick)
+            self._ball.check_bouncing(self._platform)
 
-        hit_bricks, new_bricks = self._ball.check_hit_brick(self._group_brick)
         for brick in hit_bricks:
             if isinstance(brick, HardBrick):
                 self._hard_brick.remove(brick)
@@ -60,31 +254,167 @@ class Arkanoid(PaiaGame):
                 self._brick.remove(brick)
         self._brick.extend(new_bricks)
 
-        self._ball.check_bouncing(self._platform)
+        if hit_bricks:
+            self._frame_hit_bricks = len(hit_bricks)
+            self._frame_destroyed_bricks = len(hit_bricks) - len(new_bricks)
+            self._invalidate_brick_positions()
+            if self.incremental_progress:
+                self._record_brick_delta(hit_bricks, new_bricks)
+
+    def _invalidate_brick_positions(self):
+        self._brick_positions = None
+        self._hard_brick_positions = None
+        self._packed_bricks = None
+        self._brick_state = None
+
+    def _get_brick_positions(self):
+        """
+        Get the positions of bricks and hard bricks as tuples,
+        which are shared between frames until the bricks change.
+        """
+        if self._brick_positions is None:
+            self._brick_positions = tuple(brick.pos for brick in self._brick)
+            self._hard_brick_positions = tuple(brick.pos for brick in self._hard_brick)
+        return self._brick_positions, self._hard_brick_positions
+
+    def _get_brick_state(self):
+        """
+        Get the brick ids and HPs for the snapshot, which are shared between
+        frames until the bricks change.
+        """
+        if self._brick_state is None:
+            self._brick_state = (
+                tuple(brick.brick_id for brick in self._group_brick),
+                tuple(2 if isinstance(brick, HardBrick) else 1 for brick in self._group_brick))
+        return self._brick_state
+
+    def snapshot(self) -> GameSnapshot:
+        """
+        Capture the state of the game, which can be restored by `restore()`.
+        The scene progress data and the game result are not included.
+        """
+        ball = self._ball
+        platform = self._platform
+        brick_ids, brick_hp = self._get_brick_state()
+        return GameSnapshot(
+            level=self.level,
+            difficulty=self.difficulty,
+            episode=self.episode,
+            frame_count=self.frame_count,
+            ball_served=self.ball_served,
+            ball=(ball.rect.x, ball.rect.y, ball._speed[0], ball._speed[1],
+                  ball._last_pos.x, ball._last_pos.y, ball.hit_platform_times, ball.hit_brick_false),
+            platform=(platform.rect.x, platform.rect.y, platform._speed[0]),
+            brick_ids=brick_ids,
+            brick_hp=brick_hp,
+            rng_state=self._rng.getstate())
+
+    def restore(self, state: GameSnapshot):
+        """
+        Restore the game to the `state` created by `snapshot()` of a game
+        with the same level and difficulty.
+
+        The bricks are only rebuilt if they are different from the current ones,
+        and the brick objects are reused, so restoring is cheap for the search
+        which branches from a state many times.
+        After restoring, the next incremental scene progress data is a keyframe.
+        """
+        if state.level != self.level or state.difficulty != self.difficulty:
+            raise ValueError("The snapshot of level {0} {1} can't be restored to level {2} {3}"
+                             .format(state.level, state.difficulty, self.level, self.difficulty))
+
+        self.episode = state.episode
+        self.frame_count = state.frame_count
+        self.ball_served = state.ball_served
+        self.game_result_state = GameResultState.FAIL
+        self._rng.setstate(state.rng_state)
+
+        ball = self._ball
+        (ball.rect.x, ball.rect.y, speed_x, speed_y, ball._last_pos.x, ball._last_pos.y,
+         ball.hit_platform_times, ball.hit_brick_false) = state.ball
+        ball._speed = [speed_x, speed_y]
+        platform = self._platform
+        platform.rect.x, platform.rect.y, platform._speed[0] = state.platform
+
+        if self._get_brick_state() != (state.brick_ids, state.brick_hp):
+            self._restore_bricks(state.brick_ids, state.brick_hp)
+
+        self._frame_hit_bricks = 0
+        self._frame_destroyed_bricks = 0
+        self._status_dirty = True
+        self._progress_keyframe = True
+        self._removed_brick_delta = []
+        self._recolored_brick_delta = []
+
+    def _restore_bricks(self, brick_ids, brick_hp):
+        # Keep the current bricks for reusing, keyed by the brick id and the HP
+        for brick in self._group_brick:
+            self._brick_sprites[brick.brick_id, 2 if isinstance(brick, HardBrick) else 1] = brick
+
+        positions = get_level(self.level).positions
+        self._group_brick.empty()
+        self._brick = []
+        self._hard_brick = []
+        for brick_id, hp in zip(brick_ids, brick_hp):
+            brick = self._brick_sprites.get((brick_id, hp))
+            if brick is None:
+                BrickType = HardBrick if hp == 2 else Brick
+                brick = BrickType(positions[brick_id], brick_id=brick_id)
+                self._brick_sprites[brick_id, hp] = brick
+            elif hp == 2 and brick.hp != 2:
+                # The hard brick was hit after the snapshot
+                brick.reset()
+
+            self._group_brick.add(brick)
+            if hp == 2:
+                self._hard_brick.append(brick)
+            else:
+                self._brick.append(brick)
+
+        self._invalidate_brick_positions()
+        self._brick_state = (brick_ids, brick_hp)
 
     def get_data_from_game_to_player(self):
-        to_players_data = {}
+        """
+        Get the scene info for each AI client.
+
+        Each client gets its own dict, and the brick positions are read-only tuples,
+        so an AI client modifying its scene info doesn't affect the game or other clients.
+
+        In the "PACKED" observation format, each client gets
+        `{"status": <status>, "packed": <bytes>}` instead,
+        which is decoded by `src.observation.decode_scene_info()`.
+        """
+        bricks, hard_bricks = self._get_brick_positions()
         data_to_1p = {
             "frame": self.frame_count,
             "status": self.get_game_status(),
             "ball": self._ball.pos,
             "ball_served": self.ball_served,
             "platform": self._platform.pos,
-            "bricks": [],
-            "hard_bricks": []
+            "bricks": bricks,
+            "hard_bricks": hard_bricks
         }
-        for brick in self._hard_brick:
-            data_to_1p["hard_bricks"].append(brick.pos)
 
-        for brick in self._brick:
-            data_to_1p["bricks"].append(brick.pos)
+        if self.observation_format == "PACKED":
+            if self._packed_bricks is None:
+                self._packed_bricks = pack_bricks(bricks, hard_bricks)
+            packed = encode_scene_info(data_to_1p, self._packed_bricks)
+            data_to_1p = {"status": str(data_to_1p["status"]), "packed": packed}
 
+        to_players_data = {}
         for ai_client in self.ai_clients():
-            to_players_data[ai_client['name']] = data_to_1p
+            to_players_data[ai_client['name']] = dict(data_to_1p)
 
         return to_players_data
 
     def get_game_status(self):
+        """
+        Get the game status. It is evaluated once per frame.
+        """
+        if not self._status_dirty:
+            return self._game_status
+
         if len(self._group_brick) == 0:
             self._game_status = GameStatus.GAME_PASS
         elif self._ball.rect.top >= self._platform.rect.bottom:
@@ -93,15 +423,30 @@ class Arkanoid(PaiaGame):
             self._game_status = GameStatus.GAME_PASS
         else:
             self._game_status = GameStatus.GAME_ALIVE
+        self._status_dirty = False
         return self._game_status
 
+    def _create_episode_rng(self):
+        """
+        Create the random generator of the current episode.
+        The generator of the episode `n` of the game seeded `s` is seeded "s:n",
+        so every episode is reproducible by the seed and the episode number.
+        """
+        if self.seed is None:
+            return random.Random()
+        return random.Random("{0}:{1}".format(self.seed, self.episode))
+
     def reset(self):
+        self.episode += 1
+        self._rng = self._create_episode_rng()
         self.game_result_state = GameResultState.FAIL
         self.ball_served = False
         self.frame_count = 0
         self._brick = []
         self._hard_brick = []
         self._create_init_scene()
+        if self._replay_recorder is not None:
+            self._replay_recorder.reset()
         pass
 
     @property
@@ -112,14 +457,69 @@ class Arkanoid(PaiaGame):
         scene_init_data = {"scene": self.scene.__dict__,"assets": []}
         return scene_init_data
 
+    def _record_brick_delta(self, hit_bricks, new_bricks):
+        """
+        Record the destroyed and downgraded bricks for the incremental scene progress data
+        """
+        downgraded_ids = set()
+        for brick in new_bricks:
+            downgraded_ids.add(brick.brick_id)
+            self._recolored_brick_delta.append([brick.brick_id, brick.get_object_data])
+        for brick in hit_bricks:
+            if brick.brick_id not in downgraded_ids:
+                self._removed_brick_delta.append(brick.brick_id)
+
     @check_game_progress
     def get_scene_progress_data(self):
+        """
+        Get the scene progress data.
+
+        If `incremental_progress` is set, the bricks are only drawn in the keyframe,
+        which is the first progress data after the game is created or reset.
+        The following progress data only contain the moving objects, and the changes
+        of the bricks since the last progress data are stored in `game_sys_info`:
+        - `brick_ids`: The ids of the bricks in the keyframe, in the order of the bricks
+        - `removed_bricks`: The ids of the destroyed bricks
+        - `recolored_bricks`: The [id, object data] of the downgraded hard bricks.
+          A downgraded brick is moved to the end of the brick list.
+
+        Use `get_full_scene_progress_data()` or `SceneProgressAccumulator` to get
+        the full progress data.
+        """
+        if not self.incremental_progress:
+            return self._create_scene_progress_data(include_bricks=True)
+
+        keyframe = self._progress_keyframe
+        game_sys_info = {
+            "keyframe": keyframe,
+            "removed_bricks": self._removed_brick_delta,
+            "recolored_bricks": self._recolored_brick_delta,
+        }
+        if keyframe:
+            game_sys_info["brick_ids"] = [brick.brick_id for brick in self._group_brick]
+
+        self._progress_keyframe = False
+        self._removed_brick_delta = []
+        self._recolored_brick_delta = []
+
+        return self._create_scene_progress_data(include_bricks=keyframe,
+                                                game_sys_info=game_sys_info)
+
+    @check_game_progress
+    def get_full_scene_progress_data(self):
+        """
+        Get the scene progress data containing all the bricks in any mode
+        """
+        return self._create_scene_progress_data(include_bricks=True)
+
+    def _create_scene_progress_data(self, include_bricks: bool, game_sys_info=None):
         bricks_data = []
         lines = []
-        for brick in self._group_brick:
-            bricks_data.append(brick.get_object_data)
-            lines.append(brick.get_line_data1)
-            lines.append(brick.get_line_data2)
+        if include_bricks:
+            for brick in self._group_brick:
+                bricks_data.append(brick.get_object_data)
+                lines.append(brick.get_line_data1)
+                lines.append(brick.get_line_data2)
 
         game_obj_list = []
         for move in self._group_move:
@@ -143,12 +543,29 @@ class Arkanoid(PaiaGame):
 
         scene_progress = create_scene_progress_data(
             frame=self.frame_count, object_list=game_obj_list,
-            foreground=foreground)
+            foreground=foreground, game_sys_info=game_sys_info)
         return scene_progress
 
     @check_game_result
     def get_game_result(self):
-        if self._game_status == GameStatus.GAME_PASS:
+        if self.profiler is not None and self.profile_output:
+            self.profiler.save(self.profile_output)
+        if self._replay_recorder is not None and self.replay_output:
+            save_replay(self.replay_output, self.get_replay())
+        return self._game_result()
+
+    def get_replay(self) -> Replay:
+        """
+        Get the replay of the frames since the game is created or reset, with the
+        game result at the current frame. It needs `record_replay` or `replay_output`.
+        The commands before `restore()` are kept, so the replay of a restored game doesn't match.
+        """
+        if self._replay_recorder is None:
+            raise RuntimeError("The replay is not recorded. Create the game with record_replay=True.")
+        return self._replay_recorder.to_replay(self, ReplayResult.from_game_result(self._game_result()))
+
+    def _game_result(self):
+        if self.get_game_status() == GameStatus.GAME_PASS:
             self.game_result_state = GameResultState.FINISH
         return {
             "frame_used": self.frame_count,
@@ -191,46 +608,44 @@ class Arkanoid(PaiaGame):
         '''
         self._create_moves()
         self._create_bricks(self.level)
+        self._invalidate_brick_positions()
+        self._status_dirty = True
+
+        # The next incremental scene progress data is a keyframe
+        self._progress_keyframe = True
+        self._removed_brick_delta = []
+        self._recolored_brick_delta = []
+
+        if self.profiler is not None:
+            # Wrap the methods of the new game objects
+            self.profiler.attach(self)
 
     def _create_moves(self):
-        self._group_move = pygame.sprite.RenderPlain()
         enable_slide_ball = False if self.difficulty == "EASY" else True
-        self._ball = Ball((93, 395), pygame.Rect(0, 0, 200, 500), enable_slide_ball, self._group_move)
-        self._platform = Platform((75, 400), pygame.Rect(0, 0, 200, 500), self._group_move)
+        self._ball = Ball((93, 395), pygame.Rect(0, 0, 200, 500), enable_slide_ball)
+        self._platform = Platform((75, 400), pygame.Rect(0, 0, 200, 500))
+        self._group_move = (self._ball, self._platform)
 
     def _create_bricks(self, level: int):
-        def get_coordinate_and_type(string):
-            string = string.rstrip("\n").split(' ')
-            return int(string[0]), int(string[1]), int(string[2])
-
-        self._group_brick = pygame.sprite.RenderPlain()
+        self._group_brick = GridBrickGroup()
         self._brick_container = []
+        # The bricks kept for `restore()`, keyed by the brick id and the HP
+        self._brick_sprites = {}
+
+        level_data = get_level(level)
+        for brick_id, (pos, type) in enumerate(zip(level_data.positions, level_data.types)):
+            BrickType = {
+                0: Brick,
+                1: HardBrick,
+            }.get(type, Brick)
 
-        import os.path as path
-        asset_path = path.join(path.dirname(__file__), '..', 'asset')
-
-        level_file_path = path.join(asset_path, "level_data/{0}.dat".format(level))
-        if not path.exists(level_file_path):
-            print("level is not existed , turn to level 1")
-            level_file_path = path.join(asset_path, "level_data/{0}.dat".format(1))
-
-        with open(level_file_path, 'r') as input_file:
-            offset_x, offset_y, _ = get_coordinate_and_type(input_file.readline())
-            for input_pos in input_file:
-                pos_x, pos_y, type = get_coordinate_and_type(input_pos.rstrip("\n"))
-                BrickType = {
-                    0: Brick,
-                    1: HardBrick,
-                }.get(type, Brick)
-
-                brick = BrickType((pos_x + offset_x, pos_y + offset_y),
-                                  self._group_brick)
-                self._brick_container.append(brick)
-
-                if BrickType == Brick:
-                    self._brick.append(brick)
-                else:
-                    self._hard_brick.append(brick)
+            brick = BrickType(pos, self._group_brick, brick_id=brick_id)
+            self._brick_container.append(brick)
+
+            if BrickType == Brick:
+                self._brick.append(brick)
+            else:
+                self._hard_brick.append(brick)
 
     @staticmethod
     def ai_clients():
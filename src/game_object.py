@@ -1,30 +1,28 @@
 from mlgame.view.view_model import create_line_view_data
-import pygame
-from pygame import Rect, Surface
+from pygame import Rect
 from pygame.math import Vector2
-from pygame.sprite import Sprite
-import random
 
 from mlgame.game import physics
 from mlgame.utils.enum import StringEnum, auto
+from . import collision
+from .brick_group import GridBrickGroup
 
-class Brick(Sprite):
-    def __init__(self, init_pos, *groups):
-        super().__init__(*groups)
+# The game objects only hold their state in slots. They have no pygame Surface,
+# and the color is derived from the type (and the HP), so a brick is a rect and an id.
+# Use `src.sprite_view.SpriteView` to draw them with pygame.
 
+class Brick:
+    __slots__ = ("rect", "brick_id")
+
+    color = "#E09E42"   # Orange
+
+    def __init__(self, init_pos, *groups, brick_id=None):
+        # The id of the brick in the level map, kept when a hard brick is downgraded
+        self.brick_id = brick_id
         self.rect = Rect(init_pos[0], init_pos[1], 25, 10)
-        self.image = self._create_surface((244, 158, 66))   # Orange
-        self.color = "#E09E42"
-
-    def _create_surface(self, color):
-        surface = Surface((self.rect.width, self.rect.height))
-        surface.fill(color)
-        
-        # pygame.draw.line(surface, (0, 0, 0),
-        #     (self.rect.width - 1, 0), (self.rect.width - 1, self.rect.height - 1))
-        # pygame.draw.line(surface, (0, 0, 0),
-        #     (0, self.rect.height - 1), (self.rect.width - 1, self.rect.height - 1))
-        return surface
+        # Join the groups after the rect is set for the grid indexed group
+        for group in groups:
+            group.add(self)
 
     @property
     def pos(self):
@@ -55,26 +53,26 @@ class Brick(Sprite):
                 "color": self.color}
 
 class HardBrick(Brick):
-    def __init__(self, init_pos, *groups):
-        super().__init__(init_pos, *groups)
+    __slots__ = ("hp",)
+
+    def __init__(self, init_pos, *groups, brick_id=None):
+        self.hp = 2
+        super().__init__(init_pos, *groups, brick_id=brick_id)
 
-        self.reset()
+    @property
+    def color(self):
+        return "#D11F1F" if self.hp == 2 else "#E09E42"     # Red, or orange after hit
 
     def reset(self):
         self.hp = 2
-        # Override the origin color
-        self.image = self._create_surface((209, 31, 31))    # Red
-        self.color = "#D11F1F"
 
     def hit(self):
         """
-        Decrease 1 HP and change the color of image and return the remaining HP
+        Decrease 1 HP and return the remaining HP. The color changes with the HP.
 
         @return The remaining HP
         """
         self.hp -= 1
-        self.image = self._create_surface((244, 158, 66))   # Orange
-        self.color = "#E09E42"
 
         return self.hp
     
@@ -97,23 +95,18 @@ class PlatformAction(StringEnum):
 
 SERVE_BALL_ACTIONS = (PlatformAction.SERVE_TO_LEFT, PlatformAction.SERVE_TO_RIGHT)
 
-class Platform(Sprite):
-    def __init__(self, init_pos, play_area_rect: Rect, *groups):
-        super().__init__(*groups)
+class Platform:
+    __slots__ = ("_play_area_rect", "_shift_speed", "_speed", "_init_pos", "rect")
+
+    color = "#42E27E"   # Green
 
+    def __init__(self, init_pos, play_area_rect: Rect):
         self._play_area_rect = play_area_rect
         self._shift_speed = 5
         self._speed = [0, 0]
         self._init_pos = init_pos
 
         self.rect = Rect(init_pos[0], init_pos[1], 40, 5)
-        self.image = self._create_surface()
-
-    def _create_surface(self):
-        surface = Surface((self.rect.width, self.rect.height))
-        surface.fill((66, 226, 126)) # Green
-        self.color = "#42E27E"
-        return surface
 
     @property
     def pos(self):
@@ -134,6 +127,25 @@ class Platform(Sprite):
 
         self.rect.move_ip(*self._speed)
 
+    def move_frames(self, move_action: PlatformAction, frames: int):
+        """
+        Move the platform as calling `move()` with the `move_action` for `frames` frames
+        """
+        if move_action == PlatformAction.MOVE_LEFT:
+            direction = -1
+            distance = self.rect.left - self._play_area_rect.left
+        elif move_action == PlatformAction.MOVE_RIGHT:
+            direction = 1
+            distance = self._play_area_rect.right - self.rect.right
+        else:
+            direction = 0
+            distance = 0
+
+        # The platform moves in each frame until it reaches the border
+        moves = min(frames, max(0, -(-distance // self._shift_speed)))
+        self.rect.move_ip(direction * self._shift_speed * moves, 0)
+        self._speed[0] = direction * self._shift_speed if moves == frames else 0
+
     @property
     def get_object_data(self):
         return {"type": "rect",
@@ -144,10 +156,13 @@ class Platform(Sprite):
                 "height": self.rect.height,
                 "color": self.color}
 
-class Ball(Sprite):
-    def __init__(self, init_pos, play_area_rect: Rect, enable_slide_ball: bool, *groups):
-        super().__init__(*groups)
+class Ball:
+    __slots__ = ("_play_area_rect", "_do_slide_ball", "_init_pos", "_speed",
+                 "hit_platform_times", "rect", "_last_pos", "hit_brick_false")
 
+    color = "#2CB9D6"   # Blue
+
+    def __init__(self, init_pos, play_area_rect: Rect, enable_slide_ball: bool):
         self._play_area_rect = play_area_rect
         self._do_slide_ball = enable_slide_ball
         self._init_pos = init_pos
@@ -156,20 +171,12 @@ class Ball(Sprite):
         self.hit_platform_times = 0
 
         self.rect = Rect(*self._init_pos, 5, 5)
-        self.image = self._create_surface()
 
         # For additional collision checking
         self._last_pos = self.rect.copy()
 
         self.hit_brick_false = 0
 
-
-    def _create_surface(self):
-        surface = pygame.Surface((self.rect.width, self.rect.height))
-        surface.fill((44, 185, 214)) # Blue
-        self.color = "#2CB9D6"
-        return surface
-
     @property
     def pos(self):
         return self.rect.topleft
@@ -193,6 +200,15 @@ class Ball(Sprite):
         self._last_pos.topleft = self.rect.topleft
         self.rect.move_ip(self._speed)
 
+    def move_frames(self, frames: int):
+        """
+        Move the ball as calling `move()` for `frames` frames without checking collisions
+        """
+        speed_x, speed_y = self._speed
+        self._last_pos.topleft = (self.rect.x + (frames - 1) * speed_x,
+                                  self.rect.y + (frames - 1) * speed_y)
+        self.rect.move_ip(frames * speed_x, frames * speed_y)
+
     def check_bouncing(self, platform: Platform):
         if (physics.collide_or_contact(self, platform) or
                 self._platform_additional_check(platform)):
@@ -242,17 +258,23 @@ class Ball(Sprite):
         else:
             return -7 if ball_speed_x > 0 else 7
 
-    def check_hit_brick(self, group_brick: pygame.sprite.RenderPlain) -> int:
+    def check_hit_brick(self, group_brick) -> int:
         """
         Check if the ball hits bricks in the `group_brick`.
         The hit bricks will be removed from `group_brick`, but the alive hard brick will not.
         However, if the ball speed is high, the hard brick will be rdedmoved with only one hit.
 
-        @param group_brick The sprite group containing bricks
+        @param group_brick The `GridBrickGroup` containing bricks, or a list of bricks
         @return destroyed bricks and created bricks
         """
-        hit_bricks = pygame.sprite.spritecollide(self, group_brick, 1,
-                                                 physics.collide_or_contact)
+        if isinstance(group_brick, GridBrickGroup):
+            # Only check the bricks in the grid cells the ball covers
+            hit_bricks = group_brick.spritecollide(self, 1, physics.collide_or_contact)
+        else:
+            hit_bricks = [brick for brick in group_brick
+                          if physics.collide_or_contact(self, brick)]
+            for brick in hit_bricks:
+                group_brick.remove(brick)
         new_bricks = []
 
         num_of_destroyed_brick = len(hit_bricks)
@@ -273,11 +295,159 @@ class Ball(Sprite):
             if abs(self._speed[0]) == 7:
                 for brick in hit_bricks:
                     if isinstance(brick, HardBrick) and brick.hit():
-                        new_bricks.append(Brick(brick.pos,group_brick))
+                        new_bricks.append(Brick(brick.pos, group_brick, brick_id=brick.brick_id))
                         num_of_destroyed_brick -= 1
 
         return hit_bricks, new_bricks
 
+    def sweep(self, platform: Platform, group_brick: GridBrickGroup):
+        """
+        Move the ball for a frame with the swept collision of the physics version 2,
+        which replaces `move()`, `check_hit_brick()` and `check_bouncing()`.
+        See `src/collision.py`.
+
+        The platform and the bricks are hit in the same way as the version 1. The slicing
+        changes the x speed from the next frame, so the ball stays at integer pixels.
+
+        @return destroyed bricks and created bricks, the same as `check_hit_brick()`
+        """
+        rect = self.rect
+        self._last_pos.topleft = rect.topleft
+        speed_x, speed_y = self._speed
+        area = self._play_area_rect
+        # The platform moved into the ball, so its side hits the ball before the ball moves
+        if rect.bottom > platform.rect.top and platform._speed[0] and rect.colliderect(platform.rect):
+            self.hit_platform_times += 1
+            self.hit_brick_false += 1
+            if platform._speed[0] < 0:
+                rect.right = platform.rect.left
+                speed_x = -abs(speed_x)
+            else:
+                rect.left = platform.rect.right
+                speed_x = abs(speed_x)
+
+        # The box covering the movement. Most frames only move the ball, if the box
+        # doesn't reach the walls, the top of the platform or any brick.
+        left = rect.left + speed_x if speed_x < 0 else rect.left
+        right = rect.right + speed_x if speed_x > 0 else rect.right
+        top = rect.top + speed_y if speed_y < 0 else rect.top
+        bottom = rect.bottom + speed_y if speed_y > 0 else rect.bottom
+        if group_brick.bottom is None or top > group_brick.bottom:
+            bricks = []
+        else:
+            bricks = group_brick.candidates(Rect(left, top, right - left, bottom - top))
+        if bricks:
+            bricks = [brick for brick in bricks
+                      if (brick.rect.left <= right and brick.rect.right >= left and
+                          brick.rect.top <= bottom and brick.rect.bottom >= top)]
+        if (not bricks and bottom < platform.rect.top and
+                area.left < left and right < area.right and area.top < top):
+            rect.move_ip(speed_x, speed_y)
+            return [], []
+
+        hit_bricks = []
+        new_bricks = []
+        sliced_speed_x = None
+
+        scale = collision.time_scale(speed_x, speed_y)
+        x, y = rect.x * scale, rect.y * scale
+        width, height = rect.width * scale, rect.height * scale
+        walls = (area.left * scale, area.top * scale, area.right * scale, area.bottom * scale)
+        platform_box = (platform.rect.left * scale, platform.rect.top * scale,
+                        platform.rect.right * scale, platform.rect.bottom * scale)
+
+        remaining = scale
+        wedged_impacts = 0
+        while remaining:
+            # Find the first time of impact and the faces and the corners hit at that time
+            time, wall_x, wall_y = collision.wall_impact(x, y, width, height, speed_x, speed_y, *walls)
+            faces = [(wall_x, wall_y)] if time <= remaining else []
+            time = min(time, remaining)
+
+            platform_hit = False
+            if bottom >= platform.rect.top:
+                impact = collision.box_impact(x, y, width, height, speed_x, speed_y, *platform_box)
+                if impact is not None and impact[0] <= time:
+                    if impact[0] < time:
+                        time, faces = impact[0], []
+                    faces.append(impact[1:])
+                    platform_hit = True
+
+            hit = []
+            for brick in bricks:
+                impact = collision.box_impact(x, y, width, height, speed_x, speed_y,
+                                              brick.rect.left * scale, brick.rect.top * scale,
+                                              brick.rect.right * scale, brick.rect.bottom * scale)
+                if impact is None or impact[0] > time:
+                    continue
+                if impact[0] < time:
+                    time, faces, platform_hit, hit = impact[0], [], False, []
+                faces.append(impact[1:])
+                hit.append(brick)
+
+            if not faces:
+                break
+            if time:
+                wedged_impacts = 0
+            else:
+                wedged_impacts += 1
+                if wedged_impacts > collision.MAX_IMPACTS:
+                    # The ball is wedged between the objects, so it stops at the impact
+                    remaining = 0
+                    break
+
+            # Reflect on the hit faces, or on both axes if only corners are hit
+            flip_x = any(face_x and not face_y for face_x, face_y in faces)
+            flip_y = any(face_y and not face_x for face_x, face_y in faces)
+            if not flip_x and not flip_y:
+                flip_x = flip_y = True
+
+            x += speed_x * time
+            y += speed_y * time
+            remaining -= time
+            if platform_hit:
+                self.hit_platform_times += 1
+                self.hit_brick_false += 1
+                if self._do_slide_ball and (-speed_y if flip_y else speed_y) < 0:
+                    sliced_speed_x = self._slice_ball(speed_x, platform._speed[0])
+            elif flip_x and sliced_speed_x is not None:
+                sliced_speed_x = -sliced_speed_x
+            if flip_x:
+                speed_x = -speed_x
+            if flip_y:
+                speed_y = -speed_y
+
+            if hit:
+                self.hit_brick_false = 0
+                group_brick.remove(*hit)
+                for brick in hit:
+                    # A brick created by a downgraded hard brick in this frame is just dropped
+                    if brick in new_bricks:
+                        new_bricks.remove(brick)
+                    else:
+                        hit_bricks.append(brick)
+                if abs(speed_x) == 7:
+                    for brick in hit:
+                        if isinstance(brick, HardBrick) and brick.hit():
+                            new_bricks.append(Brick(brick.pos, group_brick, brick_id=brick.brick_id))
+
+            if not remaining:
+                break
+            # The bricks near the rest of the movement
+            left, top, right, bottom = collision.sweep_bounds(
+                x, y, width, height, speed_x, speed_y, remaining, scale)
+            bricks = group_brick.candidates(Rect(left, top, right - left, bottom - top))
+            if (not bricks and bottom < platform.rect.top and
+                    area.left < left and right < area.right and area.top < top):
+                break
+
+        x += speed_x * remaining
+        y += speed_y * remaining
+        rect.topleft = (x // scale, y // scale)
+        self._speed = [speed_x if sliced_speed_x is None else sliced_speed_x, speed_y]
+
+        return hit_bricks, new_bricks
+
     @property
     def get_object_data(self):
         return {"type": "rect",
@@ -0,0 +1,201 @@
+"""
+The registry of level maps.
+
+Each level map `asset/level_data/<level>.dat` is parsed once per process and
+cached as a `LevelData`, so resetting a game rebuilds the bricks without file I/O.
+All levels can also be compiled into a binary bundle which is loaded in one read:
+
+    python -m src.level --compile
+
+The bundle `asset/level_data/levels.bin` is loaded at the first cache miss if it
+exists and is not older than the map files, so the edited maps are still parsed.
+"""
+import argparse
+import glob
+import os
+import struct
+from collections import namedtuple
+
+LEVEL_DATA_PATH = os.path.join(os.path.dirname(__file__), '..', 'asset', 'level_data')
+DEFAULT_BUNDLE_PATH = os.path.join(LEVEL_DATA_PATH, "levels.bin")
+
+_BUNDLE_MAGIC = b"ARKL"
+_BUNDLE_VERSION = 1
+_BUNDLE_HEADER = struct.Struct("<4sHH")
+_LEVEL_HEADER = struct.Struct("<hhhH")
+
+
+class LevelData(namedtuple("LevelData", ["level", "offset", "positions", "types"])):
+    """
+    The parsed level map
+
+    @field level The level id of the map
+    @field offset The (x, y) offset of the bricks
+    @field positions A tuple of the (x, y) brick positions, with the offset applied
+    @field types A tuple of the brick types, 0 for bricks and 1 for hard bricks
+    """
+    __slots__ = ()
+
+
+_levels = {}
+# Whether the default bundle has been tried since the cache was cleared
+_bundle_checked = False
+
+
+def read_level_file(level: int):
+    """
+    Read the level map `asset/level_data/<level>.dat`
+
+    @param level The level id. Fall back to level 1 if the map doesn't exist.
+    @return A tuple (offset_x, offset_y, bricks), where `bricks` is a list of
+            (x, y, type) in the order of the map file
+    """
+    def get_coordinate_and_type(string):
+        string = string.rstrip("\n").split(' ')
+        return int(string[0]), int(string[1]), int(string[2])
+
+    level_file_path = os.path.join(LEVEL_DATA_PATH, "{0}.dat".format(level))
+    if not os.path.exists(level_file_path):
+        print("level is not existed , turn to level 1")
+        level_file_path = os.path.join(LEVEL_DATA_PATH, "{0}.dat".format(1))
+
+    with open(level_file_path, 'r') as input_file:
+        offset_x, offset_y, _ = get_coordinate_and_type(input_file.readline())
+        bricks = [get_coordinate_and_type(input_pos.rstrip("\n"))
+                  for input_pos in input_file]
+
+    return offset_x, offset_y, bricks
+
+
+def _parse_level(level: int) -> LevelData:
+    offset_x, offset_y, bricks = read_level_file(level)
+    return LevelData(
+        level=level,
+        offset=(offset_x, offset_y),
+        positions=tuple((x + offset_x, y + offset_y) for x, y, _ in bricks),
+        types=tuple(type for _, _, type in bricks))
+
+
+def get_level(level: int) -> LevelData:
+    """
+    Get the level map from the cache. At the first cache miss, the default bundle is
+    loaded if it is up to date. The maps not in the bundle are parsed at the first request.
+    """
+    global _bundle_checked
+
+    level_data = _levels.get(level)
+    if level_data is None:
+        if not _bundle_checked:
+            _bundle_checked = True
+            _load_default_bundle()
+            level_data = _levels.get(level)
+        if level_data is None:
+            level_data = _levels[level] = _parse_level(level)
+    return level_data
+
+
+def clear_level_cache():
+    """
+    Drop the cached level maps, e.g. after editing the map files
+    """
+    global _bundle_checked
+
+    _levels.clear()
+    _bundle_checked = False
+
+
+def _load_default_bundle():
+    """
+    Load the default bundle if it exists and no map file is newer than it
+    """
+    try:
+        bundle_mtime = os.path.getmtime(DEFAULT_BUNDLE_PATH)
+    except OSError:
+        return
+    map_paths = glob.glob(os.path.join(LEVEL_DATA_PATH, "*.dat"))
+    if any(os.path.getmtime(map_path) > bundle_mtime for map_path in map_paths):
+        print("The level bundle is older than the map files, which are parsed instead")
+        return
+    try:
+        load_level_bundle(DEFAULT_BUNDLE_PATH)
+    except (OSError, ValueError, struct.error) as e:
+        print("Failed to load the level bundle: {0}".format(e))
+
+
+def _available_levels():
+    return sorted(int(os.path.splitext(os.path.basename(file_path))[0])
+                  for file_path in glob.glob(os.path.join(LEVEL_DATA_PATH, "*.dat"))
+                  if os.path.splitext(os.path.basename(file_path))[0].isdigit())
+
+
+def compile_level_bundle(bundle_path=DEFAULT_BUNDLE_PATH, levels=None):
+    """
+    Compile the level maps into a binary bundle
+
+    @param bundle_path The path of the bundle file
+    @param levels The level ids to be compiled. All the maps in `asset/level_data` by default.
+    @return The compiled level ids
+    """
+    if levels is None:
+        levels = _available_levels()
+
+    chunks = [_BUNDLE_HEADER.pack(_BUNDLE_MAGIC, _BUNDLE_VERSION, len(levels))]
+    for level in levels:
+        level_data = _parse_level(level)
+        chunks.append(_LEVEL_HEADER.pack(level, *level_data.offset, len(level_data.types)))
+        chunks.append(struct.pack("<{0}h".format(3 * len(level_data.types)),
+                                  *(value
+                                    for (x, y), type in zip(level_data.positions, level_data.types)
+                                    for value in (x, y, type))))
+
+    with open(bundle_path, "wb") as f:
+        f.write(b"".join(chunks))
+
+    return list(levels)
+
+
+def load_level_bundle(bundle_path=DEFAULT_BUNDLE_PATH):
+    """
+    Load all levels in the binary bundle into the cache with one read
+
+    @return The loaded level ids
+    """
+    with open(bundle_path, "rb") as f:
+        buffer = f.read()
+
+    magic, version, num_levels = _BUNDLE_HEADER.unpack_from(buffer, 0)
+    if magic != _BUNDLE_MAGIC or version != _BUNDLE_VERSION:
+        raise ValueError("'{0}' is not a level bundle of version {1}"
+                         .format(bundle_path, _BUNDLE_VERSION))
+
+    loaded_levels = []
+    pos = _BUNDLE_HEADER.size
+    for _ in range(num_levels):
+        level, offset_x, offset_y, num_bricks = _LEVEL_HEADER.unpack_from(buffer, pos)
+        pos += _LEVEL_HEADER.size
+        values = struct.unpack_from("<{0}h".format(3 * num_bricks), buffer, pos)
+        pos += 6 * num_bricks
+
+        _levels[level] = LevelData(
+            level=level,
+            offset=(offset_x, offset_y),
+            positions=tuple(zip(values[0::3], values[1::3])),
+            types=values[2::3])
+        loaded_levels.append(level)
+
+    return loaded_levels
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compile the level maps into a binary bundle.")
+    parser.add_argument("--compile", action="store_true",
+                        help="Compile all maps in asset/level_data")
+    parser.add_argument("--output", type=str, default=DEFAULT_BUNDLE_PATH,
+                        help="The path of the bundle file")
+    args = parser.parse_args()
+
+    if args.compile:
+        compiled_levels = compile_level_bundle(args.output)
+        print("Compiled {0} levels into {1}".format(len(compiled_levels), args.output))
+    else:
+        parser.print_help()
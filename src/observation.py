@@ -0,0 +1,93 @@
+"""
+The packed binary encoding of the scene info sent to the AI clients.
+
+The packed scene info is a `bytes` with a fixed header followed by the int16
+(x, y) positions of the bricks and then the hard bricks:
+
+    uint32 frame
+    uint8  status       0: GAME_ALIVE, 1: GAME_PASS, 2: GAME_OVER
+    int16  ball_x, ball_y
+    int16  platform_x, platform_y
+    uint8  ball_served
+    uint16 number of bricks
+    uint16 number of hard bricks
+
+In the "PACKED" observation format of `Arkanoid`, each AI client receives
+`{"status": <status>, "packed": <bytes>}`, which keeps the "status" key read by MLGame.
+Use `decode_scene_info()` in the AI script to get the ordinary scene info dict.
+"""
+import struct
+import sys
+from array import array
+
+OBSERVATION_FORMATS = ("DICT", "PACKED")
+
+STATUS_NAMES = ("GAME_ALIVE", "GAME_PASS", "GAME_OVER")
+_STATUS_CODES = {name: code for code, name in enumerate(STATUS_NAMES)}
+
+_HEADER = struct.Struct("<IBhhhhBHH")
+_BIG_ENDIAN = sys.byteorder == "big"
+
+
+def pack_bricks(bricks, hard_bricks) -> bytes:
+    """
+    Pack the brick positions into the body of the packed scene info
+    """
+    positions = array("h")
+    for pos in bricks:
+        positions.extend(pos)
+    for pos in hard_bricks:
+        positions.extend(pos)
+    if _BIG_ENDIAN:
+        positions.byteswap()
+    return positions.tobytes()
+
+
+def encode_scene_info(scene_info: dict, packed_bricks: bytes = None) -> bytes:
+    """
+    Encode the scene info dict into bytes
+
+    @param scene_info The scene info generated by `Arkanoid.get_data_from_game_to_player()`
+    @param packed_bricks The result of `pack_bricks()` for the bricks in the `scene_info`.
+           It is generated from the `scene_info` if not given.
+    """
+    if packed_bricks is None:
+        packed_bricks = pack_bricks(scene_info["bricks"], scene_info["hard_bricks"])
+
+    return _HEADER.pack(
+        scene_info["frame"], _STATUS_CODES[scene_info["status"]],
+        *scene_info["ball"], *scene_info["platform"], scene_info["ball_served"],
+        len(scene_info["bricks"]), len(scene_info["hard_bricks"])) + packed_bricks
+
+
+def decode_scene_info(scene_info) -> dict:
+    """
+    Decode the packed scene info into the ordinary scene info dict
+
+    @param scene_info The packed bytes, or the dict containing them in the "packed" key.
+           An ordinary scene info dict is returned as it is, so the AI script
+           can call this function in either observation format.
+    """
+    if isinstance(scene_info, dict):
+        if "packed" not in scene_info:
+            return scene_info
+        scene_info = scene_info["packed"]
+
+    (frame, status, ball_x, ball_y, platform_x, platform_y, ball_served,
+     num_bricks, num_hard_bricks) = _HEADER.unpack_from(scene_info, 0)
+
+    positions = array("h")
+    positions.frombytes(scene_info[_HEADER.size:])
+    if _BIG_ENDIAN:
+        positions.byteswap()
+    points = list(zip(positions[0::2], positions[1::2]))
+
+    return {
+        "frame": frame,
+        "status": STATUS_NAMES[status],
+        "ball": (ball_x, ball_y),
+        "ball_served": bool(ball_served),
+        "platform": (platform_x, platform_y),
+        "bricks": tuple(points[:num_bricks]),
+        "hard_bricks": tuple(points[num_bricks:num_bricks + num_hard_bricks]),
+    }
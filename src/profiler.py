@@ -0,0 +1,256 @@
+"""
+The per-frame instrumentation of `Arkanoid`.
+
+`FrameProfiler.attach()` wraps the methods of the phases of a frame on the game
+instance and its objects, so nothing is wrapped and nothing is recorded when
+profiling is disabled. Each frame (`_update_frame()`, or `_skip_frames()` of
+`fast_forward()`) starts a `FrameRecord`, and the calls of the phases until the
+next frame are recorded into it:
+
+- The start time and the duration of each phase call
+- The collision candidates, which are the bricks near the ball checked by
+  `check_hit_brick()` or `sweep()`
+- The net change of the memory blocks allocated by Python (`sys.getallocatedblocks()`)
+  during the update of the frame
+
+The records are kept in a ring buffer of the latest frames, which is exported
+as JSON or as the Chrome trace format for `chrome://tracing` and Perfetto.
+
+Example:
+    game = Arkanoid("NORMAL", 1, profile=4096, profile_output="arkanoid.trace.json")
+"""
+import json
+import sys
+import time
+from collections import deque
+
+import numpy as np
+
+PHASES = (
+    "platform_move",
+    "ball_move",
+    "check_hit_brick",
+    "check_bouncing",
+    "get_game_status",
+    "get_data_from_game_to_player",
+    "get_scene_progress_data",
+    "skip_frames",
+    "ball_sweep",
+)
+
+_PHASE_INDEX = {phase: i for i, phase in enumerate(PHASES)}
+
+
+class FrameRecord:
+    """
+    The timings of a frame
+
+    @field frame The frame number
+    @field start_ns The start time of the update of the frame
+    @field update_ns The duration of the update of the frame
+    @field events The list of the phase calls (phase index, start time, duration)
+    @field allocated_blocks The net change of the allocated memory blocks in the update
+    @field collision_candidates The number of the bricks checked for the collision
+    """
+    __slots__ = ("frame", "start_ns", "update_ns", "events", "allocated_blocks", "collision_candidates")
+
+    def __init__(self, frame, start_ns):
+        self.frame = frame
+        self.start_ns = start_ns
+        self.update_ns = 0
+        self.events = []
+        self.allocated_blocks = 0
+        self.collision_candidates = 0
+
+    def phase_durations(self):
+        """
+        Get the total duration of each phase in the frame
+
+        @return The list of the durations in the order of `PHASES`
+        """
+        durations = [0] * len(PHASES)
+        for phase, _, duration in self.events:
+            durations[phase] += duration
+        return durations
+
+
+class FrameProfiler:
+    """
+    The ring buffer of the frame records of a game
+    """
+
+    def __init__(self, capacity=4096, track_allocations=True):
+        """
+        @param capacity The number of the latest frames kept
+        @param track_allocations Whether to count the allocated memory blocks,
+               which costs about 10 microseconds per frame
+        """
+        self.capacity = capacity
+        self.track_allocations = track_allocations
+        self.records = deque(maxlen=capacity)
+        self._current = None
+        # The class of a game object -> its subclass with the wrapped phases
+        self._profiled_classes = {}
+
+    def clear(self):
+        self.records.clear()
+        self._current = None
+
+    def attach(self, game):
+        """
+        Wrap the methods of the phases of the game. It should be called again
+        after the game objects are recreated (e.g. `reset()`).
+        """
+        self._wrap_frame(game, "_update_frame")
+        self._wrap_frame(game, "_skip_frames", "skip_frames")
+        self._wrap_object(game._platform, {"move": "platform_move"})
+        self._wrap_object(game._ball, {"move": "ball_move", "check_hit_brick": "check_hit_brick",
+                                       "check_bouncing": "check_bouncing", "sweep": "ball_sweep"})
+        for name in ("get_game_status", "get_data_from_game_to_player", "get_scene_progress_data"):
+            setattr(game, name, self._phase_wrapper(getattr(type(game), name), name).__get__(game))
+        if hasattr(game._group_brick, "candidates"):
+            self._wrap_candidates(game._group_brick)
+
+    def _record(self):
+        # The phases called before the first frame are recorded in the frame 0
+        if self._current is None:
+            self._current = FrameRecord(0, time.perf_counter_ns())
+            self.records.append(self._current)
+        return self._current
+
+    def _wrap_frame(self, obj, name, phase=None):
+        method = getattr(type(obj), name).__get__(obj)
+        phase_index = None if phase is None else _PHASE_INDEX[phase]
+
+        def wrapper(*args, **kwargs):
+            record = FrameRecord(obj.frame_count, time.perf_counter_ns())
+            self.records.append(record)
+            self._current = record
+            if self.track_allocations:
+                blocks = sys.getallocatedblocks()
+                result = method(*args, **kwargs)
+                record.allocated_blocks = sys.getallocatedblocks() - blocks
+            else:
+                result = method(*args, **kwargs)
+            record.update_ns = time.perf_counter_ns() - record.start_ns
+            # The record of the skipped frames is numbered by the last frame
+            record.frame = obj.frame_count
+            if phase_index is not None:
+                record.events.append((phase_index, record.start_ns, record.update_ns))
+            return result
+
+        setattr(obj, name, wrapper)
+
+    def _phase_wrapper(self, method, phase):
+        phase_index = _PHASE_INDEX[phase]
+
+        def wrapper(obj, *args, **kwargs):
+            start = time.perf_counter_ns()
+            result = method(obj, *args, **kwargs)
+            self._record().events.append((phase_index, start, time.perf_counter_ns() - start))
+            return result
+
+        return wrapper
+
+    def _wrap_object(self, obj, phases):
+        """
+        Wrap the methods of a game object, which has `__slots__`. The object is moved to
+        a subclass with the same layout and the wrapped methods, which is created once
+        per class and shared by the objects of the later episodes.
+
+        @param phases The dict of {method name: phase}
+        """
+        cls = type(obj)
+        if cls in self._profiled_classes.values():
+            return
+        profiled_class = self._profiled_classes.get(cls)
+        if profiled_class is None:
+            methods = {name: self._phase_wrapper(getattr(cls, name), phase) for name, phase in phases.items()}
+            profiled_class = self._profiled_classes[cls] = type(
+                cls.__name__, (cls,), dict(methods, __slots__=(), __module__=cls.__module__))
+        obj.__class__ = profiled_class
+
+    def _wrap_candidates(self, group):
+        method = type(group).candidates.__get__(group)
+
+        def wrapper(rect):
+            candidates = method(rect)
+            self._record().collision_candidates += len(candidates)
+            return candidates
+
+        group.candidates = wrapper
+
+    def summary(self):
+        """
+        Get the statistics of the phases over the recorded frames in microseconds
+
+        @return The dict of {phase: {"calls", "mean_us", "p99_us", "total_us"}},
+                with "frame" for the update of the frames
+        """
+        records = list(self.records)
+        summary = {}
+        frame_times = np.array([record.update_ns for record in records if record.update_ns]) / 1000
+        if len(frame_times):
+            summary["frame"] = _statistics(frame_times)
+        for i, phase in enumerate(PHASES):
+            durations = np.array([duration for record in records
+                                  for phase_index, _, duration in record.events if phase_index == i]) / 1000
+            if len(durations):
+                summary[phase] = _statistics(durations)
+        return summary
+
+    def to_json(self):
+        """
+        Get the records as a JSON-serializable dict
+        """
+        return {
+            "phases": list(PHASES),
+            "summary": self.summary(),
+            "frames": [{
+                "frame": record.frame,
+                "start_us": record.start_ns / 1000,
+                "update_us": record.update_ns / 1000,
+                "phases_us": {PHASES[i]: duration / 1000
+                              for i, duration in enumerate(record.phase_durations()) if duration},
+                "allocated_blocks": record.allocated_blocks,
+                "collision_candidates": record.collision_candidates,
+            } for record in self.records],
+        }
+
+    def to_chrome_trace(self):
+        """
+        Get the records in the Chrome trace format. The frames and the phases are complete events.
+        """
+        events = []
+        for record in self.records:
+            if record.update_ns:
+                events.append({
+                    "name": "frame", "cat": "frame", "ph": "X", "pid": 0, "tid": 0,
+                    "ts": record.start_ns / 1000, "dur": record.update_ns / 1000,
+                    "args": {"frame": record.frame, "allocated_blocks": record.allocated_blocks,
+                             "collision_candidates": record.collision_candidates},
+                })
+            for phase, start, duration in record.events:
+                events.append({
+                    "name": PHASES[phase], "cat": "phase", "ph": "X", "pid": 0, "tid": 0,
+                    "ts": start / 1000, "dur": duration / 1000, "args": {"frame": record.frame},
+                })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def save(self, path, chrome_trace=True):
+        """
+        Save the records as the Chrome trace format, or as the JSON of `to_json()`
+        """
+        # `json.dumps()` uses the C encoder, but `json.dump()` doesn't
+        data = json.dumps(self.to_chrome_trace() if chrome_trace else self.to_json())
+        with open(path, "w") as f:
+            f.write(data)
+
+
+def _statistics(durations):
+    return {
+        "calls": int(len(durations)),
+        "mean_us": float(durations.mean()),
+        "p99_us": float(np.percentile(durations, 99)),
+        "total_us": float(durations.sum()),
+    }
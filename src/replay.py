@@ -0,0 +1,297 @@
+"""
+The compact replay of an Arkanoid game, and its deterministic re-simulation.
+
+A replay stores what determines a game: the level, the difficulty, the physics
+version, the seed and the episode, and the command of every frame as a
+run-length-encoded stream. It also stores the game result, so the replay can be
+verified by re-simulating it headless and comparing the results. The frames in
+which the ball only flies are skipped as `Arkanoid.fast_forward()` does, so a full
+game is verified in a few milliseconds.
+
+The serve forced after 150 frames is chosen by the random generator of the game.
+The chosen serve is also recorded, so the games without a seed are replayed too.
+
+The binary format is a fixed header followed by the zlib-compressed runs:
+
+    4s     magic "ARKR"
+    uint8  format version
+    uint8  difficulty      0: EASY, 1: NORMAL
+    uint8  physics version
+    uint8  forced serve    The action code below, or 0 if the serve was not forced
+    uint16 level
+    int64  seed            -1 if unseeded
+    uint32 episode
+    uint32 frame_used
+    uint8  state           0: FAIL, 1: FINISH
+    uint16 brick_remain
+    uint32 count_of_catching_ball
+
+Each run is a varint of `count << 3 | action code`, where the action codes are
+the indexes of `ACTIONS`. A full game is usually a few hundred bytes.
+
+Example:
+    game = Arkanoid("NORMAL", 3, seed=7, record_replay=True)
+    ...
+    save_replay("game.arkr", game.get_replay())
+    verify_replay(load_replay("game.arkr")).passed
+
+    python -m src.replay game.arkr
+"""
+import argparse
+import struct
+import time
+import zlib
+from collections import namedtuple
+
+from .game_object import PlatformAction
+
+REPLAY_EXTENSION = ".arkr"
+
+ACTIONS = ("NONE", "MOVE_LEFT", "MOVE_RIGHT", "SERVE_TO_LEFT", "SERVE_TO_RIGHT")
+DIFFICULTIES = ("EASY", "NORMAL")
+RESULT_STATES = ("FAIL", "FINISH")
+
+_ACTION_CODES = {getattr(PlatformAction, name): code for code, name in enumerate(ACTIONS)}
+
+_REPLAY_MAGIC = b"ARKR"
+_REPLAY_VERSION = 1
+_HEADER = struct.Struct("<4sBBBBHqIIBHI")
+_ACTION_BITS = 3
+
+
+class ReplayResult(namedtuple("ReplayResult", [
+        "frame_used", "state", "brick_remain", "count_of_catching_ball"])):
+    """
+    The game result recorded in a replay, which is compared by `verify_replay()`
+
+    @field state "FAIL" or "FINISH"
+    """
+    __slots__ = ()
+
+    @classmethod
+    def from_game_result(cls, game_result):
+        """
+        Get the result from the return value of `Arkanoid.get_game_result()`
+        """
+        attachment = game_result["attachment"][0]
+        return cls(frame_used=game_result["frame_used"], state=str(game_result["state"]),
+                   brick_remain=attachment["brick_remain"],
+                   count_of_catching_ball=attachment["count_of_catching_ball"])
+
+
+class Replay(namedtuple("Replay", [
+        "level", "difficulty", "physics_version", "seed", "episode", "serve", "runs", "result"])):
+    """
+    The replay of a game, created by `Arkanoid.get_replay()`
+
+    @field seed The seed of the game, or None if unseeded
+    @field serve The serve chosen when the game forced to serve, or None
+    @field runs A tuple of (command, number of frames), in which the adjacent
+           runs have different commands
+    @field result The `ReplayResult` of the game
+    """
+    __slots__ = ()
+
+    @property
+    def frames(self) -> int:
+        return sum(count for _, count in self.runs)
+
+    def commands(self):
+        """
+        Iterate over the command of each frame
+        """
+        for command, count in self.runs:
+            for _ in range(count):
+                yield command
+
+    def to_bytes(self) -> bytes:
+        body = bytearray()
+        for command, count in self.runs:
+            value = count << _ACTION_BITS | ACTIONS.index(command)
+            while value >= 0x80:
+                body.append(value & 0x7F | 0x80)
+                value >>= 7
+            body.append(value)
+
+        result = self.result
+        header = _HEADER.pack(
+            _REPLAY_MAGIC, _REPLAY_VERSION, DIFFICULTIES.index(self.difficulty), self.physics_version,
+            0 if self.serve is None else ACTIONS.index(self.serve), self.level,
+            -1 if self.seed is None else self.seed, self.episode,
+            result.frame_used, RESULT_STATES.index(result.state), result.brick_remain,
+            result.count_of_catching_ball)
+        return header + zlib.compress(bytes(body), 9)
+
+    @classmethod
+    def from_bytes(cls, data: bytes):
+        (magic, version, difficulty, physics_version, serve, level, seed, episode,
+         frame_used, state, brick_remain, count_of_catching_ball) = _HEADER.unpack_from(data)
+        if magic != _REPLAY_MAGIC or version != _REPLAY_VERSION:
+            raise ValueError("Not an Arkanoid replay of version {0}".format(_REPLAY_VERSION))
+
+        runs = []
+        value = shift = 0
+        for byte in zlib.decompress(data[_HEADER.size:]):
+            value |= (byte & 0x7F) << shift
+            shift += 7
+            if byte < 0x80:
+                runs.append((ACTIONS[value & (1 << _ACTION_BITS) - 1], value >> _ACTION_BITS))
+                value = shift = 0
+
+        return cls(
+            level=level,
+            difficulty=DIFFICULTIES[difficulty],
+            physics_version=physics_version,
+            seed=None if seed < 0 else seed,
+            episode=episode,
+            serve=ACTIONS[serve] if serve else None,
+            runs=tuple(runs),
+            result=ReplayResult(frame_used, RESULT_STATES[state], brick_remain, count_of_catching_ball))
+
+
+class ReplayRecorder:
+    """
+    Record the commands of the frames of a game. It is used by `Arkanoid` with `record_replay`.
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """
+        Drop the recorded commands and start a new episode
+        """
+        # The runs of [PlatformAction, number of frames]
+        self._runs = []
+        self.serve = None
+
+    def record(self, command: PlatformAction, frames=1):
+        runs = self._runs
+        if runs and runs[-1][0] is command:
+            runs[-1][1] += frames
+        else:
+            runs.append([command, frames])
+
+    def to_replay(self, game, result: ReplayResult) -> Replay:
+        return Replay(
+            level=game.level,
+            difficulty=game.difficulty,
+            physics_version=game.physics_version,
+            seed=game.seed,
+            episode=game.episode,
+            serve=None if self.serve is None else ACTIONS[_ACTION_CODES[self.serve]],
+            runs=tuple((ACTIONS[_ACTION_CODES[command]], count) for command, count in self._runs),
+            result=result)
+
+
+def save_replay(path, replay: Replay):
+    with open(path, "wb") as f:
+        f.write(replay.to_bytes())
+
+
+def load_replay(path) -> Replay:
+    with open(path, "rb") as f:
+        return Replay.from_bytes(f.read())
+
+
+class _RecordedServe:
+    """
+    Stand in for the random generator of an unseeded game to choose the recorded serve
+    """
+
+    def __init__(self, serve):
+        self.serve = serve
+
+    def choice(self, actions):
+        if self.serve is None:
+            raise ValueError("The replay doesn't record the forced serve")
+        return PlatformAction(self.serve)
+
+
+def replay_game(replay: Replay, on_frame=None):
+    """
+    Re-simulate the replay with a headless game
+
+    @param on_frame If it is given, the frames are simulated one by one, and it is
+           called as `on_frame(game, command)` before each frame. Otherwise, the frames
+           in which the ball only flies are skipped.
+    @return The game after the last replayed frame
+    """
+    from .game import Arkanoid
+
+    game = Arkanoid(replay.difficulty, replay.level, seed=replay.seed, headless=True,
+                    physics_version=replay.physics_version)
+    game.episode = replay.episode
+    game._rng = game._create_episode_rng() if replay.seed is not None else _RecordedServe(replay.serve)
+
+    if on_frame is not None:
+        ai_name = game.ai_clients()[0]["name"]
+        for command, count in replay.runs:
+            for _ in range(count):
+                if not game.is_running:
+                    return game
+                on_frame(game, command)
+                game.update({ai_name: command})
+        return game
+
+    # The same as `fast_forward()` for each run, but the commands don't change the
+    # frames in which the ball only flies, so they are skipped across the runs
+    free_frames = None
+    for command, count in replay.runs:
+        command = PlatformAction(command)
+        while count > 0 and game.is_running:
+            if game.ball_served:
+                if free_frames is None:
+                    free_frames = game._frames_until_event() - 1
+                if free_frames > 0:
+                    frames = min(free_frames, count)
+                    game._skip_frames(command, frames)
+                    free_frames -= frames
+                    count -= frames
+                    continue
+
+            game._update_frame(command)
+            free_frames = None
+            count -= 1
+    return game
+
+
+class ReplayCheck(namedtuple("ReplayCheck", ["passed", "expected", "actual"])):
+    """
+    The result of `verify_replay()`
+
+    @field expected The `ReplayResult` recorded in the replay
+    @field actual The `ReplayResult` of the re-simulated game
+    """
+    __slots__ = ()
+
+
+def verify_replay(replay: Replay) -> ReplayCheck:
+    """
+    Re-simulate the replay and compare the game result with the recorded one
+    """
+    game = replay_game(replay)
+    actual = ReplayResult.from_game_result(game.get_game_result())
+    return ReplayCheck(passed=actual == replay.result, expected=replay.result, actual=actual)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Verify the Arkanoid replays by re-simulating them.")
+    parser.add_argument("replays", nargs="+", help="The replay files")
+    args = parser.parse_args()
+
+    failed = 0
+    start_time = time.perf_counter()
+    for path in args.replays:
+        replay = load_replay(path)
+        check = verify_replay(replay)
+        if not check.passed:
+            failed += 1
+        print("{0} {1}: level {2} {3}, {4} frames, {5}".format(
+            "OK" if check.passed else "MISMATCH", path, replay.level, replay.difficulty,
+            replay.frames, tuple(check.actual) if check.passed
+            else "expected {0}, got {1}".format(tuple(check.expected), tuple(check.actual))))
+    elapsed = time.perf_counter() - start_time
+    print("{0} replays verified in {1:.3f}s, {2} mismatched".format(len(args.replays), elapsed, failed))
+    if failed:
+        raise SystemExit(1)
@@ -0,0 +1,56 @@
+"""
+The helper rebuilding the full scene progress data from the incremental one
+"""
+
+
+class SceneProgressAccumulator:
+    """
+    Rebuild the full scene progress data from the data generated by
+    `Arkanoid.get_scene_progress_data()` with `incremental_progress` set.
+
+    The bricks of the keyframe are kept and updated by the brick changes in the
+    following progress data, so the rebuilt data is the same as the one generated
+    by `Arkanoid.get_full_scene_progress_data()`.
+    """
+
+    def __init__(self):
+        # brick id -> [object data, line data 1, line data 2], in the order of the bricks
+        self._bricks = {}
+
+    def update(self, scene_progress: dict) -> dict:
+        """
+        Apply the incremental scene progress data
+
+        @return The full scene progress data
+        """
+        game_sys_info = scene_progress["game_sys_info"]
+        object_list = scene_progress["object_list"]
+
+        if game_sys_info["keyframe"]:
+            brick_ids = game_sys_info["brick_ids"]
+            num_moves = len(object_list) - 3 * len(brick_ids)
+            bricks_data = object_list[num_moves:num_moves + len(brick_ids)]
+            lines = object_list[num_moves + len(brick_ids):]
+            self._bricks = {
+                brick_id: [bricks_data[i], lines[2 * i], lines[2 * i + 1]]
+                for i, brick_id in enumerate(brick_ids)
+            }
+            object_list = object_list[:num_moves]
+
+        # The downgraded brick is replaced by a new one at the end of the sprite group
+        for brick_id, brick_data in game_sys_info["recolored_bricks"]:
+            brick = self._bricks.pop(brick_id)
+            brick[0] = brick_data
+            self._bricks[brick_id] = brick
+        for brick_id in game_sys_info["removed_bricks"]:
+            del self._bricks[brick_id]
+
+        full_object_list = list(object_list)
+        full_object_list.extend(brick[0] for brick in self._bricks.values())
+        for brick in self._bricks.values():
+            full_object_list.extend(brick[1:])
+
+        full_progress = dict(scene_progress)
+        full_progress["object_list"] = full_object_list
+        full_progress["game_sys_info"] = {}
+        return full_progress
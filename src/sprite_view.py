@@ -0,0 +1,73 @@
+"""
+The optional pygame rendering adapter of the game objects.
+
+The game objects in `src/game_object.py` only hold their rects and colors, so the
+game itself never allocates pygame Surfaces or sprites. `SpriteView` wraps the
+objects of a game in pygame sprites when they are drawn with pygame directly,
+e.g. by a local debugging view:
+
+    view = SpriteView(game)
+    view.draw(screen)
+
+The sprites are kept while their objects are in the game, and the Surfaces are
+shared by all the objects of the same size and color. A headless game refuses
+the view, so a batch of games never creates the Surfaces by accident.
+"""
+import pygame
+from pygame.sprite import Sprite
+
+
+class ObjectSprite(Sprite):
+    """
+    The sprite of a game object. The rect and the color are read from the object.
+    """
+
+    _surfaces = {}
+
+    def __init__(self, game_object, *groups):
+        self.game_object = game_object
+        super().__init__(*groups)
+
+    @property
+    def rect(self):
+        return self.game_object.rect
+
+    @property
+    def image(self):
+        key = (self.game_object.rect.size, self.game_object.color)
+        surface = self._surfaces.get(key)
+        if surface is None:
+            surface = pygame.Surface(key[0])
+            surface.fill(pygame.Color(key[1]))
+            self._surfaces[key] = surface
+        return surface
+
+
+class SpriteView:
+    """
+    The pygame sprites of the ball, the platform and the bricks of an `Arkanoid`
+    """
+
+    def __init__(self, game):
+        if getattr(game, "headless", False):
+            raise ValueError("The game is headless, which can't be drawn with pygame")
+        self.game = game
+        self._sprites = {}
+
+    def sprites(self) -> pygame.sprite.RenderPlain:
+        """
+        Get the sprite group of the current game objects, with the moving objects first
+        """
+        game = self.game
+        objects = [game._ball, game._platform]
+        objects.extend(game._group_brick)
+        # The objects are recreated after the game is reset, so drop the old sprites
+        self._sprites = {game_object: self._sprites.get(game_object) or ObjectSprite(game_object)
+                         for game_object in objects}
+        return pygame.sprite.RenderPlain(*self._sprites.values())
+
+    def draw(self, surface):
+        """
+        Draw the game objects on the `surface`
+        """
+        self.sprites().draw(surface)
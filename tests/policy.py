@@ -0,0 +1,49 @@
+"""
+The scripted player of the tests, which plays long games with many brick hits
+"""
+import random
+
+from ml.trajectory_oracle import TrajectoryOracle
+
+
+class OraclePolicy:
+    """
+    Serve at a random frame before the forced serve, then move the platform to the
+    landing x predicted by the oracle, with random moves while the ball flies up
+    """
+
+    def __init__(self, seed, noise=0.2):
+        self._rng = random.Random(seed)
+        self._noise = noise
+        self._oracle = TrajectoryOracle()
+        self._previous_ball = None
+
+    def command(self, scene_info):
+        command = self._command(scene_info)
+        self._previous_ball = scene_info["ball"]
+        return command
+
+    def observe(self, scene_info):
+        """
+        Observe a frame in which the previous command is held
+        """
+        self._previous_ball = scene_info["ball"]
+
+    def _command(self, scene_info):
+        rng = self._rng
+        if not scene_info["ball_served"]:
+            if rng.random() < 0.05:
+                return rng.choice(["SERVE_TO_LEFT", "SERVE_TO_RIGHT"])
+            return rng.choice(["NONE", "MOVE_LEFT", "MOVE_RIGHT"])
+
+        moving_up = self._previous_ball is not None and scene_info["ball"][1] < self._previous_ball[1]
+        if moving_up and rng.random() < self._noise:
+            return rng.choice(["NONE", "MOVE_LEFT", "MOVE_RIGHT"])
+        landing = self._oracle.predict(scene_info, self._previous_ball)
+        target_x = 100 if landing is None else landing.x
+        platform_x = scene_info["platform"][0]
+        if target_x < platform_x + 20:
+            return "MOVE_LEFT"
+        if target_x > platform_x + 20:
+            return "MOVE_RIGHT"
+        return "NONE"
@@ -0,0 +1,37 @@
+"""
+The differential test of `BatchArkanoid` against the scalar `Arkanoid`
+"""
+import pytest
+
+from policy import OraclePolicy
+from src.batch import BatchArkanoid, encode_actions
+from src.game import Arkanoid
+
+GAMES = [(level, difficulty) for level in (1, 3, 5, 8) for difficulty in ("EASY", "NORMAL")]
+
+
+@pytest.mark.parametrize("seed", [0, 1])
+def test_batch_matches_scalar_games(seed):
+    games = [Arkanoid(difficulty, level, seed=seed, headless=True) for level, difficulty in GAMES]
+    policies = [OraclePolicy(seed * len(GAMES) + i) for i in range(len(GAMES))]
+    batch = BatchArkanoid(len(GAMES), difficulty=[difficulty for _, difficulty in GAMES],
+                          level=[level for level, _ in GAMES], seed=seed)
+
+    frames = 0
+    while any(game.is_running for game in games):
+        commands = []
+        for game, policy in zip(games, policies):
+            command = "NONE"
+            if game.is_running:
+                command = policy.command(game.get_data_from_game_to_player()["1P"])
+                game.update({"1P": command})
+            commands.append(command)
+        batch.step(encode_actions(commands))
+        frames += 1
+
+        for i, game in enumerate(games):
+            assert batch.get_data_from_game(i) == game.get_data_from_game_to_player()["1P"], \
+                "level {0} {1} differs at frame {2}".format(*GAMES[i], frames)
+        assert batch.brick_remain().tolist() == [
+            len(game._brick) + 2 * len(game._hard_brick) for game in games]
+        assert batch.hit_platform_times.tolist() == [game._ball.hit_platform_times for game in games]
@@ -0,0 +1,22 @@
+"""
+The tests of the swept collision of the physics version 2
+"""
+import pytest
+
+from policy import OraclePolicy
+from src.game import Arkanoid
+
+
+@pytest.mark.parametrize("level", [1, 5, 8, 14])
+@pytest.mark.parametrize("difficulty", ["EASY", "NORMAL"])
+def test_ball_never_overlaps_bricks(level, difficulty):
+    game = Arkanoid(difficulty, level, seed=level, headless=True, physics_version=2)
+    policy = OraclePolicy(level)
+    area = game._ball._play_area_rect
+    while game.is_running:
+        game.update({"1P": policy.command(game.get_data_from_game_to_player()["1P"])})
+        ball = game._ball.rect
+        assert area.contains(ball)
+        assert not any(ball.colliderect(brick.rect) for brick in game._group_brick), \
+            "The ball tunnels into a brick at frame {0}".format(game.frame_count)
+
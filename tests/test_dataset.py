@@ -0,0 +1,137 @@
+"""
+The tests of merging the shards of the dataset
+"""
+import multiprocessing
+import os
+
+import numpy as np
+
+from ml import dataset as dataset_module
+from ml.dataset import DATASET_DTYPE, compact_dataset, open_dataset, write_shard
+
+FOLDER_FILES = [".dataset.lock", "dataset.npy"]
+
+
+def make_rows(episode_id, count):
+    rows = np.zeros(count, dtype=DATASET_DTYPE)
+    rows["episode_id"] = episode_id
+    rows["frame"] = np.arange(count)
+    return rows
+
+
+def write_and_open(folder, episode_id):
+    write_shard(folder, make_rows(episode_id, 100))
+    open_dataset(folder)
+
+
+def hold_lock(folder, locked):
+    with dataset_module._dataset_lock(folder):
+        locked.set()
+        while True:
+            pass
+
+
+def test_compact_merges_the_shards(tmp_path):
+    folder = str(tmp_path)
+    assert compact_dataset(folder) is None
+    write_shard(folder, make_rows(1, 10))
+    write_shard(folder, make_rows(2, 20))
+    dataset = open_dataset(folder)
+    assert len(dataset) == 30
+    write_shard(folder, make_rows(3, 5))
+    assert len(open_dataset(folder)) == 35
+    assert sorted(os.listdir(folder)) == FOLDER_FILES
+
+
+def test_compact_appends_without_rewriting(tmp_path):
+    folder = str(tmp_path)
+    write_shard(folder, make_rows(1, 10))
+    path = compact_dataset(folder)
+    inode = os.stat(path).st_ino
+    reader = np.load(path, mmap_mode="r")
+
+    write_shard(folder, make_rows(2, 20))
+    dataset = open_dataset(folder)
+    assert os.stat(path).st_ino == inode
+    assert dataset["episode_id"].tolist() == [1] * 10 + [2] * 20
+    assert dataset["frame"].tolist() == list(range(10)) + list(range(20))
+    # The memory map of a reader still sees its rows
+    assert len(reader) == 10 and reader["episode_id"].tolist() == [1] * 10
+
+
+def test_compact_drops_uncounted_rows(tmp_path):
+    folder = str(tmp_path)
+    write_shard(folder, make_rows(1, 10))
+    path = compact_dataset(folder)
+    # The rows written by a merge which crashed before updating the header
+    with open(path, "ab") as f:
+        f.write(make_rows(9, 7).tobytes())
+
+    write_shard(folder, make_rows(2, 5))
+    dataset = open_dataset(folder)
+    assert dataset["episode_id"].tolist() == [1] * 10 + [2] * 5
+    assert os.path.getsize(path) == len(dataset_module._array_header(15)) + 15 * DATASET_DTYPE.itemsize
+
+
+def test_compact_rewrites_a_fixed_header_once(tmp_path):
+    folder = str(tmp_path)
+    path = os.path.join(folder, "dataset.npy")
+    # A header without the padding for growth
+    with open(path, "wb") as f:
+        np.lib.format.write_array_header_2_0(f, {
+            "descr": np.lib.format.dtype_to_descr(DATASET_DTYPE), "fortran_order": False, "shape": (4,)})
+        f.write(make_rows(1, 4).tobytes())
+    write_shard(folder, make_rows(2, 3))
+    assert open_dataset(folder)["episode_id"].tolist() == [1] * 4 + [2] * 3
+    write_shard(folder, make_rows(3, 2))
+    assert open_dataset(folder)["episode_id"].tolist() == [1] * 4 + [2] * 3 + [3] * 2
+
+
+def test_lock_is_released_when_the_holder_dies(tmp_path):
+    folder = str(tmp_path)
+    locked = multiprocessing.Event()
+    holder = multiprocessing.Process(target=hold_lock, args=(folder, locked))
+    holder.start()
+    assert locked.wait(10)
+    holder.kill()
+    holder.join()
+
+    write_shard(folder, make_rows(1, 10))
+    assert len(open_dataset(folder)) == 10
+
+
+def test_concurrent_readers_merge_each_shard_once(tmp_path):
+    folder = str(tmp_path)
+    processes = [multiprocessing.Process(target=write_and_open, args=(folder, episode_id))
+                 for episode_id in range(8)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert all(process.exitcode == 0 for process in processes)
+
+    dataset = open_dataset(folder)
+    assert len(dataset) == 800
+    assert sorted(np.unique(dataset["episode_id"]).tolist()) == list(range(8))
+    assert np.bincount(dataset["episode_id"]).tolist() == [100] * 8
+    assert sorted(os.listdir(folder)) == FOLDER_FILES
+
+
+def test_deltas_restart_at_each_episode():
+    records = [{"scene_info": {"ball": (10 + 7 * i, 400 - 7 * i), "platform": (75, 400)},
+                "command": "MOVE_LEFT", "predicted_x": 80} for i in range(3)]
+    first = dataset_module.records_to_dataset(records, episode_id=1)
+    second = dataset_module.records_to_dataset(records, episode_id=2)
+    rows = np.concatenate([first, second])
+
+    dx = dataset_module.episode_deltas(rows["ball_x"], rows["episode_id"])
+    dy = dataset_module.episode_deltas(rows["ball_y"], rows["episode_id"])
+    assert dx.tolist() == [0, 7, 7, 0, 7, 7]
+    assert dy.tolist() == [0, -7, -7, 0, -7, -7]
+    assert first["dx"].tolist() == [0, 7, 7] and first["dy"].tolist() == [0, -7, -7]
+
+
+def test_unknown_commands_are_not_labeled():
+    labels = dataset_module.commands_to_labels(["MOVE_LEFT", "SERVE_TO_LEFT", "NONE", "MOVE_RIGHT", "JUMP", ""])
+    assert labels.tolist() == [0, dataset_module.NO_LABEL, 2, 1, dataset_module.NO_LABEL, dataset_module.NO_LABEL]
+    assert labels.dtype == DATASET_DTYPE["label"]
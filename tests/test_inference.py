@@ -0,0 +1,61 @@
+"""
+The tests of the lookup table of `ml/inference.py` and the model store
+"""
+import numpy as np
+import pytest
+
+from ml.inference import CompiledModel, PackedTable
+from ml.model_store import LiveModel, ModelStore
+
+sklearn = pytest.importorskip("sklearn")
+from sklearn.neighbors import KNeighborsClassifier  # noqa: E402
+
+
+def make_samples(count, seed=0):
+    rng = np.random.default_rng(seed)
+    features = np.column_stack([
+        rng.integers(0, 200, count), rng.integers(0, 400, count), rng.integers(0, 160, count),
+        rng.integers(-10, 11, count), rng.integers(-7, 8, count), rng.integers(0, 196, count)])
+    labels = (features[:, 5] > features[:, 2] + 20).astype(np.int64) - (features[:, 5] < features[:, 2])
+    return features, labels
+
+
+def test_packed_table_looks_up_the_samples():
+    features, labels = make_samples(5000)
+    table = PackedTable.from_features(features, labels)
+    expected = dict(zip(map(tuple, features.tolist()), labels.tolist()))
+    assert len(table) == len(features)
+    for row, label in expected.items():
+        assert table.get(row) == label
+    assert table.get((0, 0, 0, 11, 0, 0)) is None
+    assert table.get((0.5, 0, 0, 0, 0, 0)) is None
+
+
+def test_packed_table_refuses_non_integer_features():
+    assert PackedTable.from_features(np.array([[0.5, 1.0]]), np.array([0])) is None
+
+
+def test_live_model_uses_the_memory_mapped_table(tmp_path):
+    features, labels = make_samples(3000)
+    model = KNeighborsClassifier(n_neighbors=3).fit(features, labels)
+    store = ModelStore(str(tmp_path))
+    store.save(model)
+
+    stored = store.load()
+    assert isinstance(stored.table, PackedTable)
+    live_model = LiveModel(store)
+    unseen, _ = make_samples(500, seed=1)
+    rows = features[:500].tolist() + unseen.tolist()
+    expected = model.predict(np.array(rows)).tolist()
+    assert [live_model.predictor.predict(row) for row in rows] == expected
+    assert live_model.predictor.num_hits >= 500
+
+
+def test_missed_frames_are_cached_up_to_the_limit():
+    features, labels = make_samples(1000)
+    model = KNeighborsClassifier(n_neighbors=1).fit(features, labels)
+    predictor = CompiledModel(model, max_cache_size=10)
+    unseen, _ = make_samples(50, seed=2)
+    for row in unseen.tolist():
+        predictor.predict(row)
+    assert len(predictor._cache) <= 10
@@ -0,0 +1,43 @@
+"""
+The tests of the level cache and the level bundle
+"""
+import os
+
+import pytest
+
+from src import level as level_module
+
+
+@pytest.fixture
+def bundle_path(tmp_path, monkeypatch):
+    path = str(tmp_path / "levels.bin")
+    monkeypatch.setattr(level_module, "DEFAULT_BUNDLE_PATH", path)
+    level_module.clear_level_cache()
+    yield path
+    level_module.clear_level_cache()
+
+
+def test_bundle_is_loaded_at_first_miss(bundle_path):
+    levels = level_module.compile_level_bundle(bundle_path)
+    parsed = {level: level_module._parse_level(level) for level in levels}
+    level_module.clear_level_cache()
+
+    assert level_module.get_level(levels[0]) == parsed[levels[0]]
+    # All levels were loaded from the bundle at once
+    assert sorted(level_module._levels) == levels
+    for level in levels:
+        assert level_module.get_level(level) == parsed[level]
+
+
+def test_stale_bundle_is_ignored(bundle_path):
+    level_module.compile_level_bundle(bundle_path, levels=[1, 2])
+    os.utime(bundle_path, (0, 0))
+    level_module.clear_level_cache()
+
+    level_module.get_level(1)
+    assert sorted(level_module._levels) == [1]
+
+
+def test_levels_are_parsed_without_bundle(bundle_path):
+    assert level_module.get_level(3) == level_module._parse_level(3)
+    assert sorted(level_module._levels) == [3]
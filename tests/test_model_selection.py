@@ -0,0 +1,42 @@
+"""
+The tests of splitting the frames by episode in `ml/model_selection.py`
+"""
+import numpy as np
+import pytest
+
+pytest.importorskip("sklearn")
+
+from ml.model_selection import select_model  # noqa: E402
+
+CANDIDATES = [{"name": "knn", "estimator": "sklearn.neighbors.KNeighborsClassifier",
+               "params": {}, "grid": {"n_neighbors": [1]}}]
+
+
+def make_episodes(num_episodes=40, frames=50, seed=0):
+    """
+    The frames of an episode are nearly identical and share a random label,
+    so only the frames of the same episode predict the label
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.integers(0, 1000, (num_episodes, 6))
+    episode_labels = rng.integers(0, 2, num_episodes)
+    episode_ids = np.repeat(np.arange(num_episodes), frames)
+    features = centers[episode_ids] + rng.integers(0, 2, (len(episode_ids), 6))
+    return features, episode_labels[episode_ids], episode_ids
+
+
+def test_frame_split_leaks_the_episodes():
+    features, labels, _ = make_episodes()
+    _, report = select_model(features, labels, CANDIDATES, cv=3, workers=1)
+    assert report["test_accuracy"] > 0.95
+
+
+def test_episode_split_keeps_the_episodes_apart():
+    features, labels, episode_ids = make_episodes()
+    _, report = select_model(features, labels, CANDIDATES, cv=3, workers=1, groups=episode_ids)
+    assert report["num_train_episodes"] + report["num_test_episodes"] == 40
+    assert report["num_train"] + report["num_test"] == len(labels)
+    assert report["num_train"] % 50 == 0 and report["num_test"] % 50 == 0
+    # Nothing is learned from the other episodes, so neither score is inflated
+    assert report["test_accuracy"] < 0.9
+    assert report["results"][0]["cv_accuracy"] < 0.9
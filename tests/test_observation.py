@@ -0,0 +1,63 @@
+"""
+The tests of the packed observation format of `src/observation.py`
+"""
+import pytest
+
+from policy import OraclePolicy
+from src.game import Arkanoid
+from src.observation import decode_scene_info, encode_scene_info
+
+GAMES = [(level, difficulty, physics_version)
+         for level in (1, 3, 5, 8) for difficulty in ("EASY", "NORMAL") for physics_version in (1, 2)]
+
+
+def normalize(scene_info):
+    return dict(scene_info, status=str(scene_info["status"]), ball=tuple(scene_info["ball"]),
+                platform=tuple(scene_info["platform"]),
+                bricks=[tuple(pos) for pos in scene_info["bricks"]],
+                hard_bricks=[tuple(pos) for pos in scene_info["hard_bricks"]])
+
+
+@pytest.mark.parametrize("level, difficulty, physics_version", GAMES)
+def test_packed_scene_info_decodes_to_dict(level, difficulty, physics_version):
+    """
+    Play a game in each format with the same commands, and compare the decoded scene info every frame
+    """
+    game = Arkanoid(difficulty, level, seed=level, headless=True, physics_version=physics_version)
+    packed_game = Arkanoid(difficulty, level, seed=level, headless=True, physics_version=physics_version,
+                           observation_format="PACKED")
+    policy = OraclePolicy(level)
+    num_bricks = num_hard_bricks = None
+    changes = 0
+
+    while game.is_running:
+        scene_info = game.get_data_from_game_to_player()["1P"]
+        packed = packed_game.get_data_from_game_to_player()["1P"]
+        assert set(packed) == {"status", "packed"}
+        assert packed["status"] == str(scene_info["status"])
+        decoded = decode_scene_info(packed)
+        assert normalize(decoded) == normalize(scene_info)
+        assert decode_scene_info(packed["packed"]) == decoded
+
+        if (len(scene_info["bricks"]), len(scene_info["hard_bricks"])) != (num_bricks, num_hard_bricks):
+            changes += 1
+            num_bricks, num_hard_bricks = len(scene_info["bricks"]), len(scene_info["hard_bricks"])
+
+        command = policy.command(scene_info)
+        game.update({"1P": command})
+        packed_game.update({"1P": command})
+
+    # The brick hits change the packed bricks
+    assert changes > 1
+    assert packed_game.get_game_result() == game.get_game_result()
+
+
+def test_encode_without_packed_bricks():
+    game = Arkanoid("NORMAL", 3, seed=1, headless=True)
+    scene_info = game.get_data_from_game_to_player()["1P"]
+    assert normalize(decode_scene_info(encode_scene_info(scene_info))) == normalize(scene_info)
+
+
+def test_dict_scene_info_is_returned_as_it_is():
+    scene_info = Arkanoid("NORMAL", 1, headless=True).get_data_from_game_to_player()["1P"]
+    assert decode_scene_info(scene_info) is scene_info
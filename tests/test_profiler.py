@@ -0,0 +1,116 @@
+"""
+The tests of the per-frame profiler of `src/profiler.py`
+"""
+import json
+
+import pytest
+
+from policy import OraclePolicy
+from src.game import Arkanoid
+from src.game_object import Ball, Platform
+from src.profiler import PHASES
+
+WRAPPED_GAME_METHODS = ("_update_frame", "_skip_frames", "get_game_status",
+                        "get_data_from_game_to_player", "get_scene_progress_data")
+
+
+def phase_counts(record):
+    counts = dict.fromkeys(PHASES, 0)
+    for phase, _, _ in record.events:
+        counts[PHASES[phase]] += 1
+    return counts
+
+
+def play(game, policy, frames):
+    """
+    Play the frames, skipping the flying frames at times
+    """
+    for i in range(frames):
+        if not game.is_running:
+            break
+        command = policy.command(game.get_data_from_game_to_player()["1P"])
+        if i % 10 == 9 and game.ball_served:
+            game.fast_forward(command, 20)
+        else:
+            game.update({"1P": command})
+
+
+@pytest.mark.parametrize("physics_version", [1, 2])
+def test_phases_are_recorded_per_frame(physics_version):
+    game = Arkanoid("NORMAL", 5, seed=1, headless=True, profile=100000, physics_version=physics_version)
+    policy = OraclePolicy(1)
+    play(game, policy, 300)
+    profiled_ball_class = type(game._ball)
+    game.reset()
+    # The objects of the new episode reuse the profiled classes
+    assert type(game._ball) is profiled_ball_class
+    assert profiled_ball_class.__bases__ == (Ball,) and type(game._platform).__bases__ == (Platform,)
+    play(game, policy, 300)
+
+    records = list(game.profiler.records)
+    episodes = 1
+    num_skips = 0
+    for previous, record in zip(records, records[1:]):
+        counts = phase_counts(record)
+        if record.frame <= previous.frame:
+            # The frames restart after reset()
+            episodes += 1
+            assert record.frame <= 1
+            continue
+        assert record.update_ns > 0
+        if counts["skip_frames"]:
+            # The record of the skipped frames is numbered by the last frame
+            num_skips += 1
+            assert counts["skip_frames"] == 1 and counts["platform_move"] == 0
+            continue
+
+        assert record.frame == previous.frame + 1
+        assert counts["platform_move"] == 1
+        if physics_version == 1:
+            assert counts["ball_move"] == counts["check_hit_brick"] == counts["check_bouncing"] <= 1
+            assert counts["ball_sweep"] == 0
+        else:
+            assert counts["ball_sweep"] <= 1
+            assert counts["ball_move"] == counts["check_hit_brick"] == 0
+        assert counts["get_game_status"] >= 1
+
+    assert episodes == 2
+    assert num_skips > 0
+    summary = game.profiler.summary()
+    assert summary["frame"]["calls"] == sum(1 for record in records if record.update_ns)
+    assert summary["platform_move"]["calls"] == sum(phase_counts(record)["platform_move"] for record in records)
+
+
+def test_chrome_trace_schema(tmp_path):
+    path = str(tmp_path / "arkanoid.trace.json")
+    game = Arkanoid("NORMAL", 3, seed=2, headless=True, profile=50, profile_output=path)
+    play(game, OraclePolicy(2), 200)
+    game.get_game_result()
+
+    with open(path) as f:
+        trace = json.load(f)
+    assert set(trace) == {"traceEvents", "displayTimeUnit"}
+    events = trace["traceEvents"]
+    records = list(game.profiler.records)
+    assert len(records) == 50
+    assert sum(event["name"] == "frame" for event in events) == sum(1 for record in records if record.update_ns)
+    for event in events:
+        assert set(event) == {"name", "cat", "ph", "pid", "tid", "ts", "dur", "args"}
+        assert event["ph"] == "X" and event["dur"] >= 0
+        assert event["name"] in PHASES or event["name"] == "frame"
+        assert event["cat"] == ("frame" if event["name"] == "frame" else "phase")
+        assert "frame" in event["args"]
+
+    data = game.profiler.to_json()
+    assert data["phases"] == list(PHASES) and len(data["frames"]) == 50
+
+
+def test_nothing_is_wrapped_without_profile():
+    game = Arkanoid("NORMAL", 5, seed=1, headless=True)
+    for _ in range(2):
+        assert game.profiler is None
+        assert not set(WRAPPED_GAME_METHODS) & set(vars(game))
+        assert type(game._ball) is Ball and type(game._platform) is Platform
+        assert "candidates" not in getattr(game._group_brick, "__dict__", {})
+        game.update({"1P": "SERVE_TO_LEFT"})
+        game.reset()
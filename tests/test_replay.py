@@ -0,0 +1,101 @@
+"""
+The tests of recording, verifying and converting the replays
+"""
+import contextlib
+import glob
+import io
+import os
+
+import numpy as np
+import pytest
+
+from ml.collect_runner import ROOT_PATH, load_ml_play_class, play_episode
+from ml.dataset import replay_to_dataset
+from policy import OraclePolicy
+from src.game import Arkanoid
+from src.replay import Replay, ReplayResult, load_replay, replay_game, verify_replay
+
+
+def play_game(game, policy):
+    while game.is_running:
+        game.update({"1P": policy.command(game.get_data_from_game_to_player()["1P"])})
+    return game.get_game_result()
+
+
+@pytest.mark.parametrize("level, difficulty", [(1, "EASY"), (5, "NORMAL"), (8, "NORMAL")])
+@pytest.mark.parametrize("physics_version", [1, 2])
+@pytest.mark.parametrize("seed", [3, None])
+def test_replay_verifies(level, difficulty, physics_version, seed):
+    game = Arkanoid(difficulty, level, seed=seed, headless=True, physics_version=physics_version,
+                    record_replay=True)
+    # The second episode of the game
+    for episode in range(2):
+        result = play_game(game, OraclePolicy(level + episode))
+        replay = Replay.from_bytes(game.get_replay().to_bytes())
+        assert replay == game.get_replay()
+        assert replay.episode == episode
+        assert replay.frames == result["frame_used"]
+        assert replay.result == ReplayResult.from_game_result(result)
+        assert verify_replay(replay).passed
+        game.reset()
+
+
+@pytest.mark.parametrize("seed", [3, None])
+def test_replay_of_forced_serve(seed):
+    game = Arkanoid("NORMAL", 2, seed=seed, headless=True, record_replay=True)
+    while game.update({"1P": "NONE"}) != "RESET":
+        pass
+    replay = game.get_replay()
+    assert replay.serve in ("SERVE_TO_LEFT", "SERVE_TO_RIGHT")
+    assert replay.runs == (("NONE", game.frame_count),)
+    assert verify_replay(replay).passed
+
+
+def test_replay_mismatch_is_reported():
+    game = Arkanoid("NORMAL", 5, seed=0, headless=True, record_replay=True)
+    play_game(game, OraclePolicy(0))
+    replay = game.get_replay()
+    # The game is still running after the commands without the last run
+    runs = replay.runs[:-1]
+    check = verify_replay(replay._replace(runs=runs))
+    assert not check.passed
+    assert check.expected == replay.result != check.actual
+
+
+def test_replay_matches_frame_by_frame_simulation():
+    game = Arkanoid("EASY", 8, seed=1, headless=True, record_replay=True, physics_version=2)
+    play_game(game, OraclePolicy(1))
+    replay = game.get_replay()
+    frames = []
+    replayed = replay_game(replay, lambda game, command: frames.append(command))
+    assert frames == list(replay.commands())
+    assert replayed.get_game_result() == replay_game(replay).get_game_result()
+
+
+def test_replay_output(tmp_path):
+    path = str(tmp_path / "game.arkr")
+    game = Arkanoid("NORMAL", 3, seed=0, headless=True, replay_output=path)
+    result = play_game(game, OraclePolicy(0))
+    replay = load_replay(path)
+    assert replay.result == ReplayResult.from_game_result(result)
+    assert verify_replay(replay).passed
+
+
+def test_get_replay_needs_recording():
+    with pytest.raises(RuntimeError):
+        Arkanoid("NORMAL", 1, headless=True).get_replay()
+
+
+@pytest.mark.parametrize("level, difficulty", [(1, "NORMAL"), (3, "EASY")])
+def test_replay_to_dataset_matches_collector(tmp_path, level, difficulty):
+    ml_play_class = load_ml_play_class(os.path.join(ROOT_PATH, "ml", "ml_play_collect.py"))
+    game = Arkanoid(difficulty, level, seed=level, headless=True, record_replay=True)
+    with contextlib.redirect_stdout(io.StringIO()):
+        ai = ml_play_class("1P", seed=level, data_folder=str(tmp_path))
+        result = play_episode(game, ai, 30000)
+    assert result["state"] == "FINISH"
+
+    collected = np.load(glob.glob(str(tmp_path / "shard_*.npy"))[0])
+    rows = replay_to_dataset(game.get_replay(), episode_id=int(collected["episode_id"][0]))
+    assert rows.dtype == collected.dtype
+    assert np.array_equal(rows, collected)
@@ -0,0 +1,70 @@
+"""
+The tests of rebuilding the full scene progress data with `SceneProgressAccumulator`
+"""
+import pytest
+
+from policy import OraclePolicy
+from src.game import Arkanoid
+from src.scene_progress import SceneProgressAccumulator
+
+
+def full_data(scene_progress):
+    return (scene_progress["frame"], scene_progress["object_list"], scene_progress["background"],
+            scene_progress["foreground"])
+
+
+@pytest.mark.parametrize("level, difficulty, physics_version, interval", [
+    (1, "NORMAL", 1, 1), (5, "EASY", 1, 1), (8, "NORMAL", 2, 1), (9, "EASY", 1, 3), (17, "NORMAL", 2, 2)])
+def test_accumulator_rebuilds_the_full_progress(level, difficulty, physics_version, interval):
+    """
+    Apply the keyframe and the deltas through two episodes, requesting the progress every `interval` frames
+    """
+    game = Arkanoid(difficulty, level, seed=level, headless=True, physics_version=physics_version,
+                    incremental_progress=True)
+    accumulator = SceneProgressAccumulator()
+    policy = OraclePolicy(level)
+    keyframes = removed = recolored = 0
+
+    for episode in range(2):
+        frame = 0
+        while game.is_running:
+            if frame % interval == 0:
+                scene_progress = game.get_scene_progress_data()
+                game_sys_info = scene_progress["game_sys_info"]
+                keyframes += game_sys_info["keyframe"]
+                removed += len(game_sys_info["removed_bricks"])
+                recolored += len(game_sys_info["recolored_bricks"])
+                assert full_data(accumulator.update(scene_progress)) == \
+                    full_data(game.get_full_scene_progress_data())
+            command = policy.command(game.get_data_from_game_to_player()["1P"])
+            game.update({"1P": command})
+            frame += 1
+            if episode == 0 and frame == 600:
+                # Reset in the middle of the episode
+                break
+        game.reset()
+
+    assert keyframes == 2
+    assert removed > 0
+    if level != 1:
+        assert recolored > 0
+
+
+def test_restore_sends_a_keyframe():
+    game = Arkanoid("NORMAL", 5, seed=3, headless=True, incremental_progress=True)
+    accumulator = SceneProgressAccumulator()
+    policy = OraclePolicy(3)
+    snapshot = None
+    for frame in range(900):
+        if not game.is_running:
+            break
+        if frame == 300:
+            snapshot = game.snapshot()
+        scene_progress = game.get_scene_progress_data()
+        assert full_data(accumulator.update(scene_progress)) == full_data(game.get_full_scene_progress_data())
+        game.update({"1P": policy.command(game.get_data_from_game_to_player()["1P"])})
+
+    game.restore(snapshot)
+    scene_progress = game.get_scene_progress_data()
+    assert scene_progress["game_sys_info"]["keyframe"]
+    assert full_data(accumulator.update(scene_progress)) == full_data(game.get_full_scene_progress_data())
@@ -0,0 +1,64 @@
+"""
+The tests of the seeded random generator of each episode
+"""
+from policy import OraclePolicy
+from src.game import Arkanoid
+
+
+def play_episode(game, policy_seed):
+    """
+    Wait for the forced serve and play the episode with the oracle policy
+
+    @return (forced serve, game result)
+    """
+    policy = OraclePolicy(policy_seed, noise=0)
+    while game.is_running:
+        scene_info = game.get_data_from_game_to_player()["1P"]
+        command = policy.command(scene_info) if scene_info["ball_served"] else "NONE"
+        game.update({"1P": command})
+    return game.get_replay().serve, game.get_game_result()
+
+
+def play_episodes(seed, num_episodes=3):
+    game = Arkanoid("NORMAL", 5, seed=seed, headless=True, record_replay=True)
+    results = []
+    for episode in range(num_episodes):
+        results.append(play_episode(game, episode))
+        game.reset()
+    return results
+
+
+def test_same_seed_gives_same_episodes():
+    results = play_episodes(7)
+    assert results == play_episodes(7)
+    assert all(serve is not None for serve, _ in results)
+
+
+def test_episodes_have_different_streams():
+    game = Arkanoid("NORMAL", 1, seed=7, headless=True)
+    streams = []
+    for episode in range(5):
+        assert game.episode == episode
+        streams.append(tuple(game._rng.random() for _ in range(8)))
+        game.reset()
+    assert len(set(streams)) == len(streams)
+
+    # The stream only depends on the seed and the episode number
+    other = Arkanoid("EASY", 3, seed=7, headless=True)
+    for episode in range(5):
+        assert tuple(other._rng.random() for _ in range(8)) == streams[episode]
+        other.reset()
+    assert Arkanoid("NORMAL", 1, seed=8, headless=True)._rng.random() != streams[0][0]
+
+
+def test_forced_serves_vary_across_episodes():
+    serves = set()
+    for seed in range(4):
+        serves.update(serve for serve, _ in play_episodes(seed, num_episodes=4))
+    assert serves == {"SERVE_TO_LEFT", "SERVE_TO_RIGHT"}
+
+
+def test_negative_seed_is_unseeded():
+    game = Arkanoid("NORMAL", 1, seed=-1, headless=True)
+    assert game.seed is None
+    assert game._rng.random() != Arkanoid("NORMAL", 1, seed=-1, headless=True)._rng.random()
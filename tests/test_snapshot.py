@@ -0,0 +1,78 @@
+"""
+The tests of `Arkanoid.snapshot()` and `Arkanoid.restore()`
+"""
+import pickle
+
+import pytest
+
+from policy import OraclePolicy
+from src.game import Arkanoid
+from test_step import game_state
+
+
+def play(game, policy, frames):
+    """
+    @return The commands and the states of the played frames
+    """
+    commands, states = [], []
+    for _ in range(frames):
+        if not game.is_running:
+            break
+        command = policy.command(game.get_data_from_game_to_player()["1P"])
+        game.update({"1P": command})
+        commands.append(command)
+        states.append(game_state(game))
+    return commands, states
+
+
+def replay(game, commands):
+    states = []
+    for command in commands:
+        game.update({"1P": command})
+        states.append(game_state(game))
+    return states
+
+
+@pytest.mark.parametrize("level, difficulty", [(3, "EASY"), (5, "NORMAL"), (8, "NORMAL")])
+@pytest.mark.parametrize("physics_version", [1, 2])
+def test_restore_replays_the_same_frames(level, difficulty, physics_version):
+    game = Arkanoid(difficulty, level, seed=level, headless=True, physics_version=physics_version)
+    policy = OraclePolicy(level)
+    branch = Arkanoid(difficulty, level, headless=True, physics_version=physics_version)
+
+    # Branch from several points of the game, after the bricks are hit
+    for _ in range(5):
+        play(game, policy, 300)
+        if not game.is_running:
+            break
+        snapshot = pickle.loads(pickle.dumps(game.snapshot()))
+        state = game_state(game)
+        commands, states = play(game, policy, 500)
+
+        game.restore(snapshot)
+        assert game_state(game) == state
+        assert replay(game, commands) == states
+
+        # Restoring into another game, whose bricks are different
+        branch.restore(snapshot)
+        assert game_state(branch) == state
+        assert replay(branch, commands) == states
+
+
+def test_restore_keeps_the_forced_serve():
+    game = Arkanoid("NORMAL", 1, headless=True)
+    for _ in range(100):
+        game.update({"1P": "NONE"})
+    snapshot = game.snapshot()
+    states = replay(game, ["NONE"] * 100)
+
+    # The serve is forced to a random side at the frame 150
+    for _ in range(10):
+        game.restore(snapshot)
+        assert replay(game, ["NONE"] * 100) == states
+
+
+def test_restore_rejects_another_level():
+    snapshot = Arkanoid("NORMAL", 1, headless=True).snapshot()
+    with pytest.raises(ValueError):
+        Arkanoid("NORMAL", 2, headless=True).restore(snapshot)
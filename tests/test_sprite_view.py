@@ -0,0 +1,27 @@
+"""
+The tests of the headless switch and `SpriteView`
+"""
+import pygame
+import pytest
+
+from src.game import Arkanoid
+from src.sprite_view import SpriteView
+
+
+def test_headless_game_refuses_sprite_view():
+    with pytest.raises(ValueError):
+        SpriteView(Arkanoid("NORMAL", 1, headless=True))
+
+
+def test_headless_is_read_from_environment(monkeypatch):
+    monkeypatch.setenv("ARKANOID_HEADLESS", "0")
+    assert not Arkanoid("NORMAL", 1).headless
+    monkeypatch.setenv("ARKANOID_HEADLESS", "1")
+    assert Arkanoid("NORMAL", 1).headless
+
+
+def test_sprite_view_draws_the_objects():
+    game = Arkanoid("NORMAL", 1, headless=False)
+    surface = pygame.Surface((200, 500))
+    SpriteView(game).draw(surface)
+    assert surface.get_at(game._platform.rect.center) != pygame.Color(0, 0, 0)
@@ -0,0 +1,85 @@
+"""
+The tests of advancing several frames at once, which should be the same as `update()` for each frame
+"""
+import random
+
+import pytest
+
+from policy import OraclePolicy
+from src.game import Arkanoid
+
+GAMES = [(level, difficulty, physics_version)
+         for level in (1, 5, 8) for difficulty in ("EASY", "NORMAL") for physics_version in (1, 2)]
+
+
+def game_state(game):
+    ball = game._ball
+    return (game.get_data_from_game_to_player()["1P"], game.get_game_status(), tuple(ball._speed),
+            ball.hit_platform_times, ball.hit_brick_false, game._platform._speed[0])
+
+
+def check_multi_frame_step(level, difficulty, physics_version, step, max_frames):
+    """
+    Play a reference game with `update()` and another one with `step`, with the same runs of commands
+    """
+    reference = Arkanoid(difficulty, level, seed=level, headless=True, physics_version=physics_version)
+    game = Arkanoid(difficulty, level, seed=level, headless=True, physics_version=physics_version)
+    policy = OraclePolicy(level)
+    rng = random.Random(level)
+
+    while reference.is_running:
+        scene_info = reference.get_data_from_game_to_player()["1P"]
+        command = policy.command(scene_info)
+        # Hold the command for long only while the ball is far from the platform
+        k = rng.randint(1, max_frames if scene_info["ball"][1] < 250 else 1)
+        hit_platform_times = reference._ball.hit_platform_times
+        result = step(game, command, k)
+
+        assert 1 <= result.frames <= k
+        destroyed = 0
+        for frame in range(result.frames):
+            assert reference.is_running
+            if frame > 0:
+                policy.observe(reference.get_data_from_game_to_player()["1P"])
+            reference.update({"1P": command})
+            destroyed += reference._frame_destroyed_bricks
+            if frame < result.frames - 1:
+                # Only the last frame may hit bricks
+                assert not reference._frame_hit_bricks
+        if result.frames < k:
+            assert reference._frame_hit_bricks or not reference.is_running
+
+        assert game_state(game) == game_state(reference)
+        assert result.status == reference.get_game_status()
+        assert result.bricks_destroyed == destroyed
+        assert result.platform_hit == (reference._ball.hit_platform_times != hit_platform_times)
+
+    assert game.get_game_result() == reference.get_game_result()
+
+
+@pytest.mark.parametrize("level, difficulty, physics_version", GAMES)
+def test_step_many_matches_update(level, difficulty, physics_version):
+    check_multi_frame_step(level, difficulty, physics_version, Arkanoid.step_many, 20)
+
+
+@pytest.mark.parametrize("level, difficulty, physics_version", GAMES)
+def test_fast_forward_matches_update(level, difficulty, physics_version):
+    check_multi_frame_step(level, difficulty, physics_version, Arkanoid.fast_forward, 30)
+
+
+@pytest.mark.parametrize("physics_version", [1, 2])
+def test_fast_forward_skips_free_frames(physics_version):
+    game = Arkanoid("NORMAL", 1, seed=0, headless=True, physics_version=physics_version)
+    game.update({"1P": "SERVE_TO_LEFT"})
+    updated_frames = []
+    update_frame = game._update_frame
+
+    def counting_update_frame(command):
+        updated_frames.append(game.frame_count + 1)
+        update_frame(command)
+
+    game._update_frame = counting_update_frame
+    result = game.fast_forward("NONE", 40)
+    assert result.frames > 0
+    # Only the event frames are simulated one by one
+    assert len(updated_frames) < result.frames
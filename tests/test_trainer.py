@@ -0,0 +1,79 @@
+"""
+The tests of holding out the episodes in `train_model_incremental()`
+"""
+import numpy as np
+import pytest
+
+pytest.importorskip("sklearn")
+
+from ml.data_loader import iter_batches  # noqa: E402
+from ml.dataset import DATASET_DTYPE, write_shard  # noqa: E402
+from ml.ml_model_trainer import HOLDOUT_FOLDS, holdout_mask, train_model_incremental  # noqa: E402
+
+
+def write_episode(folder, episode_id, count=200):
+    rng = np.random.default_rng(episode_id)
+    rows = np.zeros(count, dtype=DATASET_DTYPE)
+    rows["ball_x"] = rng.integers(0, 200, count)
+    rows["ball_y"] = episode_id
+    rows["platform_x"] = rng.integers(0, 160, count)
+    rows["predicted_x"] = rng.integers(0, 200, count)
+    rows["label"] = np.where(rows["predicted_x"] < rows["platform_x"] + 20, 0, 1)
+    rows["episode_id"] = episode_id
+    rows["frame"] = np.arange(count)
+    write_shard(folder, rows)
+
+
+def test_batches_keep_the_episode_of_each_frame(tmp_path):
+    folder = str(tmp_path)
+    for episode_id in range(3):
+        write_episode(folder, episode_id)
+    num_frames = 0
+    for features, labels, episode_ids in iter_batches([folder], batch_size=128, workers=1,
+                                                      seed=1, episodes=True):
+        # The ball y of the frames is their episode id
+        assert features[:, 1].tolist() == episode_ids.tolist()
+        num_frames += len(labels)
+    assert num_frames == 600
+
+
+def test_incremental_training_holds_out_whole_episodes(tmp_path):
+    folder = str(tmp_path)
+    for episode_id in range(2 * HOLDOUT_FOLDS):
+        write_episode(folder, episode_id)
+    assert np.count_nonzero(holdout_mask(np.arange(2 * HOLDOUT_FOLDS))) == 2
+
+    model, accuracy, data_hash = train_model_incremental([folder], batch_size=256, workers=1, epochs=1)
+    assert model is not None and data_hash
+    assert 0 <= accuracy <= 1
+
+
+def test_incremental_training_refuses_empty_holdout(tmp_path):
+    folder = str(tmp_path)
+    for episode_id in range(HOLDOUT_FOLDS - 1):
+        write_episode(folder, episode_id)
+    with pytest.raises(ValueError):
+        train_model_incremental([folder], batch_size=256, workers=1, epochs=1)
+
+
+def test_epochs_are_shuffled_differently(tmp_path, monkeypatch):
+    from ml import ml_model_trainer
+
+    folder = str(tmp_path)
+    for episode_id in range(2 * HOLDOUT_FOLDS):
+        write_episode(folder, episode_id)
+    orders = []
+
+    def recording_iter_batches(*args, **kwargs):
+        order = []
+        orders.append(order)
+        for features, labels, episode_ids in iter_batches(*args, **kwargs):
+            order.extend(features[:, 0].tolist())
+            yield features, labels, episode_ids
+
+    monkeypatch.setattr(ml_model_trainer, "iter_batches", recording_iter_batches)
+    train_model_incremental([folder], batch_size=256, workers=1, epochs=3)
+    # The 3 epochs and the test pass
+    assert len(orders) == 4
+    assert sorted(orders[0]) == sorted(orders[1]) == sorted(orders[2])
+    assert orders[0] != orders[1] and orders[1] != orders[2]
@@ -0,0 +1,52 @@
+"""
+The tests of the landing predicted by the trajectory oracle against the game
+"""
+import pytest
+
+from ml.trajectory_oracle import PLATFORM_Y, Landing, TrajectoryOracle, estimate_ball_speed
+from policy import OraclePolicy
+from src.game import Arkanoid
+
+
+def real_landing(game, max_frames=3000):
+    """
+    Play a copy of the game with the platform out of the way until the ball reaches the platform y
+    """
+    copy = Arkanoid(game.difficulty, game.level, headless=True, physics_version=game.physics_version)
+    copy.restore(game.snapshot())
+    copy._platform.rect.x = game._ball._play_area_rect.right + 1000
+    for frames in range(1, max_frames + 1):
+        copy.update({"1P": "NONE"})
+        if copy._ball.rect.bottom >= PLATFORM_Y:
+            return Landing(copy._ball.rect.x, frames)
+    return None
+
+
+@pytest.mark.parametrize("level, difficulty, physics_version", [
+    (1, "NORMAL", 1), (5, "EASY", 1), (8, "NORMAL", 1), (12, "NORMAL", 1),
+    (1, "NORMAL", 2), (5, "EASY", 2), (8, "NORMAL", 2), (12, "NORMAL", 2)])
+def test_oracle_predicts_the_real_landing(level, difficulty, physics_version):
+    game = Arkanoid(difficulty, level, seed=level, headless=True, physics_version=physics_version)
+    policy = OraclePolicy(level)
+    oracle = TrajectoryOracle(physics_version=physics_version)
+    previous_ball = None
+    checked = 0
+
+    while game.is_running:
+        scene_info = game.get_data_from_game_to_player()["1P"]
+        ball = game._ball
+        # The speed estimated from the positions may be wrong right after a bounce
+        if (scene_info["ball_served"] and previous_ball is not None and scene_info["frame"] % 5 == 0
+                and ball.rect.bottom < PLATFORM_Y
+                and estimate_ball_speed(scene_info["ball"], previous_ball) == tuple(ball._speed)):
+            assert oracle.predict(scene_info, previous_ball) == real_landing(game)
+            checked += 1
+        previous_ball = scene_info["ball"]
+        game.update({"1P": policy.command(scene_info)})
+
+    assert checked > 20
+
+
+def test_unknown_physics_version_is_refused():
+    with pytest.raises(ValueError):
+        TrajectoryOracle(physics_version=3)